@@ -0,0 +1,404 @@
+"""API HTTP/JSON sin interfaz sobre el sistema de stock y ventas (para cajas y sincronización).
+
+Uso:
+    pip install starlette uvicorn
+    python api.py [--host 127.0.0.1] [--port 8000] [--threads 16] [--data-dir data]
+    uvicorn api:app                  # equivalente, con las opciones de uvicorn
+
+Endpoints:
+    GET   /health
+    GET   /products?q=&category=&limit=&offset=     GET /products/{id}    GET /products/sku/{sku}
+    POST  /products                                  PATCH /products/{id}
+    GET   /stock                                     GET /stock/{id}       POST /stock/adjustments
+    POST  /sales                                     GET /sales?start=&end=&limit=&offset=    GET /sales/{id}
+    GET   /reports/sales?group_by=day|month|product|category&start=&end=
+    GET   /reports/top-products?n=&by=quantity|subtotal&start=&end=
+    GET   /reports/stock
+    GET   /metrics?format=prometheus|json          tiempos y contadores acumulados del proceso
+"""
+import argparse
+import contextlib
+import os
+from datetime import date
+
+try:
+    import anyio.to_thread
+    from starlette.applications import Starlette
+    from starlette.concurrency import run_in_threadpool
+    from starlette.exceptions import HTTPException
+    from starlette.responses import Response
+    from starlette.routing import Route
+except ImportError:
+    raise SystemExit("La API requiere starlette: pip install starlette uvicorn")
+
+from modules.managers import Inventory, UnknownProductError
+from modules.metrics import metrics
+from modules.records import InvalidRecordError, Product
+from modules.serializer import DecodeError, backend, dumps, loads
+from modules.storage import DuplicateSkuError, InsufficientStockError
+
+# Tamaño máximo de página en los listados
+MAX_PAGE_SIZE = 1000
+
+
+class JSONResponse(Response):
+    """Respuesta JSON serializada con modules.serializer (orjson si está instalado)"""
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content, pretty=False)
+
+
+def frame_records(frame):
+    """DataFrame como lista de dicts con tipos JSON (fechas en ISO)"""
+    return loads(frame.to_json(orient="records", date_format="iso"))
+
+
+def _inventory(request):
+    return request.app.state.inventory
+
+
+def _int_param(request, name, default, maximum=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPException(400, f"'{name}' debe ser un número entero")
+    if value < 0:
+        raise HTTPException(400, f"'{name}' no puede ser negativo")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"'{name}' debe tener formato AAAA-MM-DD")
+
+
+def _int_field(data, name, default=None, minimum=None, label=None):
+    """Campo entero de un objeto del body (400 indicando el campo si falta o no es válido)"""
+    label = label or name
+    value = data.get(name, default)
+    if value is None:
+        raise HTTPException(400, f"Falta el campo '{label}'")
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise HTTPException(400, f"'{label}' debe ser un número entero")
+    if minimum is not None and value < minimum:
+        raise HTTPException(400, f"'{label}' no puede ser menor a {minimum}")
+    return value
+
+
+async def _json_body(request):
+    try:
+        return loads(await request.body())
+    except DecodeError as e:
+        raise HTTPException(400, f"JSON inválido: {e.msg}")
+
+
+def _page(request, items):
+    limit = _int_param(request, "limit", 100, MAX_PAGE_SIZE)
+    offset = _int_param(request, "offset", 0)
+    return {"total": len(items), "limit": limit, "offset": offset, "items": items[offset:offset + limit]}
+
+
+def _with_stock(inventory, product):
+    entry = inventory.stock.entry(product['id'])
+    return {**product, "stock": entry.quantity, "stock_updated": entry.last_updated}
+
+
+async def health(request):
+    inventory = _inventory(request)
+    return JSONResponse({"status": "ok", "storage": type(inventory.storage.storage).__name__,
+                         "serializer": backend()})
+
+
+async def list_products(request):
+    inventory = _inventory(request)
+    query = request.query_params.get("q")
+    category = request.query_params.get("category")
+
+    def run():
+        if query:
+            # Búsqueda por palabras (prefijo, sin tildes) con el índice del ProductManager
+            products = [product.to_dict() for product in inventory.products.search(query, MAX_PAGE_SIZE)]
+        else:
+            products = inventory.products.load_products()
+        if category:
+            products = [product for product in products if product.get('category') == category]
+        return _page(request, products)
+
+    return JSONResponse(await run_in_threadpool(run))
+
+
+async def get_product(request):
+    inventory = _inventory(request)
+    product = await run_in_threadpool(inventory.products.get_product, request.path_params["product_id"])
+    if product is None:
+        raise HTTPException(404, "Producto no encontrado")
+    return JSONResponse(await run_in_threadpool(_with_stock, inventory, product))
+
+
+async def get_product_by_sku(request):
+    inventory = _inventory(request)
+    try:
+        product = await run_in_threadpool(inventory.resolve_product, None, request.path_params["sku"])
+    except UnknownProductError:
+        raise HTTPException(404, "Producto no encontrado")
+    return JSONResponse(await run_in_threadpool(_with_stock, inventory, product))
+
+
+async def create_product(request):
+    inventory = _inventory(request)
+    data = await _json_body(request)
+    if not isinstance(data, dict):
+        raise HTTPException(400, "Se esperaba un objeto")
+    initial_stock = _int_field(data, "stock", minimum=0) if data.get("stock") is not None else 0
+    data.pop("stock", None)
+
+    def run():
+        # Validar antes de llamar al manager, que solo informa éxito o fracaso (el ID real lo asigna él)
+        product = Product.from_dict({**data, "id": 1})
+        owner = inventory.storage.get_product_by_sku(product.sku) if product.sku is not None else None
+        if owner is not None:
+            raise DuplicateSkuError(product.sku, owner['id'])
+        product_data = {**data, "sku": product.sku}
+        # Producto y stock inicial en una sola escritura
+        if not inventory.products.add_product(product_data, initial_stock):
+            raise HTTPException(500, "No se pudo guardar el producto")
+        return _with_stock(inventory, inventory.products.get_product(product_data['id']))
+
+    try:
+        return JSONResponse(await run_in_threadpool(run), status_code=201)
+    except (InvalidRecordError, DuplicateSkuError, TypeError, ValueError) as e:
+        raise HTTPException(409 if isinstance(e, DuplicateSkuError) else 400, str(e))
+
+
+async def update_product(request):
+    inventory = _inventory(request)
+    product_id = request.path_params["product_id"]
+    data = await _json_body(request)
+    if not isinstance(data, dict) or 'id' in data:
+        raise HTTPException(400, "Se esperaba un objeto con los campos a modificar (sin 'id')")
+
+    def run():
+        current = inventory.products.get_product(product_id)
+        if current is None:
+            raise HTTPException(404, "Producto no encontrado")
+        product = Product.from_dict({**current, **data})
+        owner = inventory.storage.get_product_by_sku(product.sku) if product.sku is not None else None
+        if owner is not None and owner['id'] != product_id:
+            raise DuplicateSkuError(product.sku, owner['id'])
+        # Guardar los valores ya validados (precio como float, SKU sin espacios, ...)
+        validated = product.to_dict()
+        if not inventory.products.update_product(product_id, {key: validated.get(key) for key in data}):
+            raise HTTPException(500, "No se pudo guardar el producto")
+        return _with_stock(inventory, inventory.products.get_product(product_id))
+
+    try:
+        return JSONResponse(await run_in_threadpool(run))
+    except (InvalidRecordError, DuplicateSkuError) as e:
+        raise HTTPException(409 if isinstance(e, DuplicateSkuError) else 400, str(e))
+
+
+async def list_stock(request):
+    inventory = _inventory(request)
+    return JSONResponse(await run_in_threadpool(inventory.stock.load_stock))
+
+
+async def get_stock(request):
+    inventory = _inventory(request)
+    product_id = request.path_params["product_id"]
+    if await run_in_threadpool(inventory.products.get_product, product_id) is None:
+        raise HTTPException(404, "Producto no encontrado")
+    entry = await run_in_threadpool(inventory.stock.entry, product_id)
+    return JSONResponse({"product_id": entry.product_id, **entry.to_dict()})
+
+
+async def adjust_stock(request):
+    """Lote de ajustes [{'product_id', 'delta'} o {'product_id', 'quantity'}] en una sola escritura"""
+    inventory = _inventory(request)
+    adjustments = await _json_body(request)
+    clamp = request.query_params.get("clamp", "1") not in ("0", "false")
+    if not isinstance(adjustments, list) or not all(isinstance(a, dict) for a in adjustments):
+        raise HTTPException(400, "Se esperaba una lista de {'product_id', 'delta'} o {'product_id', 'quantity'}")
+    for position, adjustment in enumerate(adjustments):
+        _int_field(adjustment, 'product_id', label=f"[{position}].product_id")
+        if 'delta' not in adjustment and 'quantity' not in adjustment:
+            raise HTTPException(400, f"Falta el campo '[{position}].delta' o '[{position}].quantity'")
+        # Se validan los dos si vienen ambos (apply_stock_batch usa 'quantity' antes que 'delta')
+        if 'delta' in adjustment:
+            _int_field(adjustment, 'delta', label=f"[{position}].delta")
+        if 'quantity' in adjustment:
+            _int_field(adjustment, 'quantity', minimum=0, label=f"[{position}].quantity")
+
+    def run():
+        # Un ID inexistente crearía una fila de stock sin producto
+        for adjustment in adjustments:
+            if inventory.products.get_product(adjustment['product_id']) is None:
+                raise UnknownProductError(adjustment['product_id'])
+        return inventory.storage.apply_stock_batch(adjustments, clamp)
+
+    try:
+        new_quantities = await run_in_threadpool(run)
+    except UnknownProductError as e:
+        raise HTTPException(404, str(e))
+    except InsufficientStockError as e:
+        raise HTTPException(409, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return JSONResponse({str(product_id): quantity for product_id, quantity in new_quantities.items()})
+
+
+async def record_sale(request):
+    """Registra una venta: {'items': [{'product_id' o 'sku', 'quantity'}]} a precio de catálogo"""
+    inventory = _inventory(request)
+    data = await _json_body(request)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPException(400, "Se esperaba {'items': [{'product_id' o 'sku', 'quantity'}]}")
+    for position, item in enumerate(items):
+        _int_field(item, "quantity", 1, minimum=1, label=f"items[{position}].quantity")
+
+    try:
+        sale = await run_in_threadpool(inventory.record_sale, items)
+    except UnknownProductError as e:
+        raise HTTPException(404, str(e))
+    except InsufficientStockError as e:
+        return JSONResponse({"error": str(e), "product_id": e.product_id, "requested": e.requested,
+                             "available": e.available}, status_code=409)
+    except (InvalidRecordError, TypeError, ValueError) as e:
+        raise HTTPException(400, str(e))
+    if sale is None:
+        raise HTTPException(500, "No se pudo registrar la venta")
+    return JSONResponse(sale, status_code=201)
+
+
+async def list_sales(request):
+    inventory = _inventory(request)
+    start, end = _date_param(request, "start"), _date_param(request, "end")
+
+    def run():
+        with inventory.sales_lock:
+            # Con o sin rango incluye los meses archivados, así paginando se recorre todo el historial
+            return _page(request, inventory.sales.get_sales_between(start, end)[::-1])
+
+    return JSONResponse(await run_in_threadpool(run))
+
+
+async def get_sale(request):
+    inventory = _inventory(request)
+    sale = await run_in_threadpool(inventory.sales.get_sale, request.path_params["sale_id"])
+    if sale is None:
+        raise HTTPException(404, "Venta no encontrada")
+    return JSONResponse(sale)
+
+
+async def sales_report(request):
+    inventory = _inventory(request)
+    start, end = _date_param(request, "start"), _date_param(request, "end")
+    group_by = request.query_params.get("group_by", "day")
+
+    def run():
+        with inventory.sales_lock:
+            return frame_records(inventory.reports.generate_sales_report(start, end, group_by=group_by))
+
+    try:
+        return JSONResponse(await run_in_threadpool(run))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+async def top_products_report(request):
+    inventory = _inventory(request)
+    start, end = _date_param(request, "start"), _date_param(request, "end")
+    by = request.query_params.get("by", "quantity")
+    if by not in ("quantity", "subtotal"):
+        raise HTTPException(400, "'by' debe ser quantity o subtotal")
+
+    def run():
+        with inventory.sales_lock:
+            totals = inventory.reports.generate_top_products_report(_int_param(request, "n", 10, MAX_PAGE_SIZE),
+                                                                    start, end, by)
+        return [{"name": str(name), by: value} for name, value in totals.items()]
+
+    return JSONResponse(await run_in_threadpool(run))
+
+
+async def stock_report(request):
+    inventory = _inventory(request)
+    return JSONResponse(await run_in_threadpool(lambda: frame_records(inventory.reports.generate_stock_report())))
+
+
+async def metrics_dump(request):
+    """Métricas del proceso en formato Prometheus (por defecto) o JSON"""
+    if request.query_params.get("format") == "json":
+        return JSONResponse(metrics.snapshot())
+    return Response(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def http_error(request, exc):
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+
+def create_app(data_dir=None, threads=None):
+    """Aplicación ASGI; data_dir e hilos también se toman de INVENTORY_DATA_DIR / API_THREADS"""
+    data_dir = data_dir or os.environ.get("INVENTORY_DATA_DIR", "data")
+    threads = threads or int(os.environ.get("API_THREADS", "0"))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # Un único Inventory (y su caché) compartido por todos los pedidos. El pool de hilos
+        # de E/S es también el de conexiones: cada hilo reutiliza la suya con SQLite.
+        if threads:
+            anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+        app.state.inventory = Inventory(data_dir=data_dir)
+        yield
+
+    routes = [
+        Route("/health", health),
+        Route("/products", list_products),
+        Route("/products", create_product, methods=["POST"]),
+        Route("/products/sku/{sku}", get_product_by_sku),
+        Route("/products/{product_id:int}", get_product),
+        Route("/products/{product_id:int}", update_product, methods=["PATCH"]),
+        Route("/stock", list_stock),
+        Route("/stock/adjustments", adjust_stock, methods=["POST"]),
+        Route("/stock/{product_id:int}", get_stock),
+        Route("/sales", record_sale, methods=["POST"]),
+        Route("/sales", list_sales),
+        Route("/sales/{sale_id:int}", get_sale),
+        Route("/reports/sales", sales_report),
+        Route("/reports/top-products", top_products_report),
+        Route("/reports/stock", stock_report),
+        Route("/metrics", metrics_dump),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan, exception_handlers={HTTPException: http_error})
+
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON del sistema de stock y ventas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="hilos de E/S (= conexiones a SQLite); 0 usa el valor por defecto de anyio (40)")
+    parser.add_argument("--data-dir", default=None)
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Para servir la API instala uvicorn: pip install uvicorn")
+    uvicorn.run(create_app(args.data_dir, args.threads), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
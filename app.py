@@ -1,9 +1,25 @@
 import streamlit as st
 import pandas as pd
-import json
+import io
+import logging
 import os
-from datetime import datetime
-import plotly.express as px
+import threading
+from datetime import date, datetime
+import numpy as np
+
+from modules.bulk_import import detect_format, import_products, parse_stock_adjustments
+from modules.cache import CachedStorage
+from modules.charts import FigureCache, downsample_daily
+from modules.catalog import filter_inventory, inventory_frame, paginate
+from modules.managers import Inventory, UnknownProductError
+from modules.metrics import metrics
+from modules.precompute import ReportStore, ReportWorker
+from modules.rollups import to_frame
+from modules.serializer import DecodeError, dumps
+from modules.records import InvalidRecordError, Product, normalize_sku
+from modules.storage import InsufficientStockError, create_storage, empty_value
+
+logger = logging.getLogger(__name__)
 
 # Configuración de la página
 st.set_page_config(
@@ -37,108 +53,290 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Encabezados de las tablas armadas desde inventory_frame()
+PRODUCT_TABLE_COLUMNS = {'id': 'ID', 'sku': 'SKU', 'name': 'Nombre', 'price': 'Precio', 'category': 'Categoría',
+                         'quantity': 'Stock', 'description': 'Descripción'}
+STOCK_TABLE_COLUMNS = {'id': 'ID', 'name': 'Producto', 'category': 'Categoría', 'price': 'Precio',
+                       'quantity': 'Stock Actual', 'last_updated': 'Última Actualización'}
 
-class InventorySystem:
-    def __init__(self):
-        self.products_file = "data/products.json"
-        self.sales_file = "data/sales.json"
-        self.stock_file = "data/stock.json"
-        self.categories_file = "data/categories.json"
-        self._initialize_files()
-
-    def _initialize_files(self):
-        """Inicializa los archivos JSON si no existen"""
-        os.makedirs("data", exist_ok=True)
+# Filas por página de las tablas y opciones que arma como máximo el buscador de productos
+TABLE_PAGE_SIZE = 50
+PICKER_LIMIT = 50
 
-        if not os.path.exists(self.products_file):
-            with open(self.products_file, 'w') as f:
-                json.dump([], f)
+# Panel de tiempos por rerun en la barra lateral (también con ?debug=1 en la URL) y volcado periódico
+# de las métricas acumuladas en JSON para monitoreo
+DEBUG_PANEL = os.environ.get("INVENTORY_DEBUG") == "1"
+METRICS_FILE = os.environ.get("INVENTORY_METRICS_FILE")
+METRICS_DUMP_INTERVAL = 15
 
-        if not os.path.exists(self.sales_file):
-            with open(self.sales_file, 'w') as f:
-                json.dump([], f)
+# Reportes precalculados en segundo plano: "thread" los calcula un hilo de la app; "off" si los calcula
+# un proceso aparte (python manage.py precompute-reports --watch)
+REPORT_WORKER = os.environ.get("INVENTORY_REPORT_WORKER", "thread")
+REPORT_INTERVAL = float(os.environ.get("INVENTORY_REPORT_INTERVAL", "10"))
 
-        if not os.path.exists(self.stock_file):
-            with open(self.stock_file, 'w') as f:
-                json.dump({}, f)
 
-        if not os.path.exists(self.categories_file):
-            with open(self.categories_file, 'w') as f:
-                json.dump([], f)
+class InventorySystem:
+    """Interfaz de Streamlit sobre los managers de modules.managers.Inventory (los mismos que usa la API)"""
+
+    def __init__(self, storage=None):
+        # Backend de almacenamiento: JSON por defecto o SQLite (INVENTORY_BACKEND=sqlite),
+        # con caché en memoria de los documentos ya parseados
+        self.inventory = Inventory(storage=storage or CachedStorage(create_storage()))
+        self.storage = self.inventory.storage
+        self.archive = self.inventory.sales.archive
+        self.search = self.inventory.products.search_index
+        self._inventory = None
+        self._inventory_signature = None
+        self._inventory_lock = threading.Lock()
+        self.figures = FigureCache()
+        self.report_store = ReportStore(os.path.join(self.storage.data_dir, "reports"))
+        self.report_worker = None
 
     def load_data(self, file_type):
-        """Carga datos desde archivos JSON"""
+        """Carga datos desde el backend de almacenamiento"""
         try:
-            if file_type == "products":
-                with open(self.products_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            elif file_type == "sales":
-                with open(self.sales_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            elif file_type == "stock":
-                with open(self.stock_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            elif file_type == "categories":
-                with open(self.categories_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            if file_type == "categories":
-                return []
-            return [] if file_type in ["products", "sales"] else {}
+            return self.storage.load(file_type)
+        except FileNotFoundError:
+            return empty_value(file_type)
+        except DecodeError as e:
+            # Archivo dañado y sin copia de respaldo válida: avisar en lugar de mostrar el catálogo vacío
+            st.error(f"❌ No se pudo leer '{file_type}': el archivo está dañado ({e})")
+            st.stop()
 
     def save_data(self, file_type, data):
-        """Guarda datos en archivos JSON"""
+        """Guarda datos en el backend de almacenamiento"""
         try:
-            if file_type == "products":
-                with open(self.products_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-            elif file_type == "sales":
-                with open(self.sales_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-            elif file_type == "stock":
-                with open(self.stock_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-            elif file_type == "categories":
-                with open(self.categories_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-            return True
+            result = self.storage.save(file_type, data)
+            if file_type == "sales":
+                self.inventory.sales.rebuild_rollups(data)
+            return result
+        except Exception as e:
+            st.error(f"Error al guardar datos: {e}")
+            return False
+
+    def record_sale(self, items):
+        """Registra una venta a precio de catálogo reservando el stock de forma atómica.
+
+        Lanza InsufficientStockError si algún producto no alcanza (no se descuenta
+        nada); devuelve la venta registrada o None si no se pudo guardar.
+        """
+        try:
+            sale = self.inventory.record_sale(items)
+        except (UnknownProductError, ValueError) as e:
+            st.error(f"❌ Venta inválida: {e}")
+            return None
+        if sale is None:
+            st.error("❌ No se pudo registrar la venta")
+            return None
+        self.refresh_reports()
+        return sale
+
+    def sales_lines(self, start_date=None, end_date=None):
+        """Líneas de venta en formato columnar: ventas vivas más los meses archivados del rango"""
+        with self.inventory.sales_lock:
+            return self.inventory.sales.sales_lines(start_date, end_date)
+
+    def inventory_frame(self):
+        """Productos ⋈ stock en un DataFrame, armado una vez por versión de los datos (no modificarlo)"""
+        signature = (self.storage.signature("products"), self.storage.signature("stock"))
+        with self._inventory_lock:
+            if self._inventory is None or self._inventory_signature != signature:
+                with metrics.timer("frame.inventory"):
+                    self._inventory = inventory_frame(self.load_data("products"), self.load_data("stock"))
+                self._inventory_signature = signature
+            return self._inventory
+
+    def data_version(self, *file_types):
+        """Versión de los datos indicados (cambia con cada escritura), para las claves de caché"""
+        return tuple(self.storage.signature(file_type) for file_type in file_types)
+
+    def sales_version(self):
+        """Versión de las ventas vivas más las archivadas"""
+        return self.data_version("sales") + (self.archive.last_sale_id,)
+
+    def start_report_worker(self, interval=REPORT_INTERVAL):
+        """Arranca el hilo que recalcula los reportes precalculados cuando cambian los datos"""
+        self.report_worker = ReportWorker(self.inventory, self.report_store, interval).start()
+
+    def refresh_reports(self):
+        """Pide al worker una pasada ya (sin esperarla); False si los reportes los calcula otro proceso"""
+        if self.report_worker is None:
+            return False
+        self.report_worker.request()
+        return True
+
+    def precomputed_report(self, name):
+        """Última versión calculada de un reporte ({'data', 'computed_at', ...}) o None"""
+        return self.report_store.load(name)
+
+    def search_products(self, query, limit, accept=None):
+        """IDs de los productos que coinciden con la búsqueda (sin tildes, por prefijo), mejores primero"""
+        return self.search.search(query, limit, accept)
+
+    def product_by_sku(self, sku):
+        """Producto con ese SKU / código de barras (índice en memoria, sin recorrer el catálogo)"""
+        return self.storage.get_product_by_sku(sku)
+
+    def next_id(self, file_type):
+        """Próximo ID de la secuencia persistente (no se repite aunque se borren registros)"""
+        return self.storage.next_id(file_type)
+
+    def get_sale(self, sale_id):
+        """Obtiene una venta por ID (también de los meses archivados)"""
+        return self.inventory.sales.get_sale(sale_id)
+
+    def sales_rollup(self):
+        """Totales de ventas precalculados (se reconstruyen si todavía no existen)"""
+        return self.inventory.sales.sales_rollup()
+
+    def set_stock(self, product_id, quantity):
+        """Establece el stock de un producto sin reescribir el resto a partir de datos viejos"""
+        try:
+            return self.storage.set_stock(product_id, {
+                'quantity': quantity,
+                'last_updated': datetime.now().isoformat()
+            })
         except Exception as e:
             st.error(f"Error al guardar datos: {e}")
             return False
 
+    def adjust_stock(self, changes, clamp=False):
+        """Suma/resta stock de forma atómica; devuelve las nuevas cantidades o None si falla"""
+        try:
+            return self.storage.adjust_stock(changes, clamp)
+        except InsufficientStockError as e:
+            st.error(f"❌ Stock insuficiente. Disponible: {e.available}")
+        except Exception as e:
+            st.error(f"Error al guardar datos: {e}")
+        return None
+
+    def apply_stock_batch(self, adjustments, clamp=False):
+        """Aplica un lote de ajustes de stock en una sola escritura; devuelve las nuevas cantidades o None"""
+        try:
+            return self.storage.apply_stock_batch(adjustments, clamp)
+        except InsufficientStockError as e:
+            st.error(f"❌ Stock insuficiente para el producto {e.product_id}. Disponible: {e.available}")
+        except Exception as e:
+            st.error(f"Error al guardar datos: {e}")
+        return None
+
     def add_category(self, category_name):
         """Agrega una nueva categoría si no existe"""
         categories = self.load_data("categories")
         if category_name and category_name.strip() and category_name not in categories:
-            categories.append(category_name.strip())
-            self.save_data("categories", categories)
+            # Lista nueva: la que devuelve la caché se comparte entre sesiones y no se modifica
+            self.save_data("categories", categories + [category_name.strip()])
             return True
         return False
 
+    def import_products(self, stream, file_format):
+        """Importación masiva de productos y stock inicial desde CSV/JSONL"""
+        try:
+            return import_products(self.storage, stream, file_format)
+        except Exception as e:
+            st.error(f"Error al importar productos: {e}")
+            return None
+
+    def _check_product(self, product, product_id=None):
+        """Valida un producto antes de pasarlo al manager (que solo informa éxito o fracaso)"""
+        try:
+            record = Product.from_dict({**product, 'id': product_id or 1})
+        except InvalidRecordError as e:
+            st.error(f"❌ Producto inválido: {e}")
+            return False
+        owner = self.storage.get_product_by_sku(record.sku) if record.sku is not None else None
+        if owner is not None and owner['id'] != product_id:
+            st.error(f"❌ El código {record.sku} ya lo usa el producto {owner['id']} ({owner['name']})")
+            return False
+        return True
+
+    def add_product(self, product, initial_stock):
+        """Agrega un producto con su stock inicial (se valida antes de asignarle un ID)"""
+        if not self._check_product(product):
+            return False
+        if not self.inventory.products.add_product(dict(product), initial_stock):
+            st.error("❌ No se pudo guardar el producto")
+            return False
+        return True
+
+    def update_product(self, product_id, updated_data):
+        """Actualiza los campos de un producto (el resultado se valida antes de guardarlo)"""
+        current = self.inventory.products.get_product(product_id)
+        if current is None or not self._check_product({**current, **updated_data}, product_id):
+            return False
+        if not self.inventory.products.update_product(product_id, updated_data):
+            st.error("❌ No se pudo guardar el producto")
+            return False
+        return True
+
     def delete_product(self, product_id):
         """Elimina un producto y su stock"""
-        products = self.load_data("products")
-        stock_data = self.load_data("stock")
+        if not self.inventory.products.delete_product(product_id):
+            st.error("❌ No se pudo eliminar el producto")
+            return False
+        return True
+
+    def cache_stats(self):
+        """Contadores de la caché de datos (None si el backend no usa caché)"""
+        return self.storage.stats() if hasattr(self.storage, "stats") else None
+
+
+class PageData:
+    """Datos del rerun con carga perezosa: cada archivo se lee recién cuando la página lo pide"""
 
-        # Eliminar producto
-        products = [p for p in products if p['id'] != product_id]
+    def __init__(self, system):
+        self.system = system
+        self._loaded = {}
 
-        # Eliminar stock del producto
-        product_id_str = str(product_id)
-        if product_id_str in stock_data:
-            del stock_data[product_id_str]
+    def _load(self, file_type):
+        # Una sola lectura por rerun, así la página ve siempre la misma versión de los datos
+        if file_type not in self._loaded:
+            with metrics.timer(f"load_data.{file_type}"):
+                self._loaded[file_type] = self.system.load_data(file_type)
+        return self._loaded[file_type]
 
-        # Guardar cambios
-        success1 = self.save_data("products", products)
-        success2 = self.save_data("stock", stock_data)
+    @property
+    def products(self):
+        return self._load("products")
 
-        return success1 and success2
+    @property
+    def sales(self):
+        return self._load("sales")
+
+    @property
+    def stock(self):
+        return self._load("stock")
+
+    @property
+    def categories(self):
+        return self._load("categories")
+
+
+@st.cache_resource
+def get_system():
+    """Instancia compartida entre sesiones (mantiene la caché de datos entre reruns)"""
+    system = InventorySystem()
+    if REPORT_WORKER == "thread":
+        system.start_report_worker()
+    return system
 
 
 def main():
     # Inicializar el sistema
-    system = InventorySystem()
+    system = get_system()
+
+    # Desglose de tiempos de este rerun (para el panel de rendimiento)
+    with metrics.trace() as trace:
+        show_page(system)
+
+    if DEBUG_PANEL or st.query_params.get("debug") == "1":
+        show_debug_panel(trace)
+    if METRICS_FILE:
+        metrics.dump(METRICS_FILE, METRICS_DUMP_INTERVAL)
 
+
+def show_page(system):
+    """Navegación y página elegida"""
     # Título principal
     st.markdown('<h1 class="main-header">📊 Sistema de Control de Stock y Ventas</h1>', unsafe_allow_html=True)
 
@@ -153,30 +351,229 @@ def main():
     ]
     choice = st.sidebar.selectbox("Selecciona una opción:", menu_options)
 
-    # Cargar datos
-    products = system.load_data("products")
-    sales = system.load_data("sales")
-    stock_data = system.load_data("stock")
-    categories = system.load_data("categories")
+    # Cada página carga solo los datos que usa (el historial de ventas, por ejemplo, solo en Ventas)
+    data = PageData(system)
 
     if choice == "Dashboard Principal":
-        show_dashboard(products, sales, stock_data)
+        show_dashboard(system, data)
 
     elif choice == "Gestión de Productos":
-        show_product_management(system, products, categories)
+        show_product_management(system, data)
 
     elif choice == "Control de Stock":
-        show_stock_management(system, products, stock_data)
+        show_stock_management(system, data)
 
     elif choice == "Registro de Ventas":
-        show_sales_management(system, products, sales, stock_data)
+        show_sales_management(system, data)
 
     elif choice == "Reportes y Estadísticas":
-        show_reports(products, sales, stock_data)
+        show_reports(system, data)
+
+    cache_stats = system.cache_stats()
+    if cache_stats:
+        st.sidebar.caption(
+            f"Caché de datos: {cache_stats['hits']} aciertos, {cache_stats['misses']} lecturas de disco")
+
+
+def show_debug_panel(trace):
+    """Desglose de tiempos del rerun y acumulados del proceso en la barra lateral"""
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=True):
+        st.caption(f"Este rerun: {trace.seconds * 1000:,.1f} ms")
+        if trace.entries:
+            st.dataframe(pd.DataFrame(trace.rows()), use_container_width=True, hide_index=True)
+        if trace.counters:
+            st.caption(", ".join(f"{name}: {value}" for name, value in sorted(trace.counters.items())))
+
+        # Operaciones que más tiempo acumularon desde que arrancó el proceso
+        snapshot = metrics.snapshot()
+        slowest = sorted(snapshot['timers'].items(), key=lambda item: item[1]['total_seconds'], reverse=True)
+        if slowest:
+            st.write("**Acumulado del proceso**")
+            st.dataframe(pd.DataFrame([{
+                'operación': name,
+                'llamadas': timer['count'],
+                'total ms': round(timer['total_seconds'] * 1000, 1),
+                'prom. ms': round(timer['avg_seconds'] * 1000, 2),
+                'máx. ms': round(timer['max_seconds'] * 1000, 2)
+            } for name, timer in slowest[:15]]), use_container_width=True, hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSON", dumps(snapshot, pretty=True), file_name="metrics.json",
+                               mime="application/json", key="metrics_json")
+        with col2:
+            st.download_button("Prometheus", metrics.prometheus(), file_name="metrics.prom",
+                               mime="text/plain", key="metrics_prometheus")
+
+
+def paginated(rows, key, page_size=TABLE_PAGE_SIZE):
+    """Selector de página: devuelve solo las filas visibles (DataFrame o lista)"""
+    total = len(rows)
+    page_count = max(1, -(-total // page_size))
+    # Si un filtro achicó el resultado, volver a la última página existente
+    if st.session_state.get(key, 1) > page_count:
+        st.session_state[key] = page_count
+
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Página (de {page_count}):", min_value=1, max_value=page_count, key=key)
+
+    page_rows, _ = paginate(rows, page, page_size)
+    start = (page - 1) * page_size
+    st.caption(f"Mostrando {start + 1}–{start + len(page_rows)} de {total}" if total else "Sin resultados")
+    return page_rows
+
+
+def product_picker(system, label, key, in_stock_only=False):
+    """Buscador de productos: arma opciones solo para las mejores coincidencias de la búsqueda"""
+    inventory = system.inventory_frame()
+    if in_stock_only:
+        inventory = filter_inventory(inventory, min_stock=1)
+
+    search = st.text_input("🔍 Buscar producto:", key=f"{key}_search", placeholder="Nombre, categoría o ID")
+    if search.strip():
+        # Índice de búsqueda: palabras por prefijo y sin tildes en nombre, categoría y descripción
+        accept = None
+        if in_stock_only:
+            stock_data = system.load_data("stock")
+            accept = lambda product_id: stock_data.get(str(product_id), {}).get('quantity', 0) > 0
+        ranking = {product_id: rank for rank, product_id in
+                   enumerate(system.search_products(search, PICKER_LIMIT, accept))}
+        matches = inventory[inventory['id'].isin(ranking)].drop_duplicates('id')
+        matches = matches.iloc[np.argsort(matches['id'].map(ranking).to_numpy(), kind='stable')]
+        total = len(matches)
+    else:
+        matches = inventory.head(PICKER_LIMIT)
+        total = len(inventory)
+    if matches.empty:
+        st.caption("Sin coincidencias")
+        return None
+
+    candidates = matches.to_dict('records')
+    if in_stock_only:
+        labels = [f"{p['id']} - {p['name']} (Stock: {p['quantity']})" for p in candidates]
+    else:
+        labels = [f"{p['id']} - {p['name']}" for p in candidates]
+    index = st.selectbox(label, options=range(len(candidates)), format_func=labels.__getitem__, key=key)
+    if total >= PICKER_LIMIT:
+        st.caption(f"Se muestran las primeras {PICKER_LIMIT} coincidencias: escribe más para acotar")
+    return candidates[index] if index is not None else None
+
+
+def add_to_cart(product, quantity):
+    """Suma un producto al carrito de la venta en curso (o su cantidad, si ya estaba)"""
+    existing_item = next((item for item in st.session_state.selected_products
+                          if item['product_id'] == product['id']), None)
+
+    if existing_item:
+        # Actualizar cantidad si ya existe
+        existing_item['quantity'] += quantity
+        existing_item['subtotal'] = existing_item['price'] * existing_item['quantity']
+    else:
+        # Agregar nuevo producto
+        st.session_state.selected_products.append({
+            'product_id': product['id'],
+            'name': product['name'],
+            'price': product['price'],
+            'quantity': quantity,
+            'subtotal': product['price'] * quantity
+        })
+
+    # Recalcular total
+    st.session_state.total_amount = sum(item['subtotal'] for item in st.session_state.selected_products)
+
+
+def scan_to_cart(system):
+    """Callback del escáner: resuelve el código y lo agrega al carrito antes del rerun (sin st.rerun extra)"""
+    code = st.session_state.scan_code.strip()
+    st.session_state.scan_code = ""
+    if not code:
+        return
+
+    quantity = 1
+    if "*" in code:
+        count, _, code = code.partition("*")
+        if not count.strip().isdigit() or int(count) < 1:
+            st.session_state.scan_message = ("error", f"❌ Cantidad inválida: {count}")
+            return
+        quantity = int(count)
+
+    product = system.product_by_sku(code)
+    if product is None:
+        st.session_state.scan_message = ("error", f"❌ Código no encontrado: {code}")
+        return
+
+    # Stock de la caché en memoria menos lo que ya está en el carrito
+    available_stock = system.load_data("stock").get(str(product['id']), {}).get('quantity', 0)
+    in_cart = sum(item['quantity'] for item in st.session_state.selected_products
+                  if item['product_id'] == product['id'])
+    if in_cart + quantity > available_stock:
+        st.session_state.scan_message = (
+            "error", f"❌ Stock insuficiente para {product['name']}. Disponible: {available_stock - in_cart}")
+        return
+
+    add_to_cart(product, quantity)
+    st.session_state.scan_message = ("success", f"✅ {product['name']} x{quantity} agregado a la venta")
+
+
+def daily_sales_figure(daily_totals):
+    """Línea de ingresos por día (por semana o mes si la serie es demasiado larga)"""
+    import plotly.express as px  # solo las páginas con gráficos pagan la importación
+
+    with metrics.timer("aggregate.daily_sales"):
+        daily_sales = to_frame(daily_totals)
+        daily_sales['date'] = pd.to_datetime(daily_sales['date'])
+        daily_sales, period = downsample_daily(daily_sales)
+    title = 'Ventas Diarias' if period == 'día' else f'Ventas Diarias (agrupadas por {period})'
+    return px.line(daily_sales, x='date', y='total', title=title, labels={'total': 'Ingresos', 'date': 'Fecha'})
+
+
+def category_stock_figure(inventory):
+    """Torta de unidades en stock por categoría (None si no hay categorías)"""
+    import plotly.express as px
+
+    with metrics.timer("aggregate.category_stock"):
+        categories_stock = inventory.groupby('category', sort=False)['quantity'].sum()
+    if categories_stock.empty:
+        return None
+    return px.pie(values=categories_stock.values, names=categories_stock.index, title='Stock por Categoría')
+
+
+def period_top_products(system, start_date, end_date):
+    """Los 10 productos más vendidos del período (groupby vectorizado sobre las líneas de venta)"""
+    with metrics.timer("aggregate.top_products"):
+        return system.sales_lines(start_date, end_date).top_products(10, start_date, end_date)
+
+
+def top_products_figure(top_products):
+    """Barras de los productos más vendidos (Serie nombre -> cantidad); None si no hubo ventas"""
+    import plotly.express as px
+
+    if top_products.empty:
+        return None
+    return px.bar(top_products, x=top_products.values, y=top_products.index, orientation='h',
+                  title='Productos Más Vendidos', labels={'x': 'Cantidad Vendida', 'y': 'Producto'})
+
+
+def stock_status_figure(inventory):
+    """Torta de productos con y sin stock"""
+    import plotly.express as px
+
+    status_counts = pd.Series(np.where(inventory['quantity'] == 0, 'Sin Stock', 'Con Stock')).value_counts()
+    return px.pie(values=status_counts.values, names=status_counts.index, title='Estado del Stock')
+
+
+def computed_at_caption(report):
+    """Fecha de cálculo de un reporte precalculado"""
+    st.caption(f"🕒 Calculado el {report['computed_at'].replace('T', ' ')}")
 
 
-def show_dashboard(products, sales, stock_data):
+@metrics.timed("page.dashboard")
+def show_dashboard(system, data):
     """Muestra el dashboard principal"""
+    products = data.products
+    rollup = system.sales_rollup()
+    inventory = system.inventory_frame()
     st.markdown('<h2 class="section-header">📈 Dashboard Principal</h2>', unsafe_allow_html=True)
 
     # Métricas principales
@@ -186,61 +583,51 @@ def show_dashboard(products, sales, stock_data):
         total_products = len(products)
         st.metric("Total Productos", total_products)
 
+    # Totales precalculados: no recorren el historial de ventas
+    sales_totals = rollup.totals()
+
     with col2:
-        total_sales = len(sales)
+        total_sales = sales_totals['tickets']
         st.metric("Total Ventas", total_sales)
 
     with col3:
-        total_revenue = sum(sale.get('total', 0) for sale in sales)
+        total_revenue = sales_totals['revenue']
         st.metric("Ingresos Totales", f"${total_revenue:,.2f}")
 
     with col4:
         # Productos sin stock
-        out_of_stock = 0
-        for product in products:
-            product_id = str(product['id'])
-            if stock_data.get(product_id, {}).get('quantity', 0) == 0:
-                out_of_stock += 1
+        out_of_stock = int((inventory['quantity'] == 0).sum())
         st.metric("Productos Sin Stock", out_of_stock)
 
-    # Gráficos recientes
+    # Gráficos recientes: se reutilizan mientras no cambien los datos (ni los filtros)
     col1, col2 = st.columns(2)
 
     with col1:
-        if sales:
-            sales_df = pd.DataFrame(sales)
-            sales_df['date'] = pd.to_datetime(sales_df['date'])
-            daily_sales = sales_df.groupby(sales_df['date'].dt.date)['total'].sum().reset_index()
-
-            fig = px.line(daily_sales, x='date', y='total',
-                          title='Ventas Diarias', labels={'total': 'Ingresos', 'date': 'Fecha'})
-            st.plotly_chart(fig, use_container_width=True)
+        if sales_totals['tickets']:
+            with metrics.timer("chart.daily_sales"):
+                fig = system.figures.get("daily_sales", rollup.signature(), None,
+                                         lambda: daily_sales_figure(rollup.days()))
+                st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         if products:
             # Stock por categoría
-            categories_stock = {}
-            for product in products:
-                category = product.get('category', 'Sin categoría')
-                product_id = str(product['id'])
-                stock_quantity = stock_data.get(product_id, {}).get('quantity', 0)
-
-                if category not in categories_stock:
-                    categories_stock[category] = 0
-                categories_stock[category] += stock_quantity
-
-            if categories_stock:
-                fig = px.pie(values=list(categories_stock.values()), names=list(categories_stock.keys()),
-                             title='Stock por Categoría')
-                st.plotly_chart(fig, use_container_width=True)
+            with metrics.timer("chart.category_stock"):
+                fig = system.figures.get("category_stock", system.data_version("products", "stock"), None,
+                                         lambda: category_stock_figure(inventory))
+                if fig is not None:
+                    st.plotly_chart(fig, use_container_width=True)
 
 
-def show_product_management(system, products, categories):
+@metrics.timed("page.products")
+def show_product_management(system, data):
     """Módulo de gestión de productos"""
+    products = data.products
     st.markdown('<h2 class="section-header">📦 Gestión de Productos</h2>', unsafe_allow_html=True)
 
-    tab1, tab2, tab3, tab4 = st.tabs(
-        ["Agregar Producto", "Lista de Productos", "Configurar Stock y Precio", "Eliminar Productos"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["Agregar Producto", "Lista de Productos", "Configurar Stock y Precio", "Eliminar Productos",
+         "Importación Masiva"])
 
     with tab1:
         st.subheader("Agregar Nuevo Producto")
@@ -251,6 +638,7 @@ def show_product_management(system, products, categories):
             with col1:
                 name = st.text_input("Nombre del Producto*")
                 price = st.number_input("Precio*", min_value=0.0, step=0.1, format="%.2f")
+                sku = st.text_input("Código de barras / SKU", help="Opcional; no se puede repetir")
 
             with col2:
                 description = st.text_area("Descripción")
@@ -265,6 +653,7 @@ def show_product_management(system, products, categories):
             final_category = ""
 
             # Opción 1: Seleccionar categoría existente (solo si hay categorías)
+            categories = data.categories
             if categories:
                 st.write("**Categorías existentes:**")
                 existing_category = st.selectbox(
@@ -302,24 +691,17 @@ def show_product_management(system, products, categories):
                             st.info(f"ℹ️ La categoría '{new_category.strip()}' ya existe")
 
                     new_product = {
-                        "id": len(products) + 1,
                         "name": name,
                         "price": float(price),
                         "category": final_category,
                         "description": description,
                         "created_at": datetime.now().isoformat()
                     }
+                    if normalize_sku(sku):
+                        new_product["sku"] = normalize_sku(sku)
 
-                    products.append(new_product)
-
-                    # Configurar stock inicial
-                    stock_data = system.load_data("stock")
-                    stock_data[str(new_product['id'])] = {
-                        'quantity': initial_stock,
-                        'last_updated': datetime.now().isoformat()
-                    }
-
-                    if system.save_data("products", products) and system.save_data("stock", stock_data):
+                    # Guardar producto y configurar stock inicial (solo se escriben los registros nuevos)
+                    if system.add_product(new_product, initial_stock):
                         st.success("✅ Producto agregado exitosamente!")
                         st.rerun()
                 else:
@@ -339,32 +721,28 @@ def show_product_management(system, products, categories):
         st.subheader("Lista de Productos")
 
         if products:
-            # Obtener stock actual para cada producto
-            stock_data = system.load_data("stock")
-            products_with_stock = []
-
-            for product in products:
-                stock_quantity = stock_data.get(str(product['id']), {}).get('quantity', 0)
-                products_with_stock.append({
-                    'ID': product['id'],
-                    'Nombre': product['name'],
-                    'Precio': f"${product['price']:.2f}",
-                    'Categoría': product['category'],
-                    'Stock': stock_quantity,
-                    'Descripción': product.get('description', '')
-                })
+            # Productos con su stock actual (tabla compartida, armada una vez por versión de los datos)
+            inventory = system.inventory_frame()
 
-            df_products = pd.DataFrame(products_with_stock)
-            st.dataframe(df_products, use_container_width=True)
+            # Filtrar y paginar en el servidor: al navegador solo llega la página visible
+            col1, col2 = st.columns(2)
+            with col1:
+                name_filter = st.text_input("🔍 Buscar por nombre o ID:", key="products_search")
+            with col2:
+                category_filter = st.selectbox("Categoría:", ["Todas"] + sorted(inventory['category'].unique()),
+                                               key="products_category")
+            filtered = filter_inventory(inventory, name_prefix=name_filter,
+                                        category=None if category_filter == "Todas" else category_filter)
+
+            df_products = paginated(filtered, "products_page")[
+                ['id', 'sku', 'name', 'price', 'category', 'quantity', 'description']].rename(
+                columns=PRODUCT_TABLE_COLUMNS)
+            st.dataframe(df_products, use_container_width=True, hide_index=True,
+                         column_config={'Precio': st.column_config.NumberColumn(format="$%.2f")})
 
             # Mostrar estadísticas de categorías
             st.subheader("📊 Estadísticas por Categoría")
-            category_stats = {}
-            for product in products:
-                category = product['category']
-                if category not in category_stats:
-                    category_stats[category] = 0
-                category_stats[category] += 1
+            category_stats = inventory.groupby('category', sort=False).size().to_dict()
 
             if category_stats:
                 col1, col2, col3 = st.columns(3)
@@ -378,12 +756,9 @@ def show_product_management(system, products, categories):
         st.subheader("Configurar Stock y Precio de Productos")
 
         if products:
-            product_options = {f"{p['id']} - {p['name']}": p for p in products}
-            selected_product_key = st.selectbox("Selecciona un producto:",
-                                                options=list(product_options.keys()))
+            product = product_picker(system, "Selecciona un producto:", "config_select")
 
-            if selected_product_key:
-                product = product_options[selected_product_key]
+            if product:
                 product_id = str(product['id'])
 
                 # Cargar datos actuales
@@ -405,22 +780,14 @@ def show_product_management(system, products, categories):
                     new_stock = st.number_input("Nuevo stock:", min_value=0, value=current_stock, key="stock_update")
                     new_price = st.number_input("Nuevo precio:", min_value=0.0, value=float(current_price), step=0.1,
                                                 format="%.2f", key="price_update")
+                    new_sku = st.text_input("Código de barras / SKU:", value=product.get('sku') or "",
+                                            key="sku_update")
 
                 if st.button("💾 Actualizar Stock y Precio", type="primary"):
-                    # Actualizar stock
-                    stock_data[product_id] = {
-                        'quantity': new_stock,
-                        'last_updated': datetime.now().isoformat()
-                    }
-
-                    # Actualizar precio en la lista de productos
-                    for p in products:
-                        if p['id'] == product['id']:
-                            p['price'] = float(new_price)
-                            break
-
-                    # Guardar cambios
-                    if system.save_data("stock", stock_data) and system.save_data("products", products):
+                    # Guardar solo el stock y el precio de este producto
+                    if (system.set_stock(product['id'], new_stock) and
+                            system.update_product(product['id'], {'price': float(new_price),
+                                                                  'sku': normalize_sku(new_sku)})):
                         st.success(f"✅ ¡Actualizado exitosamente!")
                         st.success(f"📦 Nuevo stock: {new_stock}")
                         st.success(f"💰 Nuevo precio: ${new_price:.2f}")
@@ -432,13 +799,9 @@ def show_product_management(system, products, categories):
         st.subheader("Eliminar Productos")
 
         if products:
-            product_options = {f"{p['id']} - {p['name']}": p for p in products}
-            product_to_delete = st.selectbox("Selecciona producto a eliminar:",
-                                             options=list(product_options.keys()),
-                                             key="delete_select")
+            product = product_picker(system, "Selecciona producto a eliminar:", "delete_select")
 
-            if product_to_delete:
-                product = product_options[product_to_delete]
+            if product:
                 st.warning(
                     f"⚠️ ¿Estás seguro de que quieres eliminar **{product['name']}**? Esta acción no se puede deshacer.")
 
@@ -451,39 +814,49 @@ def show_product_management(system, products, categories):
         else:
             st.info("📝 No hay productos para eliminar.")
 
+    with tab5:
+        st.subheader("Importar Productos desde CSV/JSONL")
+        st.caption("Columnas: nombre (name), precio (price), categoria (category), "
+                   "descripcion (description), stock y sku (opcionales). Las categorías nuevas se crean solas.")
+
+        uploaded_file = st.file_uploader("Archivo de productos", type=["csv", "jsonl", "ndjson"])
 
-def show_stock_management(system, products, stock_data):
+        if uploaded_file is not None and st.button("📥 Importar Productos", type="primary"):
+            with st.spinner("Importando productos..."):
+                stream = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+                report = system.import_products(stream, detect_format(uploaded_file.name))
+
+            if report is not None:
+                st.success(f"✅ {report['imported']} de {report['rows']} productos importados "
+                           f"en {report['seconds']:.2f} s ({report['rows_per_second']:,.0f} filas/s)")
+                if report['categories_created']:
+                    st.info(f"🏷️ Categorías nuevas: {', '.join(report['categories_created'])}")
+                if report['errors']:
+                    st.warning(f"⚠️ {len(report['errors'])} filas con errores (no se importaron)")
+                    st.dataframe(pd.DataFrame(report['errors'][:200], columns=['Línea', 'Error']),
+                                 use_container_width=True)
+
+
+@metrics.timed("page.stock")
+def show_stock_management(system, data):
     """Módulo de gestión de stock"""
+    products = data.products
+    inventory = system.inventory_frame()
     st.markdown('<h2 class="section-header">📊 Control de Stock</h2>', unsafe_allow_html=True)
 
-    tab1, tab2 = st.tabs(["Estado de Stock", "Ajustar Stock"])
+    tab1, tab2, tab3 = st.tabs(["Estado de Stock", "Ajustar Stock", "Ajuste por Lote"])
 
     with tab1:
         st.subheader("Estado Actual del Stock")
 
         if products:
-            # Crear lista de productos con stock
-            stock_list = []
-            for product in products:
-                product_id = str(product['id'])
-                stock_info = stock_data.get(product_id, {})
-
-                stock_list.append({
-                    'ID': product_id,
-                    'Producto': product['name'],
-                    'Categoría': product['category'],
-                    'Precio': f"${product['price']:.2f}",
-                    'Stock Actual': stock_info.get('quantity', 0),
-                    'Última Actualización': stock_info.get('last_updated', 'Nunca')
-                })
-
-            if stock_list:
-                df_stock = pd.DataFrame(stock_list)
+            # Productos con stock: se recorta la tabla compartida en lugar de armar filas una por una
+            if not inventory.empty:
 
                 # Mostrar métricas rápidas
-                total_products = len(stock_list)
-                total_stock = sum(item['Stock Actual'] for item in stock_list)
-                out_of_stock = sum(1 for item in stock_list if item['Stock Actual'] == 0)
+                total_products = len(inventory)
+                total_stock = int(inventory['quantity'].sum())
+                out_of_stock = int((inventory['quantity'] == 0).sum())
 
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -493,7 +866,27 @@ def show_stock_management(system, products, stock_data):
                 with col3:
                     st.metric("Sin Stock", out_of_stock)
 
-                st.dataframe(df_stock, use_container_width=True)
+                # Filtros por nombre, categoría y rango de stock; se muestra una página por vez
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    name_filter = st.text_input("🔍 Buscar por nombre o ID:", key="stock_search")
+                with col2:
+                    category_filter = st.selectbox("Categoría:", ["Todas"] + sorted(inventory['category'].unique()),
+                                                   key="stock_category")
+                with col3:
+                    max_quantity = int(inventory['quantity'].max())
+                    stock_range = (0, max_quantity)
+                    if max_quantity > 0:
+                        stock_range = st.slider("Rango de stock:", 0, max_quantity, (0, max_quantity),
+                                                key="stock_range")
+                filtered = filter_inventory(inventory, name_prefix=name_filter,
+                                            category=None if category_filter == "Todas" else category_filter,
+                                            min_stock=stock_range[0], max_stock=stock_range[1])
+
+                df_stock = paginated(filtered, "stock_page")[
+                    ['id', 'name', 'category', 'price', 'quantity', 'last_updated']].rename(columns=STOCK_TABLE_COLUMNS)
+                st.dataframe(df_stock, use_container_width=True, hide_index=True,
+                             column_config={'Precio': st.column_config.NumberColumn(format="$%.2f")})
             else:
                 st.info("📝 No hay datos de stock registrados.")
         else:
@@ -506,45 +899,87 @@ def show_stock_management(system, products, stock_data):
             col1, col2, col3 = st.columns(3)
 
             with col1:
-                product_options = {f"{p['id']} - {p['name']}": p for p in products}
-                selected_product_key = st.selectbox("Producto:",
-                                                    options=list(product_options.keys()),
-                                                    key="stock_adjust")
+                product = product_picker(system, "Producto:", "stock_adjust")
 
             with col2:
                 operation = st.radio("Operación:", ["Agregar Stock", "Restar Stock", "Establecer Stock"])
                 quantity = st.number_input("Cantidad", min_value=0, value=1)
 
             with col3:
-                if selected_product_key:
-                    product = product_options[selected_product_key]
+                if product:
                     product_id = str(product['id'])
-                    current_stock = stock_data.get(product_id, {}).get('quantity', 0)
+                    current_stock = data.stock.get(product_id, {}).get('quantity', 0)
 
                     st.write(f"**Stock actual:** {current_stock}")
 
                     if st.button("Aplicar Cambio", type="primary"):
+                        # Sumar/restar sobre el stock vigente en el almacenamiento, no sobre el leído al cargar la página
                         if operation == "Agregar Stock":
-                            new_quantity = current_stock + quantity
+                            new_quantities = system.adjust_stock({product['id']: quantity})
                         elif operation == "Restar Stock":
-                            new_quantity = max(0, current_stock - quantity)
+                            new_quantities = system.adjust_stock({product['id']: -quantity}, clamp=True)
                         else:  # Establecer Stock
-                            new_quantity = quantity
+                            new_quantities = {product['id']: quantity} if system.set_stock(product['id'], quantity) else None
 
-                        stock_data[product_id] = {
-                            'quantity': new_quantity,
-                            'last_updated': datetime.now().isoformat()
-                        }
-
-                        if system.save_data("stock", stock_data):
-                            st.success(f"✅ Stock actualizado! Nuevo stock: {new_quantity}")
+                        if new_quantities is not None:
+                            st.success(f"✅ Stock actualizado! Nuevo stock: {new_quantities[product['id']]}")
                             st.rerun()
         else:
             st.info("📝 Primero agrega productos para ajustar stock.")
 
+    with tab3:
+        st.subheader("Ajustar Stock por Lote")
+        st.caption("Una línea por producto: `ID, cantidad`. `+5` o `5` suma, `-3` resta y `=20` fija el stock. "
+                   "Todos los cambios se guardan juntos en una sola escritura.")
+
+        if products:
+            pasted = st.text_area("Pegar lista de recepción:", placeholder="1, +24\n2, =10\n7, -3")
+            uploaded_file = st.file_uploader("...o subir un archivo CSV/TXT", type=["csv", "txt"],
+                                             key="stock_batch_file")
 
-def show_sales_management(system, products, sales, stock_data):
+            if uploaded_file is not None:
+                lines = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+            else:
+                lines = pasted.splitlines()
+            adjustments, errors = parse_stock_adjustments(lines)
+
+            products_by_id = {p['id']: p for p in products}
+            for adjustment in adjustments:
+                if adjustment['product_id'] not in products_by_id:
+                    errors.append(("-", f"Producto inexistente: {adjustment['product_id']}"))
+            adjustments = [a for a in adjustments if a['product_id'] in products_by_id]
+
+            if errors:
+                st.warning(f"⚠️ {len(errors)} líneas con errores (no se aplicarán)")
+                st.dataframe(pd.DataFrame(errors, columns=['Línea', 'Error']), use_container_width=True)
+
+            if adjustments:
+                preview = []
+                for adjustment in adjustments:
+                    product_id = adjustment['product_id']
+                    preview.append({
+                        'ID': product_id,
+                        'Producto': products_by_id[product_id]['name'],
+                        'Stock Actual': data.stock.get(str(product_id), {}).get('quantity', 0),
+                        'Ajuste': (f"={adjustment['quantity']}" if adjustment.get('quantity') is not None
+                                   else f"{adjustment['delta']:+d}")
+                    })
+                st.dataframe(pd.DataFrame(preview), use_container_width=True)
+
+                clamp = st.checkbox("Si una resta supera el stock, dejarlo en 0", value=False)
+                if st.button(f"Aplicar {len(adjustments)} ajustes", type="primary"):
+                    new_quantities = system.apply_stock_batch(adjustments, clamp=clamp)
+                    if new_quantities is not None:
+                        st.success(f"✅ Stock actualizado para {len(new_quantities)} productos")
+                        st.rerun()
+        else:
+            st.info("📝 Primero agrega productos para ajustar stock.")
+
+
+@metrics.timed("page.sales")
+def show_sales_management(system, data):
     """Módulo de registro de ventas"""
+    products = data.products
     st.markdown('<h2 class="section-header">💰 Registro de Ventas</h2>', unsafe_allow_html=True)
 
     tab1, tab2 = st.tabs(["Nueva Venta", "Historial de Ventas"])
@@ -560,46 +995,29 @@ def show_sales_management(system, products, sales, stock_data):
 
         if products:
             # Selección de productos para la venta
-            st.write("**Selecciona productos para la venta:**")
+            # Modo escáner: el lector escribe el código y Enter; se resuelve con el índice de SKU en memoria
+            st.text_input("📷 Escanear código:", key="scan_code", on_change=scan_to_cart, args=(system,),
+                          placeholder="Código de barras o SKU (3*código para varias unidades)")
+            scan_message = st.session_state.pop('scan_message', None)
+            if scan_message:
+                (st.success if scan_message[0] == "success" else st.error)(scan_message[1])
+
+            st.write("**O selecciona productos para la venta:**")
 
             col1, col2, col3 = st.columns([3, 2, 1])
             with col1:
-                product_options = {
-                    f"{p['id']} - {p['name']} (Stock: {stock_data.get(str(p['id']), {}).get('quantity', 0)})": p
-                    for p in products if stock_data.get(str(p['id']), {}).get('quantity', 0) > 0}
-                selected_product_key = st.selectbox("Producto:", options=list(product_options.keys()))
+                product = product_picker(system, "Producto:", "sale_product", in_stock_only=True)
 
             with col2:
                 quantity = st.number_input("Cantidad", min_value=1, value=1, key="sale_quantity")
 
             with col3:
                 if st.button("➕ Agregar"):
-                    if selected_product_key:
-                        product = product_options[selected_product_key]
-                        available_stock = stock_data.get(str(product['id']), {}).get('quantity', 0)
+                    if product:
+                        available_stock = data.stock.get(str(product['id']), {}).get('quantity', 0)
 
                         if quantity <= available_stock:
-                            # Verificar si el producto ya está en la lista
-                            existing_item = next((item for item in st.session_state.selected_products
-                                                  if item['product_id'] == product['id']), None)
-
-                            if existing_item:
-                                # Actualizar cantidad si ya existe
-                                existing_item['quantity'] += quantity
-                                existing_item['subtotal'] = existing_item['price'] * existing_item['quantity']
-                            else:
-                                # Agregar nuevo producto
-                                st.session_state.selected_products.append({
-                                    'product_id': product['id'],
-                                    'name': product['name'],
-                                    'price': product['price'],
-                                    'quantity': quantity,
-                                    'subtotal': product['price'] * quantity
-                                })
-
-                            # Recalcular total
-                            st.session_state.total_amount = sum(
-                                item['subtotal'] for item in st.session_state.selected_products)
+                            add_to_cart(product, quantity)
                             st.success(f"✅ Producto agregado a la venta")
                             st.rerun()
                         else:
@@ -632,31 +1050,17 @@ def show_sales_management(system, products, sales, stock_data):
                 # Finalizar venta
                 if st.button("💳 Finalizar Venta", type="primary"):
                     if st.session_state.selected_products:
-                        # Actualizar stock
-                        for item in st.session_state.selected_products:
-                            product_id = str(item['product_id'])
-                            current_stock = stock_data.get(product_id, {}).get('quantity', 0)
-                            new_stock = current_stock - item['quantity']
-
-                            stock_data[product_id] = {
-                                'quantity': new_stock,
-                                'last_updated': datetime.now().isoformat()
-                            }
-
-                        # Registrar venta
-                        new_sale = {
-                            "id": len(sales) + 1,
-                            "date": datetime.now().isoformat(),
-                            "products": st.session_state.selected_products.copy(),
-                            "total": st.session_state.total_amount,
-                            "items_count": sum(item['quantity'] for item in st.session_state.selected_products)
-                        }
-
-                        sales.append(new_sale)
-
-                        # Guardar cambios
-                        if system.save_data("sales", sales) and system.save_data("stock", stock_data):
-                            st.success(f"✅ Venta registrada exitosamente! Total: ${st.session_state.total_amount:.2f}")
+                        # Se reserva el stock de forma atómica (rechaza la venta si otra caja se lo llevó antes)
+                        # y se registra a precio de catálogo; si no se puede guardar, el stock se devuelve
+                        try:
+                            sale = system.record_sale(st.session_state.selected_products)
+                        except InsufficientStockError as e:
+                            item = next(i for i in st.session_state.selected_products if i['product_id'] == e.product_id)
+                            st.error(f"❌ Stock insuficiente para {item['name']}. Disponible: {e.available}")
+                            st.stop()
+
+                        if sale is not None:
+                            st.success(f"✅ Venta registrada exitosamente! Total: ${sale['total']:.2f}")
                             st.balloons()
 
                             # Limpiar productos seleccionados
@@ -671,10 +1075,31 @@ def show_sales_management(system, products, sales, stock_data):
     with tab2:
         st.subheader("Historial de Ventas")
 
-        if sales:
-            # Convertir ventas para visualización
+        sales = data.sales
+        archived_months = system.archive.months() if system.archive.available else []
+        if sales or archived_months:
+            # Filtrar por fecha sobre las fechas ISO (sin armar un DataFrame con todo el historial)
+            if sales:
+                first_date = date.fromisoformat(min(sale['date'][:10] for sale in sales))
+                last_date = date.fromisoformat(max(sale['date'][:10] for sale in sales))
+            else:
+                first_date, last_date = date.fromisoformat(archived_months[-1] + "-01"), date.today()
+            date_range = st.date_input("Rango de fechas:", value=(first_date, last_date), key="sales_history_range")
+            if archived_months:
+                st.caption(f"📦 Las ventas de {archived_months[0]} a {archived_months[-1]} están en el archivo "
+                           f"histórico: elegí un rango que incluya esos meses para verlas.")
+            if len(date_range) == 2:
+                if date_range != (first_date, last_date):
+                    start, end = date_range[0].isoformat(), date_range[1].isoformat()
+                    sales = [sale for sale in sales if start <= sale['date'][:10] <= end]
+                # Los meses archivados del rango se leen del archivo histórico (solo esos meses)
+                if archived_months and system.archive.months(date_range[0], date_range[1]):
+                    sales = system.archive.sales(date_range[0], date_range[1]) + sales
+
+            # Más recientes primero; solo se convierten las ventas de la página visible
+            page_sales = paginated(sales[::-1], "sales_page")
             sales_list = []
-            for sale in sales:
+            for sale in page_sales:
                 sales_list.append({
                     'ID': sale['id'],
                     'Fecha': sale['date'][:10],
@@ -684,15 +1109,15 @@ def show_sales_management(system, products, sales, stock_data):
                     'Total': f"${sale['total']:.2f}"
                 })
 
-            df_sales = pd.DataFrame(sales_list)
-            st.dataframe(df_sales, use_container_width=True)
+            df_sales = pd.DataFrame(sales_list, columns=['ID', 'Fecha', 'Hora', 'Productos', 'Items', 'Total'])
+            st.dataframe(df_sales, use_container_width=True, hide_index=True)
 
-            # Opción para ver detalles de una venta específica
-            sale_ids = [s['id'] for s in sales]
+            # Opción para ver detalles de una venta específica (de la página visible)
+            sale_ids = [s['id'] for s in page_sales]
             selected_sale_id = st.selectbox("Ver detalles de venta:", sale_ids)
 
             if selected_sale_id:
-                sale_detail = next(s for s in sales if s['id'] == selected_sale_id)
+                sale_detail = system.get_sale(selected_sale_id)
                 st.write("**Detalles de la venta:**")
                 for product in sale_detail['products']:
                     st.write(
@@ -702,8 +1127,12 @@ def show_sales_management(system, products, sales, stock_data):
             st.info("📝 No hay ventas registradas aún.")
 
 
-def show_reports(products, sales, stock_data):
+@metrics.timed("page.reports")
+def show_reports(system, data):
     """Módulo de reportes y estadísticas"""
+    products = data.products
+    rollup = system.sales_rollup()
+
     st.markdown('<h2 class="section-header">📈 Reportes y Estadísticas</h2>', unsafe_allow_html=True)
 
     tab1, tab2, tab3 = st.tabs(["Reportes de Ventas", "Análisis de Stock", "Métricas Generales"])
@@ -711,36 +1140,30 @@ def show_reports(products, sales, stock_data):
     with tab1:
         st.subheader("Reportes de Ventas")
 
-        if sales:
-            # Convertir datos de ventas a DataFrame
-            sales_df = pd.DataFrame(sales)
-            sales_df['date'] = pd.to_datetime(sales_df['date'])
-
+        daily_totals = rollup.days()
+        if daily_totals:
             # Filtros de fecha
             col1, col2 = st.columns(2)
             with col1:
-                start_date = st.date_input("Fecha inicial", value=sales_df['date'].min().date())
+                start_date = st.date_input("Fecha inicial", value=date.fromisoformat(min(daily_totals)))
             with col2:
-                end_date = st.date_input("Fecha final", value=sales_df['date'].max().date())
+                end_date = st.date_input("Fecha final", value=date.fromisoformat(max(daily_totals)))
 
-            # Filtrar ventas por fecha
-            filtered_sales = sales_df[
-                (sales_df['date'].dt.date >= start_date) &
-                (sales_df['date'].dt.date <= end_date)
-                ]
+            # Totales del período a partir de los acumulados diarios
+            period_totals = rollup.totals(start_date, end_date)
 
             # Métricas de ventas
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Total Ventas", len(filtered_sales))
+                st.metric("Total Ventas", period_totals['tickets'])
             with col2:
-                total_revenue = filtered_sales['total'].sum()
+                total_revenue = period_totals['revenue']
                 st.metric("Ingresos Totales", f"${total_revenue:,.2f}")
             with col3:
-                avg_sale = filtered_sales['total'].mean()
+                avg_sale = total_revenue / period_totals['tickets'] if period_totals['tickets'] else 0.0
                 st.metric("Venta Promedio", f"${avg_sale:.2f}")
             with col4:
-                total_items = filtered_sales['items_count'].sum()
+                total_items = period_totals['items']
                 st.metric("Items Vendidos", total_items)
 
             # Gráficos
@@ -748,56 +1171,54 @@ def show_reports(products, sales, stock_data):
 
             with col1:
                 # Ventas por día
-                daily_sales = filtered_sales.groupby(filtered_sales['date'].dt.date)['total'].sum().reset_index()
-                fig = px.line(daily_sales, x='date', y='total',
-                              title='Ventas Diarias', labels={'total': 'Ingresos', 'date': 'Fecha'})
-                st.plotly_chart(fig, use_container_width=True)
+                with metrics.timer("chart.daily_sales"):
+                    fig = system.figures.get("daily_sales", rollup.signature(), (start_date, end_date),
+                                             lambda: daily_sales_figure(rollup.days(start_date, end_date)))
+                    st.plotly_chart(fig, use_container_width=True)
 
             with col2:
-                # Productos más vendidos
-                all_products = []
-                for sale in filtered_sales.to_dict('records'):
-                    for product in sale['products']:
-                        all_products.append(product)
-
-                if all_products:
-                    products_df = pd.DataFrame(all_products)
-                    top_products = products_df.groupby('name')['quantity'].sum().nlargest(10)
-                    fig = px.bar(top_products, x=top_products.values, y=top_products.index,
-                                 orientation='h', title='Productos Más Vendidos',
-                                 labels={'x': 'Cantidad Vendida', 'y': 'Producto'})
-                    st.plotly_chart(fig, use_container_width=True)
+                # Productos más vendidos: para el historial completo se usa el ranking precalculado
+                full_range = (start_date <= date.fromisoformat(min(daily_totals))
+                              and end_date >= date.fromisoformat(max(daily_totals)))
+                report = system.precomputed_report('top_products') if full_range else None
+                with metrics.timer("chart.top_products"):
+                    if report is not None:
+                        fig = system.figures.get("top_products", report['version'], report['computed_at'],
+                                                 lambda: top_products_figure(pd.Series(
+                                                     [row['quantity'] for row in report['data']],
+                                                     index=[row['name'] for row in report['data']], dtype=float)))
+                    else:
+                        fig = system.figures.get("top_products", system.sales_version(), (start_date, end_date),
+                                                 lambda: top_products_figure(
+                                                     period_top_products(system, start_date, end_date)))
+                    if fig is not None:
+                        st.plotly_chart(fig, use_container_width=True)
+                if report is not None:
+                    computed_at_caption(report)
         else:
             st.info("📝 No hay ventas registradas para generar reportes.")
 
     with tab2:
         st.subheader("Análisis de Stock")
 
-        if products and stock_data:
-            # Datos de stock para análisis
-            stock_analysis = []
-            for product in products:
-                product_id = str(product['id'])
-                stock_info = stock_data.get(product_id, {})
-                stock_quantity = stock_info.get('quantity', 0)
-
-                stock_analysis.append({
-                    'Producto': product['name'],
-                    'Categoría': product['category'],
-                    'Stock Actual': stock_quantity,
-                    'Estado': 'Sin Stock' if stock_quantity == 0 else 'Con Stock'
-                })
-
-            df_stock_analysis = pd.DataFrame(stock_analysis)
+        if products and data.stock:
+            # Datos de stock para análisis (vectorizado sobre la tabla compartida)
+            inventory = system.inventory_frame()
+            df_stock_analysis = pd.DataFrame({
+                'Producto': inventory['name'],
+                'Categoría': inventory['category'],
+                'Stock Actual': inventory['quantity'],
+                'Estado': np.where(inventory['quantity'] == 0, 'Sin Stock', 'Con Stock')
+            })
 
             # Gráfico de estado de stock
-            status_counts = df_stock_analysis['Estado'].value_counts()
-            fig = px.pie(values=status_counts.values, names=status_counts.index,
-                         title='Estado del Stock')
-            st.plotly_chart(fig, use_container_width=True)
+            with metrics.timer("chart.stock_status"):
+                fig = system.figures.get("stock_status", system.data_version("products", "stock"), None,
+                                         lambda: stock_status_figure(inventory))
+                st.plotly_chart(fig, use_container_width=True)
 
             # Tabla de análisis
-            st.dataframe(df_stock_analysis, use_container_width=True)
+            st.dataframe(df_stock_analysis, use_container_width=True, hide_index=True)
         else:
             st.info("📝 No hay datos suficientes para análisis de stock.")
 
@@ -809,15 +1230,13 @@ def show_reports(products, sales, stock_data):
         with col1:
             st.write("**Resumen de Productos:**")
             if products:
-                total_products = len(products)
-                categories = len(set(p['category'] for p in products))
-                avg_price = sum(p['price'] for p in products) / total_products
+                inventory = system.inventory_frame()
+                total_products = len(inventory)
+                categories = inventory['category'].nunique()
+                avg_price = inventory['price'].mean()
 
                 # Calcular stock total
-                total_stock = 0
-                for product in products:
-                    product_id = str(product['id'])
-                    total_stock += stock_data.get(product_id, {}).get('quantity', 0)
+                total_stock = int(inventory['quantity'].sum())
 
                 st.write(f"- Total de productos: {total_products}")
                 st.write(f"- Categorías: {categories}")
@@ -828,10 +1247,11 @@ def show_reports(products, sales, stock_data):
 
         with col2:
             st.write("**Resumen de Ventas:**")
-            if sales:
-                total_sales = len(sales)
-                total_revenue = sum(s['total'] for s in sales)
-                total_items = sum(s['items_count'] for s in sales)
+            sales_totals = rollup.totals()
+            if sales_totals['tickets']:
+                total_sales = sales_totals['tickets']
+                total_revenue = sales_totals['revenue']
+                total_items = sales_totals['items']
                 avg_sale_value = total_revenue / total_sales
 
                 st.write(f"- Total de ventas: {total_sales}")
@@ -841,6 +1261,52 @@ def show_reports(products, sales, stock_data):
             else:
                 st.write("No hay ventas registradas")
 
+        # Reportes que se calculan en segundo plano: se muestra al instante la última versión calculada
+        st.subheader("Reportes Precalculados")
+        col1, col2, col3 = st.columns(3)
+
+        with col1:
+            st.write("**Ventas por Mes:**")
+            report = system.precomputed_report('sales_by_month')
+            if report is not None:
+                st.dataframe(pd.DataFrame(report['data'], columns=['month', 'total', 'items', 'tickets']).rename(
+                    columns={'month': 'Mes', 'total': 'Ingresos', 'items': 'Items', 'tickets': 'Ventas'}),
+                    use_container_width=True, hide_index=True)
+                computed_at_caption(report)
+            else:
+                st.caption("⏳ Calculando...")
+
+        with col2:
+            st.write("**Ventas por Categoría:**")
+            report = system.precomputed_report('category_sales')
+            if report is not None:
+                st.dataframe(pd.DataFrame(report['data'], columns=['category', 'subtotal']).rename(
+                    columns={'category': 'Categoría', 'subtotal': 'Ingresos'}),
+                    use_container_width=True, hide_index=True)
+                computed_at_caption(report)
+            else:
+                st.caption("⏳ Calculando...")
+
+        with col3:
+            st.write("**Stock por Categoría:**")
+            report = system.precomputed_report('stock_status')
+            if report is not None:
+                status = report['data']
+                st.write(f"- Con stock: {status['with_stock']} · Sin stock: {status['without_stock']}")
+                st.write(f"- Valor del stock: ${status['value']:,.2f}")
+                st.dataframe(pd.DataFrame(status['by_category'], columns=['category', 'stock', 'stock_value']).rename(
+                    columns={'category': 'Categoría', 'stock': 'Unidades', 'stock_value': 'Valor'}),
+                    use_container_width=True, hide_index=True)
+                computed_at_caption(report)
+            else:
+                st.caption("⏳ Calculando...")
+
+        if st.button("🔄 Recalcular reportes"):
+            if system.refresh_reports():
+                st.info("⏳ Recalculando en segundo plano; recargá la página en unos segundos.")
+            else:
+                st.info("Los reportes los calcula otro proceso (python manage.py precompute-reports --watch).")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
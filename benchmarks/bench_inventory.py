@@ -0,0 +1,206 @@
+"""Benchmarks del sistema sobre datos sintéticos: carga/guardado, ventas, reposición, consultas y reportes.
+
+Uso:
+    python benchmarks/bench_inventory.py [--scale 1k|100k|1m] [--backend json|sqlite] [--repeat 3]
+                                         [--checkouts 200] [--output resultados.json]
+                                         [--compare base.json] [--threshold 1.25]
+
+Las opciones de synthetic.py (--skus, --categories, --years, --sales-per-day,
+--lines-per-sale) ajustan la escala elegida. Con --output los resultados se
+guardan en JSON; con --compare se comparan contra una corrida anterior y el
+proceso termina con código 1 si algún caso es más lento que threshold veces.
+"""
+import argparse
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SCALES, write_dataset  # noqa: E402
+from modules import serializer  # noqa: E402
+from modules.atomic import write_json  # noqa: E402
+from modules.cache import CachedStorage  # noqa: E402
+from modules.catalog import inventory_frame  # noqa: E402
+from modules.managers import Inventory, SalesManager  # noqa: E402
+from modules.rollups import to_frame  # noqa: E402
+from modules.search import CatalogSearch  # noqa: E402
+from modules.storage import create_storage  # noqa: E402
+
+
+class Bench:
+    """Mide cada caso (mejor de repeat corridas) y guarda los resultados por nombre"""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, func, ops=1, repeat=None):
+        runs = []
+        value = None
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            value = func()
+            runs.append(time.perf_counter() - started)
+        best = min(runs)
+        self.results[name] = {"seconds": best, "runs": runs, "ops": ops}
+        per_op = f"  ({best / ops * 1000:.3f} ms/op, {ops / best:,.0f} op/s)" if ops > 1 else ""
+        print(f"{name:<36}{best * 1000:>12.1f} ms{per_op}")
+        return value
+
+
+def dashboard_metrics(inventory):
+    """Los cálculos de show_dashboard() sin Streamlit: métricas, ventas diarias y stock por categoría"""
+    products = inventory.products.load_products()
+    frame = inventory_frame(products, inventory.stock.load_stock())
+    totals = inventory.sales.rollup.totals()
+    out_of_stock = int((frame['quantity'] == 0).sum())
+    daily_sales = to_frame(inventory.sales.rollup.days())
+    daily_sales['date'] = daily_sales['date'].astype('datetime64[ns]')
+    categories_stock = frame.groupby('category', sort=False)['quantity'].sum()
+    return len(products), totals['tickets'], totals['revenue'], out_of_stock, len(daily_sales), len(categories_stock)
+
+
+def run_benchmarks(data_dir, backend, repeat, checkouts, seed=0):
+    bench = Bench(repeat)
+    storage = create_storage(backend, data_dir)
+    rng = random.Random(seed)
+
+    # Lectura y escritura de documentos completos (sin caché)
+    products = bench.run("load.products", lambda: storage.load("products"))
+    stock = bench.run("load.stock", lambda: storage.load("stock"))
+    sales = bench.run("load.sales", lambda: storage.load("sales"))
+    bench.run("save.products", lambda: storage.save("products", products))
+    bench.run("save.stock", lambda: storage.save("stock", stock))
+    last_day = date.fromisoformat(sales[-1]['date'][:10]) if sales else date.today()
+    del sales
+
+    inventory = Inventory(storage=CachedStorage(storage))
+    bench.run("rollups.rebuild", inventory.sales.rebuild_rollups, repeat=1)
+    bench.run("dashboard.metrics", lambda: dashboard_metrics(inventory))
+
+    # Ventas: reserva atómica de stock + registro + totales precalculados
+    in_stock = [int(product_id) for product_id, entry in stock.items() if entry.get('quantity', 0) >= 10]
+    carts = [[{"product_id": rng.choice(in_stock), "quantity": 1} for _ in range(rng.randint(1, 5))]
+             for _ in range(checkouts)]
+    bench.run("checkout", lambda: [inventory.record_sale(cart) for cart in carts], ops=checkouts, repeat=1)
+
+    # Reposición: un lote de recepción y ajustes de a uno
+    batch = [{"product_id": rng.choice(in_stock), "delta": rng.randint(1, 50)} for _ in range(1000)]
+    bench.run("restock.batch_1000", lambda: inventory.stock.apply_batch(batch))
+    bench.run("restock.single", lambda: [inventory.stock.update_stock(item['product_id'], item['delta'])
+                                         for item in batch[:100]], ops=100, repeat=1)
+
+    # Consultas de ventas: índice por fecha (en frío y ya armado)
+    bench.run("sales.date_index_cold", lambda: SalesManager(storage=inventory.storage).get_daily_sales(last_day))
+    inventory.sales.get_daily_sales(last_day)
+    bench.run("sales.get_daily_sales", lambda: inventory.sales.get_daily_sales(last_day))
+    bench.run("sales.get_monthly_sales", lambda: inventory.sales.get_monthly_sales(last_day.year, last_day.month))
+
+    # Reportes
+    month_start = datetime.combine(last_day - timedelta(days=30), datetime.min.time())
+    month_end = datetime.combine(last_day, datetime.max.time())
+    bench.run("report.sales_30_days", lambda: inventory.reports.generate_sales_report(month_start, month_end))
+    bench.run("report.sales_by_day", lambda: inventory.reports.generate_sales_report(group_by='day'))
+    bench.run("report.top_products", lambda: inventory.reports.generate_top_products_report(10))
+    bench.run("report.stock", inventory.reports.generate_stock_report)
+
+    # Búsqueda de productos (índice invertido)
+    search = CatalogSearch(inventory.storage)
+    bench.run("search.build", search.index, repeat=1)
+    queries = ["cuad", "lapiz azul", "goma eco", "779000000", "categoria 1"]
+    bench.run("search.query", lambda: [search.search(query, 20) for query in queries], ops=len(queries))
+    return bench.results
+
+
+def compare(results, baseline, threshold):
+    """Imprime la comparación con una corrida anterior; devuelve los casos más lentos que threshold"""
+    regressions = []
+    print(f"\n{'Caso':<36}{'Base ms':>12}{'Actual ms':>12}{'Relación':>10}")
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        ratio = result["seconds"] / previous["seconds"] if previous["seconds"] else float("inf")
+        flag = "  << más lento" if ratio > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<36}{previous['seconds'] * 1000:>12.1f}{result['seconds'] * 1000:>12.1f}{ratio:>9.2f}x{flag}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del sistema de stock y ventas")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--skus", type=int)
+    parser.add_argument("--categories", type=int)
+    parser.add_argument("--years", type=int)
+    parser.add_argument("--sales-per-day", type=int)
+    parser.add_argument("--lines-per-sale", type=int)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso (se informa la mejor)")
+    parser.add_argument("--checkouts", type=int, default=200, help="Ventas a registrar en el caso checkout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="Directorio de trabajo (por defecto uno temporal que se borra)")
+    parser.add_argument("--output", help="Guarda los resultados en este archivo JSON")
+    parser.add_argument("--compare", help="Resultados JSON de una corrida anterior")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Relación a partir de la cual es regresión")
+    args = parser.parse_args(argv)
+
+    params = dict(SCALES[args.scale])
+    params.update({key: value for key, value in vars(args).items() if key in params and value is not None})
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench_inventory_")
+
+    try:
+        started = time.perf_counter()
+        counts = write_dataset(data_dir, seed=args.seed, **params)
+        print(f"Datos: {counts['products']:,} productos, {counts['sales']:,} ventas, {counts['sale_lines']:,} líneas "
+              f"(generados en {time.perf_counter() - started:.1f} s)\n")
+        results = run_benchmarks(data_dir, args.backend, args.repeat, args.checkouts, args.seed)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "scale": args.scale,
+            "params": params,
+            "counts": counts,
+            "backend": args.backend,
+            "serializer": serializer.backend(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_revision(),
+            "date": datetime.now().isoformat()
+        },
+        "results": results
+    }
+    if args.output:
+        write_json(args.output, report, pretty=True)
+        print(f"\nResultados guardados en {args.output}")
+    if args.compare:
+        baseline = serializer.load_file(args.compare)
+        for key in ("params", "backend", "serializer"):
+            if baseline.get("meta", {}).get(key) != report["meta"][key]:
+                print(f"\nAtención: la corrida base usa otro {key} ({baseline.get('meta', {}).get(key)})")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            raise SystemExit(f"\n{len(regressions)} casos más lentos que {args.threshold}x: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
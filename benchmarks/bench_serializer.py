@@ -0,0 +1,90 @@
+"""Compara la serialización de ventas: json de la biblioteca estándar vs orjson, con y sin sangría.
+
+Uso:
+    python benchmarks/bench_serializer.py [--sales 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import serializer  # noqa: E402
+
+
+def make_sales(count, seed=0):
+    """Ventas sintéticas con el mismo formato que data/sales.json"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    sales = []
+    for sale_id in range(1, count + 1):
+        products = []
+        for _ in range(rng.randint(1, 4)):
+            price = round(rng.uniform(100, 5000), 2)
+            quantity = rng.randint(1, 5)
+            product_id = rng.randint(1, 500)
+            products.append({
+                'product_id': product_id,
+                'name': f"Producto {product_id}",
+                'price': price,
+                'quantity': quantity,
+                'subtotal': round(price * quantity, 2)
+            })
+        sales.append({
+            "id": sale_id,
+            "date": (start + timedelta(minutes=sale_id * 7)).isoformat(),
+            "products": products,
+            "total": round(sum(p['subtotal'] for p in products), 2),
+            "items_count": sum(p['quantity'] for p in products)
+        })
+    return sales
+
+
+def best_of(repeat, func):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de serialización JSON")
+    parser.add_argument("--sales", type=int, default=100000, help="Cantidad de ventas sintéticas")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones (se informa la mejor)")
+    args = parser.parse_args(argv)
+
+    sales = make_sales(args.sales)
+    candidates = [
+        ("json indent=2 (formato anterior)",
+         lambda: json.dumps(sales, indent=2, ensure_ascii=False).encode("utf-8"), json.loads),
+        ("json compacto",
+         lambda: json.dumps(sales, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), json.loads),
+    ]
+    if serializer.orjson is not None:
+        orjson = serializer.orjson
+        candidates += [
+            ("orjson indent=2", lambda: orjson.dumps(sales, option=orjson.OPT_INDENT_2), orjson.loads),
+            ("orjson compacto", lambda: orjson.dumps(sales), orjson.loads),
+        ]
+    else:
+        print("orjson no está instalado (pip install orjson): solo se mide json")
+
+    print(f"{args.sales} ventas, mejor de {args.repeat}\n")
+    print(f"{'Serializador':<34}{'Tamaño MB':>10}{'Escritura ms':>14}{'Lectura ms':>12}")
+    for name, dump, load in candidates:
+        dump_time, data = best_of(args.repeat, dump)
+        load_time, _ = best_of(args.repeat, lambda: load(data))
+        print(f"{name:<34}{len(data) / 1e6:>10.1f}{dump_time * 1000:>14.0f}{load_time * 1000:>12.0f}")
+    print(f"\nEn uso: {serializer.backend()}, {'con' if serializer.PRETTY else 'sin'} sangría")
+
+
+if __name__ == "__main__":
+    main()
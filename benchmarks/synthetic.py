@@ -0,0 +1,126 @@
+"""Generador de datos sintéticos: catálogo, stock e historial de ventas con el formato de data/.
+
+Uso:
+    python benchmarks/synthetic.py OUT_DIR [--skus 100000] [--categories 50] [--years 2]
+                                           [--sales-per-day 200] [--lines-per-sale 3] [--seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.atomic import write_json  # noqa: E402
+
+WORDS = ["Cuaderno", "Lápiz", "Lapicera", "Goma", "Regla", "Carpeta", "Mochila", "Tijera", "Compás", "Resma",
+         "Marcador", "Cartulina", "Abrochadora", "Cinta", "Pegamento", "Sobre", "Agenda", "Block", "Fibra",
+         "Corrector"]
+ADJECTIVES = ["Éxito", "Rivadavia", "Azul", "Rojo", "Negro", "Verde", "A4", "Oficio", "Escolar", "Premium",
+              "Eco", "Grande", "Chico", "Rayado", "Cuadriculado"]
+
+# Escalas predefinidas para bench_inventory.py
+SCALES = {
+    "1k": {"skus": 1000, "categories": 10, "years": 1, "sales_per_day": 20, "lines_per_sale": 3},
+    "100k": {"skus": 100000, "categories": 50, "years": 2, "sales_per_day": 200, "lines_per_sale": 3},
+    "1m": {"skus": 1000000, "categories": 200, "years": 3, "sales_per_day": 1000, "lines_per_sale": 3},
+}
+
+
+def make_catalog(skus, categories, seed=0):
+    """Productos, stock y categorías sintéticos: (products, stock, categories)"""
+    rng = random.Random(seed)
+    category_names = [f"Categoría {number}" for number in range(1, categories + 1)]
+    now = datetime.now().isoformat()
+    products = []
+    stock = {}
+    for product_id in range(1, skus + 1):
+        products.append({
+            "id": product_id,
+            "name": f"{rng.choice(WORDS)} {rng.choice(ADJECTIVES)} {product_id}",
+            "price": round(rng.uniform(50, 20000), 2),
+            "category": category_names[product_id % categories],
+            "description": f"{rng.choice(WORDS)} {rng.choice(ADJECTIVES)}".lower(),
+            "created_at": now,
+            "sku": f"779{product_id:010d}"
+        })
+        # Alrededor de un 5% sin stock, como en un catálogo real
+        stock[str(product_id)] = {"quantity": 0 if rng.random() < 0.05 else rng.randint(1, 500),
+                                  "last_updated": now}
+    return products, stock, category_names
+
+
+def iter_sales(products, years, sales_per_day, lines_per_sale, seed=0, end=None):
+    """Historial de ventas de los últimos years años (sales_per_day ventas por día, en orden de fecha).
+
+    La cantidad de líneas de cada venta varía entre 1 y 2 * lines_per_sale - 1
+    (promedio lines_per_sale); los productos más vendidos siguen una
+    distribución sesgada (unos pocos concentran la mayoría de las ventas).
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=365 * years)
+    seconds_between = 86400 / max(sales_per_day, 1)
+    sale_id = 0
+    day = start
+    while day < end:
+        midnight = datetime(day.year, day.month, day.day)
+        for number in range(sales_per_day):
+            sale_id += 1
+            lines = []
+            for _ in range(rng.randint(1, 2 * lines_per_sale - 1)):
+                product = products[min(int(rng.paretovariate(1.2)) - 1, len(products) - 1)
+                                   if rng.random() < 0.5 else rng.randrange(len(products))]
+                quantity = rng.randint(1, 5)
+                lines.append({
+                    'product_id': product['id'],
+                    'name': product['name'],
+                    'price': product['price'],
+                    'quantity': quantity,
+                    'subtotal': round(product['price'] * quantity, 2)
+                })
+            yield {
+                "id": sale_id,
+                "date": (midnight + timedelta(seconds=number * seconds_between)).isoformat(),
+                "products": lines,
+                "total": round(sum(line['subtotal'] for line in lines), 2),
+                "items_count": sum(line['quantity'] for line in lines)
+            }
+        day += timedelta(days=1)
+
+
+def write_dataset(data_dir, skus, categories, years, sales_per_day, lines_per_sale, seed=0):
+    """Escribe un conjunto de datos completo en data_dir (JSON); devuelve la cantidad de registros"""
+    os.makedirs(data_dir, exist_ok=True)
+    products, stock, category_names = make_catalog(skus, categories, seed)
+    sales = list(iter_sales(products, years, sales_per_day, lines_per_sale, seed))
+    write_json(os.path.join(data_dir, "products.json"), products)
+    write_json(os.path.join(data_dir, "stock.json"), stock)
+    write_json(os.path.join(data_dir, "categories.json"), category_names)
+    write_json(os.path.join(data_dir, "sales.json"), sales)
+    return {"products": len(products), "sales": len(sales),
+            "sale_lines": sum(len(sale['products']) for sale in sales)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con el formato de data/")
+    parser.add_argument("out_dir")
+    parser.add_argument("--scale", choices=sorted(SCALES), help="Escala predefinida (las demás opciones la ajustan)")
+    parser.add_argument("--skus", type=int)
+    parser.add_argument("--categories", type=int)
+    parser.add_argument("--years", type=int)
+    parser.add_argument("--sales-per-day", type=int)
+    parser.add_argument("--lines-per-sale", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    params = dict(SCALES[args.scale or "1k"])
+    params.update({key: value for key, value in vars(args).items() if key in params and value is not None})
+    counts = write_dataset(args.out_dir, seed=args.seed, **params)
+    print(f"{counts['products']} productos, {counts['sales']} ventas ({counts['sale_lines']} líneas) "
+          f"en {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
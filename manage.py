@@ -0,0 +1,126 @@
+"""Tareas de mantenimiento del sistema de stock y ventas.
+
+Uso:
+    python manage.py rebuild-rollups [--data-dir data] [--backend json|sqlite]
+    python manage.py archive-sales [--before AAAA-MM-DD]
+    python manage.py import-products ARCHIVO.csv|ARCHIVO.jsonl [--max-errors N]
+    python manage.py compact
+    python manage.py precompute-reports [--watch] [--interval 10] [--force]
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+from modules.archive import SalesArchive
+from modules.bulk_import import detect_format, import_products
+from modules.cache import CachedStorage
+from modules.managers import Inventory
+from modules.precompute import ReportWorker
+from modules.rollups import SalesRollup
+from modules.storage import create_storage
+
+
+def rebuild_rollups(args):
+    """Recalcula los totales de ventas precalculados desde el historial"""
+    storage = create_storage(args.backend, args.data_dir)
+    rollup = SalesRollup(os.path.join(args.data_dir, "rollups.json"))
+    archive = SalesArchive(os.path.join(args.data_dir, "archive"))
+    data = rollup.rebuild(archive.sales() + storage.load("sales"), storage.load("products"))
+    print(f"Totales reconstruidos: {len(data['days'])} días, {len(data['months'])} meses, "
+          f"{len(data['products'])} productos, {len(data['categories'])} categorías")
+
+
+def archive_sales(args):
+    """Mueve las ventas de meses cerrados al archivo histórico (Arrow IPC)"""
+    storage = create_storage(args.backend, args.data_dir)
+    archive = SalesArchive(os.path.join(args.data_dir, "archive"))
+    before = date.fromisoformat(args.before) if args.before else None
+    archived = archive.roll_closed_months(storage, before)
+
+    if not archived:
+        print("No hay meses cerrados para archivar")
+    for month, count in archived.items():
+        print(f"{month}: {count} ventas archivadas")
+
+
+def import_products_file(args):
+    """Importa productos y su stock inicial desde un archivo CSV o JSONL"""
+    storage = create_storage(args.backend, args.data_dir)
+    with open(args.file, 'r', encoding='utf-8-sig', newline='') as f:
+        try:
+            report = import_products(storage, f, detect_format(args.file), args.max_errors)
+        except ValueError as e:
+            raise SystemExit(str(e))
+
+    for line_number, error in report["errors"]:
+        print(f"Línea {line_number}: {error}")
+    if report["categories_created"]:
+        print(f"Categorías nuevas: {', '.join(report['categories_created'])}")
+    print(f"{report['imported']} de {report['rows']} productos importados en {report['seconds']:.2f} s "
+          f"({report['rows_per_second']:,.0f} filas/s)")
+
+
+def compact(args):
+    """Vuelca los logs de cambios (ventas, productos y stock) en sus archivos base"""
+    create_storage(args.backend, args.data_dir).compact()
+    print("Datos compactados")
+
+
+def precompute_reports(args):
+    """Calcula los reportes precalculados que estén desactualizados (una vez, o en bucle con --watch)"""
+    inventory = Inventory(storage=CachedStorage(create_storage(args.backend, args.data_dir)))
+    worker = ReportWorker(inventory, interval=args.interval)
+    force = args.force
+    while True:
+        computed = worker.run_once(force)
+        for name, seconds in computed.items():
+            print(f"{name}: calculado en {seconds:.2f} s")
+        for name, error in worker.errors.items():
+            print(f"{name}: error: {error}")
+        if not args.watch:
+            if not computed and not worker.errors:
+                print("Los reportes ya estaban al día")
+            break
+        force = False
+        time.sleep(args.interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tareas de mantenimiento del sistema de stock y ventas")
+    parser.add_argument("--data-dir", default="data", help="Carpeta de datos (por defecto: data)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default=None,
+                        help="Backend de almacenamiento (por defecto: INVENTORY_BACKEND o json)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("rebuild-rollups", help="Recalcula los totales por día, mes, producto y categoría") \
+        .set_defaults(func=rebuild_rollups)
+
+    archive_parser = subparsers.add_parser("archive-sales", help="Mueve los meses cerrados al archivo histórico")
+    archive_parser.add_argument("--before", help="Archivar ventas anteriores a esta fecha (por defecto: inicio del mes)")
+    archive_parser.set_defaults(func=archive_sales)
+
+    import_parser = subparsers.add_parser("import-products", help="Importa productos y stock desde CSV/JSONL")
+    import_parser.add_argument("file", help="Archivo .csv o .jsonl")
+    import_parser.add_argument("--max-errors", type=int, default=None,
+                               help="Cancelar la importación si hay más errores que este número")
+    import_parser.set_defaults(func=import_products_file)
+
+    subparsers.add_parser("compact", help="Vuelca los logs de cambios en los archivos de datos") \
+        .set_defaults(func=compact)
+
+    precompute_parser = subparsers.add_parser("precompute-reports",
+                                              help="Calcula los reportes que muestra la app (data/reports/)")
+    precompute_parser.add_argument("--watch", action="store_true",
+                                   help="Seguir corriendo y recalcular cuando cambien los datos")
+    precompute_parser.add_argument("--interval", type=float, default=10,
+                                   help="Segundos entre revisiones con --watch (por defecto: 10)")
+    precompute_parser.add_argument("--force", action="store_true", help="Recalcular aunque estén al día")
+    precompute_parser.set_defaults(func=precompute_reports)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import os
+import threading
+from datetime import date
+
+
+import pandas as pd
+
+
+try:
+   import pyarrow as pa
+   import pyarrow.compute as pc
+   import pyarrow.ipc
+except ImportError:  # pyarrow es opcional: sin él no hay archivo histórico
+   pa = None
+
+
+from modules.atomic import write_atomic, write_json
+from modules.columnar import SalesLines
+from modules.serializer import DecodeError, load_file
+from modules.storage import file_signature
+
+
+
+
+def _schema():
+   return pa.schema([
+       ("sale_id", pa.int64()),
+       ("date", pa.timestamp("us")),
+       ("total", pa.float64()),
+       ("items_count", pa.int64()),
+       ("product_id", pa.int64()),
+       ("name", pa.string()),
+       ("price", pa.float64()),
+       ("quantity", pa.int64()),
+       ("subtotal", pa.float64())
+   ])
+
+
+
+
+def _month_bounds(start_date, end_date):
+   start = pd.Timestamp(start_date).isoformat()[:7] if start_date else None
+   end = pd.Timestamp(end_date).isoformat()[:7] if end_date else None
+   return start, end
+
+
+
+
+class SalesArchive:
+   """Archivo histórico de ventas en formato Arrow IPC, un archivo por mes cerrado.
+
+
+   Los archivos se abren con memory-map (un mapeo por mes, reutilizado hasta
+   que el archivo cambie) y solo se leen los meses que tocan el rango de
+   fechas pedido, así el historial no queda cargado en memoria.
+   """
+
+
+   def __init__(self, archive_dir="data/archive"):
+       self.archive_dir = archive_dir
+       self.manifest_file = os.path.join(archive_dir, "manifest.json")
+       self._tables = {}
+       self._lock = threading.Lock()
+
+
+   @property
+   def available(self):
+       """pyarrow instalado"""
+       return pa is not None
+
+
+   def manifest(self):
+       """{'months': {AAAA-MM: cantidad de ventas}, 'ids': {AAAA-MM: [primer ID, último ID]}, 'last_sale_id': n}"""
+       try:
+           return load_file(self.manifest_file)
+       except (FileNotFoundError, DecodeError):
+           return {"months": {}, "ids": {}, "last_sale_id": 0}
+
+
+   @property
+   def last_sale_id(self):
+       return self.manifest()["last_sale_id"]
+
+
+   def months(self, start_date=None, end_date=None):
+       """Meses archivados que se superponen con el rango"""
+       start, end = _month_bounds(start_date, end_date)
+       return sorted(month for month in self.manifest()["months"]
+                     if (start is None or month >= start) and (end is None or month <= end))
+
+
+   def read(self, start_date=None, end_date=None, columns=None):
+       """Tabla Arrow de las líneas archivadas en el rango (días completos)"""
+       self._require_pyarrow()
+       tables = []
+       for month in self.months(start_date, end_date):
+           table = self._table(month)
+           tables.append(table if columns is None else table.select(columns))
+
+
+       if not tables:
+           table = _schema().empty_table()
+           return table if columns is None else table.select(columns)
+
+
+       table = pa.concat_tables(tables)
+       if start_date is not None:
+           start = pa.scalar(pd.Timestamp(start_date).normalize().to_pydatetime(), pa.timestamp("us"))
+           table = table.filter(pc.greater_equal(table["date"], start))
+       if end_date is not None:
+           end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+           table = table.filter(pc.less(table["date"], pa.scalar(end.to_pydatetime(), pa.timestamp("us"))))
+       return table
+
+
+   def sales_lines(self, start_date=None, end_date=None):
+       """Líneas archivadas del rango en formato columnar"""
+       if not self.available or not self.months(start_date, end_date):
+           return SalesLines()
+       table = self.read(start_date, end_date)
+       table = table.filter(pc.is_valid(table["product_id"]))  # sin las filas de ventas sin productos
+       columns = {
+           "sale_id": table["sale_id"].to_numpy(),
+           "date": table["date"].to_numpy().astype("datetime64[us]"),
+           "product_id": table["product_id"].to_numpy(),
+           "quantity": table["quantity"].to_numpy(),
+           "price": table["price"].to_numpy(),
+           "subtotal": table["subtotal"].to_numpy(),
+           "name": pd.Categorical(table["name"].to_numpy(zero_copy_only=False))
+       }
+       return SalesLines(columns)
+
+
+   def sales(self, start_date=None, end_date=None):
+       """Ventas archivadas del rango, con el mismo formato que data/sales.json"""
+       if not self.available or not self.months(start_date, end_date):
+           return []
+       return self._sales_from_rows(self.read(start_date, end_date).to_pylist())
+
+
+   def get_sale(self, sale_id):
+       """Venta archivada por ID, o None si no está en el archivo (lee solo el mes que la contiene)"""
+       manifest = self.manifest()
+       if not self.available or sale_id > manifest["last_sale_id"]:
+           return None
+       for month, (first, last) in sorted(manifest["ids"].items(), reverse=True):
+           if not first <= sale_id <= last:
+               continue
+           table = self._table(month)
+           rows = table.filter(pc.equal(table["sale_id"], sale_id))
+           if rows.num_rows:
+               return self._sales_from_rows(rows.to_pylist())[0]
+       return None
+
+
+   def close(self):
+       """Libera los archivos mapeados en memoria (se vuelven a abrir al usarlos)"""
+       with self._lock:
+           for _, source, _ in self._tables.values():
+               source.close()
+           self._tables = {}
+
+
+
+
+   def roll_closed_months(self, storage, before=None):
+       """Mueve las ventas de meses cerrados (anteriores a before) del almacenamiento al archivo.
+
+
+       Todo ocurre con las ventas bloqueadas (storage.rewrite_sales), así una
+       venta registrada mientras tanto no se pierde. Primero se escriben los
+       archivos del archivo histórico y después se reescribe el almacenamiento
+       vivo; si el proceso se corta en el medio, las ventas que ya estaban en el
+       archivo se descartan (por ID) al volver a ejecutarlo.
+       """
+       self._require_pyarrow()
+       cutoff = (before or date.today().replace(day=1)).isoformat()[:10]
+       archived = {}
+
+
+       def roll(sales):
+           manifest = self.manifest()
+           by_month = {}
+           for sale in sales:
+               if sale['date'][:10] < cutoff:
+                   by_month.setdefault(sale['date'][:7], []).append(sale)
+
+
+           os.makedirs(self.archive_dir, exist_ok=True)
+           for month, month_sales in sorted(by_month.items()):
+               tables = []
+               if month in manifest["months"]:
+                   with pa.OSFile(self._month_file(month), 'rb') as source:
+                       tables.append(pa.ipc.open_file(source).read_all())
+                   already_archived = set(tables[0]["sale_id"].to_pylist())
+                   month_sales = [s for s in month_sales if s['id'] not in already_archived]
+                   if not month_sales:
+                       continue
+               tables.append(self._table_from_sales(month_sales))
+               self._write_table(self._month_file(month), pa.concat_tables(tables))
+               manifest["months"][month] = manifest["months"].get(month, 0) + len(month_sales)
+               ids = [s['id'] for s in month_sales] + manifest["ids"].get(month, [])
+               manifest["ids"][month] = [min(ids), max(ids)]
+               manifest["last_sale_id"] = max(manifest["last_sale_id"], max(s['id'] for s in month_sales))
+               self._write_manifest(manifest)
+               archived[month] = len(month_sales)
+           return [s for s in sales if s['date'][:10] >= cutoff]
+
+
+       storage.rewrite_sales(roll)
+       return archived
+
+
+   def _month_file(self, month):
+       return os.path.join(self.archive_dir, f"sales-{month}.arrow")
+
+
+   def _table(self, month):
+       """Tabla del mes sobre su archivo mapeado; las columnas no se copian a memoria hasta usarse"""
+       path = self._month_file(month)
+       signature = file_signature(path)
+       with self._lock:
+           cached = self._tables.get(month)
+           if cached is not None and cached[0] == signature:
+               return cached[2]
+           source = pa.memory_map(path, 'r')
+           table = pa.ipc.open_file(source).read_all()
+           if cached is not None:
+               # Las tablas ya entregadas mantienen vivo el mapeo anterior hasta que se liberan
+               cached[1].close()
+           self._tables[month] = (signature, source, table)
+           return table
+
+
+   def _require_pyarrow(self):
+       if pa is None:
+           raise RuntimeError("El archivo histórico de ventas requiere pyarrow (pip install pyarrow)")
+
+
+   @staticmethod
+   def _sales_from_rows(rows):
+       sales = {}
+       for row in rows:
+           sale = sales.get(row["sale_id"])
+           if sale is None:
+               sale = sales[row["sale_id"]] = {
+                   "id": row["sale_id"],
+                   "date": row["date"].isoformat(),
+                   "products": [],
+                   "total": row["total"],
+                   "items_count": row["items_count"]
+               }
+           if row["product_id"] is not None:
+               sale["products"].append({
+                   'product_id': row["product_id"],
+                   'name': row["name"],
+                   'price': row["price"],
+                   'quantity': row["quantity"],
+                   'subtotal': row["subtotal"]
+               })
+       return list(sales.values())
+
+
+   @staticmethod
+   def _table_from_sales(sales):
+       # Una fila por línea; una venta sin productos ocupa una fila con las columnas de la línea vacías
+       rows = [(sale, line) for sale in sales for line in sale.get('products') or [{}]]
+       dates = pd.to_datetime([sale['date'] for sale, _ in rows], format="ISO8601")
+       return pa.table({
+           "sale_id": pa.array([sale['id'] for sale, _ in rows], pa.int64()),
+           "date": pa.array(dates.to_numpy(dtype="datetime64[us]"), pa.timestamp("us")),
+           "total": pa.array([sale['total'] for sale, _ in rows], pa.float64()),
+           "items_count": pa.array([sale['items_count'] for sale, _ in rows], pa.int64()),
+           "product_id": pa.array([line.get('product_id') for _, line in rows], pa.int64()),
+           "name": pa.array([line.get('name') for _, line in rows], pa.string()),
+           "price": pa.array([line.get('price') for _, line in rows], pa.float64()),
+           "quantity": pa.array([line.get('quantity') for _, line in rows], pa.int64()),
+           "subtotal": pa.array([line.get('subtotal') for _, line in rows], pa.float64())
+       }, schema=_schema())
+
+
+   @staticmethod
+   def _write_table(path, table):
+       def write(f):
+           with pa.ipc.new_file(f, table.schema) as writer:
+               writer.write_table(table)
+       write_atomic(path, write, binary=True)
+
+
+   def _write_manifest(self, manifest):
+       write_json(self.manifest_file, manifest)
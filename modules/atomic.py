@@ -0,0 +1,103 @@
+import os
+import shutil
+import stat
+import tempfile
+
+
+from modules.serializer import DecodeError, dumps, load_file
+
+
+
+
+def _backup_file(path, number):
+   return f"{path}.bak.{number}"
+
+
+
+
+def _rotate_backups(path, backups):
+   """Corre las copias (.bak.1 -> .bak.2 ...) y guarda la versión actual como .bak.1"""
+   if not os.path.exists(path):
+       return
+   for number in range(backups - 1, 0, -1):
+       if os.path.exists(_backup_file(path, number)):
+           os.replace(_backup_file(path, number), _backup_file(path, number + 1))
+   try:
+       os.remove(_backup_file(path, 1))
+   except FileNotFoundError:
+       pass
+   try:
+       # Un hard link conserva la versión anterior sin copiarla: el rename posterior crea un archivo nuevo
+       os.link(path, _backup_file(path, 1))
+   except OSError:
+       shutil.copy2(path, _backup_file(path, 1))
+
+
+
+
+def _fsync_dir(directory):
+   if os.name != "posix":
+       return
+   fd = os.open(directory, os.O_RDONLY)
+   try:
+       os.fsync(fd)
+   finally:
+       os.close(fd)
+
+
+
+
+def write_atomic(path, write, backups=0, binary=False):
+   """Escribe un archivo de forma atómica: archivo temporal + fsync + rename.
+
+
+   write(f) recibe el archivo temporal abierto. Un lector ve siempre la versión
+   anterior completa o la nueva completa, nunca un archivo a medio escribir;
+   si el proceso se corta, el archivo original queda intacto. Con backups > 0
+   se conservan las últimas versiones como path.bak.1, path.bak.2, ...
+   """
+   directory = os.path.dirname(path) or "."
+   fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+   try:
+       try:
+           os.chmod(tmp_file, stat.S_IMODE(os.stat(path).st_mode))
+       except FileNotFoundError:
+           os.chmod(tmp_file, 0o644)
+       with os.fdopen(fd, 'wb' if binary else 'w', **({} if binary else {"encoding": "utf-8"})) as f:
+           write(f)
+           f.flush()
+           os.fsync(f.fileno())
+       if backups:
+           _rotate_backups(path, backups)
+       os.replace(tmp_file, path)
+   except BaseException:
+       try:
+           os.remove(tmp_file)
+       except FileNotFoundError:
+           pass
+       raise
+   _fsync_dir(directory)
+   return True
+
+
+
+
+def write_json(path, data, backups=0, pretty=None):
+   """Guarda un documento JSON de forma atómica (compacto salvo pretty=True o INVENTORY_PRETTY_JSON=1)"""
+   return write_atomic(path, lambda f: f.write(dumps(data, pretty)), backups, binary=True)
+
+
+
+
+def read_json(path):
+   """Lee un documento JSON; si está dañado, usa la copia de respaldo más reciente que sea válida"""
+   try:
+       return load_file(path)
+   except DecodeError:
+       number = 1
+       while os.path.exists(_backup_file(path, number)):
+           try:
+               return load_file(_backup_file(path, number))
+           except DecodeError:
+               number += 1
+       raise
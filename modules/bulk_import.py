@@ -0,0 +1,232 @@
+import csv
+import math
+import re
+import time
+from datetime import datetime
+
+
+from modules.records import Product, normalize_sku
+from modules.serializer import DecodeError, loads
+
+
+
+
+# Encabezados aceptados para cada campo (en español o en inglés)
+FIELD_ALIASES = {
+   "name": ("name", "nombre"),
+   "price": ("price", "precio"),
+   "category": ("category", "categoria", "categoría"),
+   "description": ("description", "descripcion", "descripción"),
+   "stock": ("stock", "initial_stock", "stock_inicial", "cantidad"),
+   "sku": ("sku", "codigo", "código", "barcode", "codigo_barras", "ean")
+}
+
+
+
+
+def iter_rows(stream, file_format):
+   """Lee filas de un archivo CSV o JSONL de a una (sin cargar todo el archivo)"""
+   if file_format == "csv":
+       for line_number, row in enumerate(csv.DictReader(stream), start=2):
+           yield line_number, row
+   elif file_format == "jsonl":
+       for line_number, line in enumerate(stream, start=1):
+           if not line.strip():
+               continue
+           try:
+               yield line_number, loads(line)
+           except DecodeError as e:
+               yield line_number, ValueError(f"JSON inválido: {e.msg}")
+   else:
+       raise ValueError(f"Formato no soportado: {file_format}")
+
+
+
+
+def detect_format(filename):
+   """Formato según la extensión del archivo"""
+   return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+
+
+def _field(row, field):
+   for alias in FIELD_ALIASES[field]:
+       value = row.get(alias)
+       if value is not None and str(value).strip() != "":
+           return value
+   return None
+
+
+
+
+def validate_row(row):
+   """Valida una fila y devuelve (name, price, category, description, stock, sku); lanza ValueError"""
+   if isinstance(row, Exception):
+       raise row
+   if not isinstance(row, dict):
+       raise ValueError("La fila no es un objeto")
+
+
+   name = _field(row, "name")
+   price = _field(row, "price")
+   category = _field(row, "category")
+   if name is None or price is None or category is None:
+       raise ValueError("Faltan campos obligatorios (nombre, precio, categoría)")
+
+
+   try:
+       price = float(str(price).replace(",", ".") if isinstance(price, str) and "." not in price else price)
+   except (TypeError, ValueError):
+       raise ValueError(f"Precio inválido: {price}")
+   if not math.isfinite(price):
+       raise ValueError(f"Precio inválido: {price}")
+   if price < 0:
+       raise ValueError(f"Precio negativo: {price}")
+
+
+   stock = _field(row, "stock")
+   try:
+       quantity = float(stock) if stock is not None else 0.0
+   except (TypeError, ValueError):
+       raise ValueError(f"Stock inválido: {stock}")
+   # "2.7" o "inf" no son cantidades (int() las truncaría o fallaría con OverflowError)
+   if not math.isfinite(quantity) or not quantity.is_integer():
+       raise ValueError(f"Stock inválido: {stock}")
+   if quantity < 0:
+       raise ValueError(f"Stock negativo: {stock}")
+
+
+   # Las mismas reglas que al dar de alta un producto desde la app o la API (lanza InvalidRecordError)
+   product = Product.from_dict({
+       "id": 1,
+       "name": name,
+       "price": price,
+       "category": str(category).strip(),
+       "description": _field(row, "description") or "",
+       "sku": _field(row, "sku")
+   })
+   return product.name, product.price, product.category, product.description, int(quantity), product.sku
+
+
+
+
+def import_products(storage, stream, file_format="csv", max_errors=None):
+   """Importa productos y su stock inicial desde un archivo CSV/JSONL.
+
+
+   Las filas se validan a medida que se leen; las inválidas se saltean y se
+   informan. Las categorías nuevas se agregan como con add_category (sin
+   espacios sobrantes ni duplicados), los IDs se reservan en bloque de la
+   secuencia de productos y todo se guarda al final de una sola vez. Las filas
+   con un SKU que ya existe (en el catálogo o antes en el archivo) se rechazan.
+   """
+   started = time.perf_counter()
+   known_categories = set(storage.load("categories"))
+   known_skus = None
+
+
+   new_products = []
+   stock_entries = []
+   new_categories = []
+   errors = []
+   rows = 0
+   now = datetime.now().isoformat()
+
+
+   for line_number, row in iter_rows(stream, file_format):
+       rows += 1
+       try:
+           name, price, category, description, stock, sku = validate_row(row)
+           if sku is not None:
+               if known_skus is None:
+                   # El catálogo se recorre solo si el archivo trae códigos
+                   known_skus = {normalize_sku(p.get('sku')) for p in storage.load("products")}
+               if sku in known_skus:
+                   raise ValueError(f"SKU repetido: {sku}")
+               known_skus.add(sku)
+       except ValueError as e:
+           errors.append((line_number, str(e)))
+           if max_errors is not None and len(errors) > max_errors:
+               raise ValueError(f"Demasiados errores (más de {max_errors}); no se importó nada")
+           continue
+
+
+       if category not in known_categories:
+           known_categories.add(category)
+           new_categories.append(category)
+
+
+       new_products.append({
+           "id": None,  # se asigna al final, reservando todos los IDs juntos
+           "name": name,
+           "price": price,
+           "category": category,
+           "description": description,
+           "created_at": now
+       })
+       if sku is not None:
+           new_products[-1]["sku"] = sku
+       stock_entries.append({'quantity': stock, 'last_updated': now})
+
+
+   if new_products:
+       first_id = storage.next_id("products", count=len(new_products))
+       for product_id, product in enumerate(new_products, start=first_id):
+           product["id"] = product_id
+       stock_by_id = {product["id"]: entry for product, entry in zip(new_products, stock_entries)}
+       storage.add_products(new_products, stock_by_id, new_categories)
+
+
+   elapsed = time.perf_counter() - started
+   return {
+       "rows": rows,
+       "imported": len(new_products),
+       "errors": errors,
+       "categories_created": new_categories,
+       "seconds": elapsed,
+       "rows_per_second": rows / elapsed if elapsed > 0 else float(rows)
+   }
+
+
+
+
+def parse_stock_adjustments(lines):
+   """Lee una lista de recepción: una línea por producto "id, valor".
+
+
+   "+5" o "5" suma, "-3" resta y "=20" fija la cantidad. Sirve tanto para
+   texto pegado como para un CSV subido (con o sin encabezado). Devuelve
+   (ajustes, errores) con los errores como (número de línea, mensaje).
+   """
+   adjustments = []
+   errors = []
+   for line_number, line in enumerate(lines, start=1):
+       fields = [field.strip() for field in re.split(r"[,;\t]", line) if field.strip()]
+       if not fields:
+           continue
+       if len(fields) < 2:
+           errors.append((line_number, "Falta la cantidad"))
+           continue
+
+
+       product_id, value = fields[0], fields[1].replace(" ", "")
+       if not product_id.isdigit():
+           if line_number == 1:
+               continue  # encabezado
+           errors.append((line_number, f"ID de producto inválido: {product_id}"))
+           continue
+
+
+       try:
+           if value.startswith("="):
+               adjustment = {'product_id': int(product_id), 'quantity': int(value[1:])}
+               if adjustment['quantity'] < 0:
+                   raise ValueError
+           else:
+               adjustment = {'product_id': int(product_id), 'delta': int(value)}
+       except ValueError:
+           errors.append((line_number, f"Cantidad inválida: {fields[1]}"))
+           continue
+       adjustments.append(adjustment)
+   return adjustments, errors
@@ -0,0 +1,253 @@
+import threading
+
+
+from modules.metrics import metrics
+from modules.records import normalize_sku
+
+
+
+
+class CachedStorage:
+   """Caché en memoria sobre un backend de almacenamiento.
+
+
+   Guarda los documentos ya parseados y solo vuelve a leer un tipo de datos
+   cuando cambia la firma (mtime, tamaño) de sus archivos o cuando el propio
+   proceso lo escribe. Los datos devueltos se comparten entre sesiones: quien
+   los modifique debe guardarlos a continuación.
+
+
+   Para productos y ventas mantiene además un índice {id: registro} sobre la
+   lista en caché (y {sku: producto} para los códigos de barras), así las
+   búsquedas por ID o por código no recorren la lista.
+   """
+
+
+   def __init__(self, storage):
+       self.storage = storage
+       self._entries = {}
+       self._indexes = {}
+       self._lock = threading.Lock()
+       self.hits = 0
+       self.misses = 0
+
+
+   def load(self, file_type):
+       """Devuelve el documento en caché o lo recarga si cambió en disco"""
+       signature = self.storage.signature(file_type)
+       entry = self._entries.get(file_type)
+
+
+       if entry is not None and entry[0] == signature:
+           self.hits += 1
+           metrics.count("storage.cache.hit")
+           return entry[1]
+
+
+       self.misses += 1
+       metrics.count("storage.cache.miss")
+       with metrics.timer(f"storage.load.{file_type}"):
+           data = self.storage.load(file_type)
+       with self._lock:
+           self._entries[file_type] = (signature, data)
+       return data
+
+
+   def save(self, file_type, data):
+       """Guarda el documento y lo deja en caché con la nueva firma"""
+       with metrics.timer(f"storage.save.{file_type}"):
+           result = self.storage.save(file_type, data)
+       with self._lock:
+           self._entries[file_type] = (self.storage.signature(file_type), data)
+           self._drop_indexes(file_type)
+       return result
+
+
+   @metrics.timed("storage.append_sale")
+   def append_sale(self, sale, floor=0):
+       """Registra la venta (asignándole ID si no tiene) y la agrega a la lista en caché si seguía vigente"""
+       before = self.storage.signature("sales")
+       result = self.storage.append_sale(sale, floor)
+
+
+       with self._lock:
+           entry = self._entries.get("sales")
+           if entry is not None and entry[0] == before:
+               sales = entry[1]
+               if not sales or sales[-1] is not sale:
+                   sales.append(sale)
+               self._entries["sales"] = (self.storage.signature("sales"), sales)
+               index = self._indexes.get("sales")
+               if index is not None and index[0] is sales:
+                   index[1].setdefault(sale['id'], sale)
+           else:
+               self._entries.pop("sales", None)
+       return result
+
+
+   @metrics.timed("storage.rewrite_sales")
+   def rewrite_sales(self, rewrite):
+       try:
+           return self.storage.rewrite_sales(rewrite)
+       finally:
+           self.invalidate("sales")
+
+
+   def __getattr__(self, name):
+       # Atributos del backend (data_dir, files, ...) accesibles a través de la caché
+       return getattr(self.storage, name)
+
+
+   def _by_id(self, file_type):
+       """Índice {id: registro} de la lista vigente (se rearma solo si la lista cambió)"""
+       data = self.load(file_type)
+       with self._lock:
+           index = self._indexes.get(file_type)
+           if index is None or index[0] is not data:
+               by_id = {}
+               for record in data:
+                   by_id.setdefault(record['id'], record)  # con IDs repetidos gana el primero, como antes
+               index = self._indexes[file_type] = (data, by_id)
+           return index[1]
+
+
+   def _by_sku(self):
+       """Índice {sku: producto} de la lista vigente (se rearma solo si la lista cambió)"""
+       data = self.load("products")
+       with self._lock:
+           index = self._indexes.get("products:sku")
+           if index is None or index[0] is not data:
+               by_sku = {}
+               for record in data:
+                   sku = normalize_sku(record.get('sku'))
+                   if sku is not None:
+                       by_sku.setdefault(sku, record)
+               index = self._indexes["products:sku"] = (data, by_sku)
+           return index[1]
+
+
+   def _drop_indexes(self, file_type):
+       self._indexes.pop(file_type, None)
+       self._indexes.pop(f"{file_type}:sku", None)
+
+
+   def get_product(self, product_id):
+       """Obtiene un producto por ID usando el índice en memoria"""
+       return self._by_id("products").get(product_id)
+
+
+   def get_product_by_sku(self, sku):
+       """Obtiene un producto por SKU / código de barras usando el índice en memoria (O(1))"""
+       return self._by_sku().get(normalize_sku(sku))
+
+
+   def get_sale(self, sale_id):
+       """Obtiene una venta por ID usando el índice en memoria"""
+       return self._by_id("sales").get(sale_id)
+
+
+   @metrics.timed("storage.update_product")
+   def update_product(self, product_id, updated_data):
+       """Actualiza un producto; si la caché estaba vigente, actualiza el registro en memoria"""
+       before = self.storage.signature("products")
+       try:
+           result = self.storage.update_product(product_id, updated_data)
+       except Exception:
+           self.invalidate("products")
+           raise
+
+
+       with self._lock:
+           entry = self._entries.get("products")
+           index = self._indexes.get("products")
+           if (result and 'id' not in updated_data and entry is not None and entry[0] == before
+                   and index is not None and index[0] is entry[1] and product_id in index[1]):
+               index[1][product_id].update(updated_data)
+               self._entries["products"] = (self.storage.signature("products"), entry[1])
+               if 'sku' in updated_data:
+                   self._indexes.pop("products:sku", None)
+           else:
+               self._entries.pop("products", None)
+               self._drop_indexes("products")
+       return result
+
+
+   @metrics.timed("storage.delete_product")
+   def delete_product(self, product_id):
+       """Elimina un producto e invalida productos y stock"""
+       try:
+           return self.storage.delete_product(product_id)
+       finally:
+           self.invalidate("products", "stock")
+
+
+   @metrics.timed("storage.add_products")
+   def add_products(self, products, stock_entries, categories=()):
+       """Alta masiva de productos; invalida productos, stock y categorías"""
+       try:
+           return self.storage.add_products(products, stock_entries, categories)
+       finally:
+           self.invalidate("products", "stock", "categories")
+
+
+   def get_stock(self, product_id):
+       """Obtiene la entrada de stock de un producto"""
+       return self.storage.get_stock(product_id)
+
+
+   @metrics.timed("storage.set_stock")
+   def set_stock(self, product_id, entry):
+       """Guarda el stock de un producto e invalida la caché de stock"""
+       try:
+           return self.storage.set_stock(product_id, entry)
+       finally:
+           self.invalidate("stock")
+
+
+   @metrics.timed("storage.adjust_stock")
+   def adjust_stock(self, changes, clamp=False):
+       """Aplica variaciones de stock atómicas e invalida la caché de stock"""
+       try:
+           return self.storage.adjust_stock(changes, clamp)
+       finally:
+           self.invalidate("stock")
+
+
+   @metrics.timed("storage.apply_stock_batch")
+   def apply_stock_batch(self, adjustments, clamp=False):
+       """Aplica un lote de ajustes de stock e invalida la caché de stock"""
+       try:
+           return self.storage.apply_stock_batch(adjustments, clamp)
+       finally:
+           self.invalidate("stock")
+
+
+   def signature(self, file_type):
+       return self.storage.signature(file_type)
+
+
+   @metrics.timed("storage.compact")
+   def compact(self):
+       try:
+           return self.storage.compact()
+       finally:
+           self.invalidate("sales")
+
+
+   def invalidate(self, *file_types):
+       """Descarta los documentos indicados (o todos)"""
+       with self._lock:
+           for file_type in file_types or list(self._entries):
+               self._entries.pop(file_type, None)
+               self._drop_indexes(file_type)
+
+
+   def stats(self):
+       """Contadores de aciertos y fallos de la caché"""
+       total = self.hits + self.misses
+       return {
+           "hits": self.hits,
+           "misses": self.misses,
+           "hit_rate": self.hits / total if total else 0.0,
+           "cached": sorted(self._entries)
+       }
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+from modules.search import normalize
+
+
+
+
+PRODUCT_COLUMNS = ["id", "name", "category", "price", "description", "sku"]
+
+
+
+
+def stock_frame(stock_data):
+   """stock.json ({'id': {'quantity', 'last_updated'}}) como DataFrame id/quantity/last_updated"""
+   entries = stock_data.values()
+   return pd.DataFrame({
+       "id": np.fromiter((int(product_id) for product_id in stock_data), dtype=np.int64, count=len(stock_data)),
+       "quantity": np.fromiter((entry.get('quantity', 0) for entry in entries), dtype=np.int64,
+                               count=len(stock_data)),
+       "last_updated": [entry.get('last_updated') for entry in entries]
+   })
+
+
+
+
+def inventory_frame(products, stock_data):
+   """Productos ⋈ stock en un solo DataFrame (una fila por producto, en el orden del catálogo).
+
+
+   Columnas: id, name, category, price, description, sku, quantity, last_updated,
+   stock_value y name_key (nombre en minúsculas y sin tildes, para buscar por
+   prefijo). Los productos sin entrada de stock quedan con cantidad 0 y
+   last_updated 'Nunca', como en las vistas que recorrían producto por producto.
+   """
+   catalog = pd.DataFrame.from_records(products, columns=PRODUCT_COLUMNS)
+   catalog["id"] = catalog["id"].astype(np.int64)
+   catalog["price"] = catalog["price"].astype(np.float64)
+   catalog["category"] = catalog["category"].fillna("Sin categoría")
+   catalog["description"] = catalog["description"].fillna("")
+   catalog["sku"] = catalog["sku"].fillna("")
+
+
+   frame = catalog.merge(stock_frame(stock_data), on="id", how="left", sort=False)
+   frame["quantity"] = frame["quantity"].fillna(0).astype(np.int64)
+   frame["last_updated"] = frame["last_updated"].fillna("Nunca")
+   frame["stock_value"] = frame["price"] * frame["quantity"]
+   frame["name_key"] = (frame["name"].astype(str).str.normalize("NFKD")
+                        .str.replace("[\u0300-\u036f]", "", regex=True).str.lower())
+   return frame
+
+
+
+
+def filter_inventory(frame, name_prefix=None, category=None, min_stock=None, max_stock=None):
+   """Filas de inventory_frame() que cumplen los filtros (los que son None no se aplican).
+
+
+   name_prefix compara sin distinguir mayúsculas ni tildes contra el comienzo del nombre;
+   si es un número también encuentra el producto con ese ID.
+   """
+   mask = np.ones(len(frame), dtype=bool)
+   name_prefix = normalize(name_prefix).strip()
+   if name_prefix:
+       by_name = frame["name_key"].str.startswith(name_prefix).to_numpy()
+       if name_prefix.isdigit():
+           by_name |= (frame["id"] == int(name_prefix)).to_numpy()
+       mask &= by_name
+   if category:
+       mask &= (frame["category"] == category).to_numpy()
+   if min_stock is not None:
+       mask &= (frame["quantity"] >= min_stock).to_numpy()
+   if max_stock is not None:
+       mask &= (frame["quantity"] <= max_stock).to_numpy()
+   return frame if mask.all() else frame[mask]
+
+
+
+
+def paginate(rows, page, page_size):
+   """Recorta una página (numerada desde 1) de un DataFrame o lista; devuelve (filas, cantidad de páginas)"""
+   page_count = max(1, -(-len(rows) // page_size))
+   page = min(max(1, page), page_count)
+   start = (page - 1) * page_size
+   if isinstance(rows, pd.DataFrame):
+       return rows.iloc[start:start + page_size], page_count
+   return rows[start:start + page_size], page_count
@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+
+from modules.metrics import metrics
+
+
+
+
+# Más puntos que esto en una serie diaria se agrupan por semana o por mes (el gráfico no los distingue)
+DAILY_POINTS_LIMIT = 400
+
+
+
+
+def downsample_daily(frame, max_points=DAILY_POINTS_LIMIT, date_column='date'):
+   """Agrupa una serie diaria por semana (o por mes) si tiene más de max_points puntos.
+
+
+   frame tiene una columna de fechas (datetime) y columnas numéricas que se
+   suman por período. Devuelve (frame, período) con período 'día', 'semana' o
+   'mes'; los días sin ventas dentro del rango cuentan como cero.
+   """
+   if len(frame) <= max_points:
+       return frame, 'día'
+
+
+   indexed = frame.set_index(date_column)
+   for rule, period in (('W-MON', 'semana'), ('MS', 'mes')):
+       grouped = indexed.resample(rule, label='left', closed='left').sum(numeric_only=True).reset_index()
+       if len(grouped) <= max_points:
+           break
+   return grouped, period
+
+
+
+
+class FigureCache:
+   """Figuras de plotly ya armadas, por (gráfico, versión de los datos, filtros), con descarte LRU.
+
+
+   La versión es cualquier valor que cambie cuando cambian los datos del
+   gráfico (las firmas de los archivos); mientras no cambie ni los filtros, un
+   rerun reutiliza la figura en lugar de volver a armarla con plotly.express.
+   Las figuras se comparten entre sesiones: no modificarlas.
+   """
+
+
+   def __init__(self, max_entries=64):
+       self.max_entries = max_entries
+       self._figures = OrderedDict()
+       self._lock = threading.Lock()
+       self.hits = 0
+       self.misses = 0
+
+
+   def get(self, chart_id, version, params, build):
+       """Figura en caché o la que arma build() (que se guarda, descartando la menos usada si no entra)"""
+       key = (chart_id, version, params)
+       with self._lock:
+           figure = self._figures.get(key)
+           if figure is not None:
+               self._figures.move_to_end(key)
+               self.hits += 1
+               metrics.count("chart.cache.hit")
+               return figure
+
+
+       with metrics.timer(f"chart.build.{chart_id}"):
+           figure = build()
+       with self._lock:
+           self.misses += 1
+           metrics.count("chart.cache.miss")
+           self._figures[key] = figure
+           self._figures.move_to_end(key)
+           while len(self._figures) > self.max_entries:
+               self._figures.popitem(last=False)
+       return figure
+
+
+   def clear(self):
+       with self._lock:
+           self._figures.clear()
+
+
+   def stats(self):
+       """Aciertos, figuras armadas y figuras en caché"""
+       return {"hits": self.hits, "misses": self.misses, "cached": len(self._figures)}
@@ -0,0 +1,194 @@
+import threading
+
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+
+
+COLUMNS = ("sale_id", "date", "product_id", "quantity", "price", "subtotal")
+
+
+DTYPES = {
+   "sale_id": np.int64,
+   "date": "datetime64[us]",
+   "product_id": np.int64,
+   "quantity": np.int64,
+   "price": np.float64,
+   "subtotal": np.float64
+}
+
+
+
+
+def _columns_from_rows(rows):
+   """Convierte tuplas (sale_id, fecha ISO, product_id, cantidad, precio, subtotal, nombre) en columnas"""
+   if not rows:
+       columns = {column: np.array([], dtype=dtype) for column, dtype in DTYPES.items()}
+       columns["name"] = pd.Categorical([])
+       return columns
+
+
+   sale_id, date, product_id, quantity, price, subtotal, name = zip(*rows)
+   return {
+       "sale_id": np.array(sale_id, dtype=np.int64),
+       "date": pd.to_datetime(list(date), format="ISO8601").to_numpy(dtype="datetime64[us]"),
+       "product_id": np.array(product_id, dtype=np.int64),
+       "quantity": np.array(quantity, dtype=np.int64),
+       "price": np.array(price, dtype=np.float64),
+       "subtotal": np.array(subtotal, dtype=np.float64),
+       "name": pd.Categorical(name)
+   }
+
+
+
+
+def _union_names(names):
+   """Une columnas categóricas de nombres (las vacías se ignoran: su tipo de categorías difiere)"""
+   non_empty = [values for values in names if len(values)]
+   if not non_empty:
+       return names[0]
+   if len(non_empty) == 1:
+       return non_empty[0]
+   return union_categoricals(non_empty)
+
+
+
+
+def _is_sorted(dates):
+   return bool(np.all(dates[1:] >= dates[:-1]))
+
+
+
+
+def _sale_rows(sale):
+   return [
+       (sale['id'], sale['date'], line['product_id'], line['quantity'], line['price'], line['subtotal'],
+        line['name'])
+       for line in sale.get('products', [])
+   ]
+
+
+
+
+class SalesLines:
+   """Líneas de venta en formato columnar (un arreglo NumPy tipado por columna).
+
+
+   Se construye una vez por versión de los datos y crece con append() al
+   registrar ventas; los rankings se calculan con groupby vectorizados, sin
+   recorrer las ventas en Python. Las columnas se reemplazan juntas, así las
+   consultas concurrentes siempre ven una versión consistente.
+
+
+   Como los IDs y fechas de venta son crecientes, las líneas suelen quedar
+   ordenadas por fecha: en ese caso los filtros por rango usan búsqueda binaria
+   y devuelven vistas del tramo, sin recorrer el resto.
+   """
+
+
+   def __init__(self, columns=None):
+       self._columns = columns or _columns_from_rows([])
+       self._sorted = _is_sorted(self._columns["date"])
+       self._pending = []
+       self._lock = threading.Lock()
+
+
+   @classmethod
+   def from_sales(cls, sales):
+       """Aplana la lista de ventas (formato JSON) en columnas"""
+       return cls(_columns_from_rows([row for sale in sales for row in _sale_rows(sale)]))
+
+
+   @classmethod
+   def concat(cls, parts):
+       """Une varios conjuntos de líneas (por ejemplo, archivo histórico + ventas vivas)"""
+       parts = [part.columns() for part in parts]
+       columns = {column: np.concatenate([part[column] for part in parts]) for column in COLUMNS}
+       columns["name"] = _union_names([part["name"] for part in parts])
+       return cls(columns)
+
+
+   def append(self, sale):
+       """Agrega las líneas de una venta (se consolidan en la próxima consulta)"""
+       with self._lock:
+           self._pending.extend(_sale_rows(sale))
+
+
+   def columns(self):
+       """Columnas vigentes {nombre: arreglo}, incluyendo las ventas agregadas con append()"""
+       return self._snapshot()[0]
+
+
+   def _snapshot(self):
+       with self._lock:
+           if self._pending:
+               tail = _columns_from_rows(self._pending)
+               columns = {column: np.concatenate([self._columns[column], tail[column]]) for column in COLUMNS}
+               columns["name"] = _union_names([self._columns["name"], tail["name"]])
+               previous = self._columns["date"]
+               self._sorted = (self._sorted and _is_sorted(tail["date"]) and
+                               (not len(previous) or previous[-1] <= tail["date"][0]))
+               self._columns = columns
+               self._pending = []
+           return self._columns, self._sorted
+
+
+   def __len__(self):
+       return len(self.columns()["sale_id"])
+
+
+   def _select(self, start_date=None, end_date=None):
+       """Columnas de las líneas cuya fecha cae en [start_date, end_date] (días completos)"""
+       columns, is_sorted = self._snapshot()
+       if start_date is None and end_date is None:
+           return columns
+
+
+       dates = columns["date"]
+       start = np.datetime64(pd.Timestamp(start_date).normalize(), "us") if start_date is not None else None
+       end = (np.datetime64(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1), "us")
+              if end_date is not None else None)
+
+
+       if is_sorted:
+           low = int(np.searchsorted(dates, start, side="left")) if start is not None else 0
+           high = int(np.searchsorted(dates, end, side="left")) if end is not None else len(dates)
+           return {column: values[low:high] for column, values in columns.items()}
+
+
+       keep = np.ones(len(dates), dtype=bool)
+       if start is not None:
+           keep &= dates >= start
+       if end is not None:
+           keep &= dates < end
+       return {column: values[keep] for column, values in columns.items()}
+
+
+   def frame(self, start_date=None, end_date=None):
+       """DataFrame con las columnas tipadas (filtrado por fechas si se indica)"""
+       return pd.DataFrame(self._select(start_date, end_date))
+
+
+   def top_products(self, n=10, start_date=None, end_date=None, by="quantity"):
+       """Productos más vendidos del período: Serie nombre -> cantidad (o importe con by='subtotal')"""
+       selected = self._select(start_date, end_date)
+       totals = pd.Series(selected[by]).groupby(selected["name"], observed=True).sum()
+       return totals.nlargest(n)
+
+
+   def by_category(self, category_of_product, start_date=None, end_date=None, by="subtotal"):
+       """Totales por categoría; category_of_product es {product_id: categoría}"""
+       selected = self._select(start_date, end_date)
+       categories = pd.Series(selected["product_id"]).map(category_of_product).fillna("Sin categoría")
+       totals = pd.Series(selected[by]).groupby(categories.to_numpy()).sum()
+       return totals.sort_values(ascending=False)
+
+
+   def by_period(self, freq="D", start_date=None, end_date=None, by="subtotal"):
+       """Totales por período ('D' día, 'W' semana, 'M' mes)"""
+       selected = self._select(start_date, end_date)
+       periods = pd.DatetimeIndex(selected["date"]).to_period(freq)
+       return pd.Series(selected[by]).groupby(periods).sum()
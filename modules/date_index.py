@@ -0,0 +1,86 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+
+
+
+def _iso(value):
+   """Fecha/datetime/Timestamp/texto a texto ISO (comparable con las fechas guardadas)"""
+   if isinstance(value, str):
+       return value
+   return value.isoformat()
+
+
+
+
+def _end_key(value):
+   """Cota superior ISO: una fecha sin hora incluye el día completo"""
+   key = _iso(value)
+   return key + "\uffff" if len(key) == 10 else key
+
+
+
+
+class SalesDateIndex:
+   """Índice ordenado de ventas por fecha para consultas por rango con búsqueda binaria.
+
+
+   Las fechas se guardan en ISO 8601, que ordena igual como texto que como
+   fecha, así que no hace falta parsearlas. Como las ventas se registran en
+   orden, agregar una venta nueva es O(1).
+   """
+
+
+   def __init__(self, sales=()):
+       pairs = sorted(((sale['date'], position) for position, sale in enumerate(sales)))
+       self._sales = list(sales)
+       self._keys = [key for key, _ in pairs]
+       self._positions = [position for _, position in pairs]
+       self._lock = threading.Lock()
+
+
+   def __len__(self):
+       return len(self._keys)
+
+
+   def add(self, sale):
+       """Agrega una venta al índice"""
+       with self._lock:
+           self._sales.append(sale)
+           position = len(self._sales) - 1
+           if not self._keys or sale['date'] >= self._keys[-1]:
+               self._keys.append(sale['date'])
+               self._positions.append(position)
+           else:
+               index = bisect_right(self._keys, sale['date'])
+               self._keys.insert(index, sale['date'])
+               self._positions.insert(index, position)
+
+
+   def between(self, start=None, end=None):
+       """Ventas con start <= fecha <= end (extremos inclusivos; un end sin hora incluye todo ese día)"""
+       with self._lock:
+           low = bisect_left(self._keys, _iso(start)) if start is not None else 0
+           high = bisect_right(self._keys, _end_key(end)) if end is not None else len(self._keys)
+           return [self._sales[position] for position in self._positions[low:high]]
+
+
+   def on_days(self, first_day, last_day):
+       """Ventas de los días completos [first_day, last_day]"""
+       with self._lock:
+           low = bisect_left(self._keys, first_day.isoformat())
+           high = bisect_left(self._keys, (last_day + timedelta(days=1)).isoformat())
+           return [self._sales[position] for position in self._positions[low:high]]
+
+
+   def on_day(self, day):
+       """Ventas de un día"""
+       return self.on_days(day, day)
+
+
+   def in_month(self, year, month):
+       """Ventas de un mes"""
+       first_day = date(year, month, 1)
+       next_month = date(year + month // 12, month % 12 + 1, 1)
+       return self.on_days(first_day, next_month - timedelta(days=1))
@@ -0,0 +1,376 @@
+import os
+
+
+from modules.atomic import read_json, write_json
+from modules.locking import FileLock
+from modules.serializer import DecodeError, dumps_line, loads
+
+
+
+
+def _ends_with_newline(path):
+   """True si el archivo está vacío, no existe o termina en salto de línea"""
+   try:
+       with open(path, 'rb') as f:
+           f.seek(0, os.SEEK_END)
+           if f.tell() == 0:
+               return True
+           f.seek(-1, os.SEEK_END)
+           return f.read(1) == b"\n"
+   except FileNotFoundError:
+       return True
+
+
+
+
+class SalesJournal:
+   """Journal de ventas: snapshot JSON + cola de ventas en formato JSON Lines.
+
+
+   Las escrituras (append, compact, replace) toman un lock sobre el journal
+   válido entre hilos y procesos, así una venta no se pierde si otro proceso
+   compacta al mismo tiempo.
+   """
+
+
+   def __init__(self, snapshot_file="data/sales.json", journal_file=None, compact_every=500, fsync=False,
+                backups=0):
+       self.snapshot_file = snapshot_file
+       self.journal_file = journal_file or os.path.splitext(snapshot_file)[0] + ".jsonl"
+       self.compact_every = compact_every
+       self.fsync = fsync
+       self.backups = backups
+       self._lock = FileLock(self.journal_file + ".lock")
+       self._pending = None
+
+
+   def append(self, sale, assign_id=None):
+       """Agrega una venta al final del journal (una línea por venta).
+
+
+       Con assign_id, la venta recibe sale['id'] = assign_id() con el journal
+       bloqueado, así las ventas quedan escritas en el orden de sus IDs.
+       """
+       with self._lock:
+           if assign_id is not None:
+               sale['id'] = assign_id()
+           line = dumps_line(sale)
+           if not _ends_with_newline(self.journal_file):
+               line = b"\n" + line  # aislar una línea incompleta de un corte anterior
+           with open(self.journal_file, 'ab') as f:
+               f.write(line)
+               f.flush()
+               if self.fsync:
+                   os.fsync(f.fileno())
+           self._pending = self._count_pending() if self._pending is None else self._pending + 1
+       return True
+
+
+   def load(self):
+       """Carga las ventas: snapshot + ventas pendientes del journal.
+
+
+       Si una compactación cambia los archivos durante la lectura, se vuelve a
+       leer; como último recurso se lee con el lock tomado.
+       """
+       for _ in range(5):
+           before = self._stat()
+           sales = self._read()
+           if self._stat() == before:
+               return sales
+       with self._lock:
+           return self._read()
+
+
+   def replace(self, sales):
+       """Reemplaza todo el historial: escribe el snapshot y vacía el journal"""
+       with self._lock:
+           return self._replace(sales)
+
+
+   def rewrite(self, rewrite):
+       """Reemplaza el historial por rewrite(ventas) con el journal bloqueado de principio a fin"""
+       with self._lock:
+           return self._replace(rewrite(self._read()))
+
+
+   def compact(self):
+       """Vuelca el journal dentro del snapshot"""
+       with self._lock:
+           return self._replace(self._read())
+
+
+   def maybe_compact(self):
+       """Compacta si el journal superó el umbral de ventas pendientes"""
+       if self._pending is None:
+           self._pending = self._count_pending()
+       if self.compact_every and self._pending >= self.compact_every:
+           return self.compact()
+       return False
+
+
+   def _read(self):
+       sales = self._load_snapshot()
+       snapshot_ids = {s.get('id') for s in sales}
+
+
+       # Las ventas ya compactadas en el snapshot se ignoran (compactación interrumpida);
+       # se compara por ID y no contra el máximo porque las ventas pueden llegar fuera de orden
+       sales.extend(s for s in self._load_tail() if s.get('id') not in snapshot_ids)
+       return sales
+
+
+   def _replace(self, sales):
+       self._write_snapshot(sales)
+       open(self.journal_file, 'w', encoding='utf-8').close()
+       self._pending = 0
+       return True
+
+
+   def _stat(self):
+       signature = []
+       for path in (self.snapshot_file, self.journal_file):
+           try:
+               stat = os.stat(path)
+               signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+           except FileNotFoundError:
+               signature.append(None)
+       return signature
+
+
+   def _load_snapshot(self):
+       try:
+           return read_json(self.snapshot_file)
+       except FileNotFoundError:
+           return []
+
+
+   def _load_tail(self):
+       tail = []
+       try:
+           with open(self.journal_file, 'rb') as f:
+               for line in f:
+                   line = line.strip()
+                   if not line:
+                       continue
+                   try:
+                       tail.append(loads(line))
+                   except DecodeError:
+                       # Línea incompleta por un corte durante la escritura: las siguientes siguen valiendo
+                       continue
+       except FileNotFoundError:
+           pass
+       return tail
+
+
+   def _count_pending(self):
+       try:
+           with open(self.journal_file, 'rb') as f:
+               return sum(1 for line in f if line.strip())
+       except FileNotFoundError:
+           return 0
+
+
+   def _write_snapshot(self, sales):
+       write_json(self.snapshot_file, sales, self.backups)
+
+
+
+
+def _apply_ops(document, ops):
+   """Aplica operaciones {'op': 'put'|'del', 'key', 'value'} sobre una lista de registros o un dict"""
+   if isinstance(document, dict):
+       for op in ops:
+           if op['op'] == 'put':
+               document[op['key']] = op['value']
+           else:
+               document.pop(op['key'], None)
+       return document
+
+
+   positions = {}
+   for position, record in enumerate(document):
+       positions.setdefault(record['id'], position)
+   for op in ops:
+       key = op['key']
+       if op['op'] == 'put':
+           if key in positions:
+               document[positions[key]] = op['value']
+           else:
+               positions[key] = len(document)
+               document.append(op['value'])
+       elif key in positions:
+           document[:] = [record for record in document if record['id'] != key]
+           positions = {}
+           for position, record in enumerate(document):
+               positions.setdefault(record['id'], position)
+   return document
+
+
+
+
+def _diff(old, new):
+   """Operaciones que llevan old a new (None si hace falta reescribir todo: IDs repetidos)"""
+   if isinstance(new, dict):
+       old_records, new_records = old, new
+   else:
+       old_records = {record['id']: record for record in old}
+       new_records = {record['id']: record for record in new}
+       if len(old_records) != len(old) or len(new_records) != len(new):
+           return None
+
+
+   ops = [{'op': 'put', 'key': key, 'value': value}
+          for key, value in new_records.items() if old_records.get(key) != value]
+   ops.extend({'op': 'del', 'key': key} for key in old_records if key not in new_records)
+   return ops
+
+
+
+
+class DocumentLog:
+   """Documento JSON base + log de cambios por registro (write-ahead log).
+
+
+   Cada cambio se agrega al log como una línea con el registro modificado o
+   borrado, en lugar de reescribir el documento entero. Al leer se aplica el
+   log sobre el documento base; cada checkpoint_every cambios el log se vuelca
+   en el base. Si el proceso se corta, la próxima lectura vuelve a aplicar el
+   log (una línea incompleta al final se descarta).
+
+
+   Sirve para documentos que son listas de registros con 'id' (productos) o
+   dicts {clave: registro} (stock).
+   """
+
+
+   def __init__(self, base_file, log_file=None, checkpoint_every=200, fsync=False, backups=0):
+       self.base_file = base_file
+       self.log_file = log_file or os.path.splitext(base_file)[0] + ".log.jsonl"
+       self.checkpoint_every = checkpoint_every
+       self.fsync = fsync
+       self.backups = backups
+       self._lock = FileLock(self.log_file + ".lock")
+       self._pending = None
+
+
+   def load(self):
+       """Documento vigente: base + cambios del log.
+
+
+       Si un checkpoint de otro proceso cambia los archivos durante la lectura,
+       se vuelve a leer; como último recurso se lee con el lock tomado.
+       """
+       for _ in range(5):
+           before = self._stat()
+           document = self._read()
+           if self._stat() == before:
+               return document
+       with self._lock:
+           return self._read()
+
+
+   def append(self, ops):
+       """Agrega operaciones {'op': 'put'|'del', 'key', 'value'} al log"""
+       with self._lock:
+           return self._append(ops)
+
+
+   def put(self, key, value):
+       """Registra el alta o modificación de un registro"""
+       return self.append([{'op': 'put', 'key': key, 'value': value}])
+
+
+   def delete(self, key):
+       """Registra la baja de un registro"""
+       return self.append([{'op': 'del', 'key': key}])
+
+
+   def save(self, document):
+       """Guarda un documento completo registrando solo los registros que cambiaron"""
+       with self._lock:
+           ops = _diff(self._read(), document)
+           if ops is None or len(ops) > max(len(document) // 2, self.checkpoint_every or 0):
+               return self._replace(document)
+           return self._append(ops)
+
+
+   def replace(self, document):
+       """Reescribe el documento base y vacía el log"""
+       with self._lock:
+           return self._replace(document)
+
+
+   def checkpoint(self):
+       """Vuelca el log dentro del documento base"""
+       with self._lock:
+           return self._replace(self._read())
+
+
+   def _read(self):
+       return _apply_ops(read_json(self.base_file), self._load_ops())
+
+
+   def _append(self, ops):
+       if not ops:
+           return True
+       lines = b"".join(dumps_line(op) for op in ops)
+       if not _ends_with_newline(self.log_file):
+           lines = b"\n" + lines  # aislar una línea incompleta de un corte anterior
+       with open(self.log_file, 'ab') as f:
+           f.write(lines)
+           f.flush()
+           if self.fsync:
+               os.fsync(f.fileno())
+       self._pending = self._count_pending() if self._pending is None else self._pending + len(ops)
+       if self.checkpoint_every and self._pending >= self.checkpoint_every:
+           self._replace(self._read())
+       return True
+
+
+   def _replace(self, document):
+       self._write_base(document)
+       open(self.log_file, 'w', encoding='utf-8').close()
+       self._pending = 0
+       return True
+
+
+   def _stat(self):
+       signature = []
+       for path in (self.base_file, self.log_file):
+           try:
+               stat = os.stat(path)
+               signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+           except FileNotFoundError:
+               signature.append(None)
+       return signature
+
+
+   def _load_ops(self):
+       ops = []
+       try:
+           with open(self.log_file, 'rb') as f:
+               for line in f:
+                   line = line.strip()
+                   if not line:
+                       continue
+                   try:
+                       ops.append(loads(line))
+                   except DecodeError:
+                       # Línea incompleta por un corte durante la escritura
+                       continue
+       except FileNotFoundError:
+           pass
+       return ops
+
+
+   def _count_pending(self):
+       try:
+           with open(self.log_file, 'rb') as f:
+               return sum(1 for line in f if line.strip())
+       except FileNotFoundError:
+           return 0
+
+
+   def _write_base(self, document):
+       write_json(self.base_file, document, self.backups)
@@ -0,0 +1,71 @@
+import os
+import threading
+
+
+try:
+   import fcntl
+except ImportError:  # Windows
+   fcntl = None
+   import msvcrt
+
+
+
+
+_thread_locks = {}
+_registry_lock = threading.Lock()
+
+
+
+
+def _thread_lock(path):
+   with _registry_lock:
+       return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+
+
+class FileLock:
+   """Lock exclusivo sobre un archivo, válido entre hilos y entre procesos.
+
+
+   Se usa como context manager y se mantiene solo durante la sección
+   leer-verificar-escribir de cada operación.
+   """
+
+
+   def __init__(self, path):
+       self.path = path
+       self._thread_lock = _thread_lock(path)
+       self._file = None
+
+
+   def __enter__(self):
+       self._thread_lock.acquire()
+       try:
+           self._file = open(self.path, 'a+b')
+           if fcntl is not None:
+               fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+           else:
+               self._file.seek(0)
+               msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+       except Exception:
+           if self._file is not None:
+               self._file.close()
+               self._file = None
+           self._thread_lock.release()
+           raise
+       return self
+
+
+   def __exit__(self, exc_type, exc_value, traceback):
+       try:
+           if fcntl is not None:
+               fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+           else:
+               self._file.seek(0)
+               msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+       finally:
+           self._file.close()
+           self._file = None
+           self._thread_lock.release()
+       return False
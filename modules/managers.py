@@ -0,0 +1,119 @@
+import importlib.util
+import os
+import sys
+import threading
+
+
+from modules.cache import CachedStorage
+from modules.records import InvalidRecordError
+from modules.reports import ReportGenerator
+from modules.storage import create_storage
+
+
+
+
+def _load(module_name, file_name):
+   """Importa un módulo cuyo archivo tiene espacios en el nombre ('product manager.py')"""
+   module = sys.modules.get(module_name)
+   if module is None:
+       spec = importlib.util.spec_from_file_location(module_name, os.path.join(os.path.dirname(__file__), file_name))
+       module = importlib.util.module_from_spec(spec)
+       sys.modules[module_name] = module
+       spec.loader.exec_module(module)
+   return module
+
+
+
+
+ProductManager = _load("modules.product_manager", "product manager.py").ProductManager
+StockManager = _load("modules.stock_manager", "stock manager.py").StockManager
+SalesManager = _load("modules.sales_manager", "sales manager.py").SalesManager
+
+
+
+
+class UnknownProductError(LookupError):
+   """La venta pide un producto (ID o SKU) que no existe"""
+
+
+   def __init__(self, reference):
+       super().__init__(f"Producto desconocido: {reference}")
+       self.reference = reference
+
+
+
+
+class Inventory:
+   """Managers de productos, stock y ventas sobre un mismo almacenamiento (para usarlos fuera de Streamlit).
+
+
+   El almacenamiento se comparte entre hilos: con SQLite cada hilo abre su
+   propia conexión y la reutiliza, así un pool de N hilos equivale a un pool
+   de N conexiones. Las cachés del SalesManager (líneas, índice por fecha) no
+   son seguras entre hilos: las lecturas de ventas y reportes deben tomar
+   sales_lock, como lo hace record_sale().
+   """
+
+
+   def __init__(self, storage=None, data_dir="data"):
+       self.storage = storage or CachedStorage(create_storage(data_dir=data_dir))
+       self.products = ProductManager(storage=self.storage)
+       self.stock = StockManager(storage=self.storage)
+       self.sales = SalesManager(storage=self.storage)
+       self.reports = ReportGenerator(self.sales, self.products, self.stock)
+       self.sales_lock = threading.Lock()
+
+
+   def resolve_product(self, product_id=None, sku=None):
+       """Producto por ID o por SKU (lanza UnknownProductError si no existe)"""
+       product = self.storage.get_product_by_sku(sku) if sku is not None else self.products.get_product(product_id)
+       if product is None:
+           raise UnknownProductError(sku if sku is not None else product_id)
+       return product
+
+
+   def record_sale(self, items):
+       """Registra una venta a precio de catálogo; items es una lista de {'product_id' o 'sku', 'quantity'}.
+
+
+       Reserva el stock de forma atómica antes de registrar (lanza
+       InsufficientStockError sin descontar nada si algún producto no alcanza) y
+       lo devuelve si la venta no se pudo guardar. Devuelve la venta registrada
+       o None si falló el guardado.
+       """
+       lines = {}
+       for item in items:
+           product = self.resolve_product(item.get('product_id'), item.get('sku'))
+           try:
+               quantity = int(item.get('quantity', 1))
+           except (TypeError, ValueError):
+               raise InvalidRecordError(f"Valor inválido para 'quantity': {item.get('quantity')!r}")
+           if quantity < 1:
+               raise ValueError(f"Cantidad inválida para el producto {product['id']}: {quantity}")
+           line = lines.setdefault(product['id'], {
+               'product_id': product['id'],
+               'name': product['name'],
+               'price': product['price'],
+               'quantity': 0
+           })
+           line['quantity'] += quantity
+       if not lines:
+           raise ValueError("La venta no tiene productos")
+       for line in lines.values():
+           line['subtotal'] = line['price'] * line['quantity']
+
+
+       reservation = self.stock.reserve([(product_id, line['quantity']) for product_id, line in lines.items()])
+       try:
+           with self.sales_lock:
+               recorded, sale = self.sales.record_sale(list(lines.values()),
+                                                       sum(line['subtotal'] for line in lines.values()))
+       except BaseException:
+           reservation.release()
+           raise
+       if not recorded:
+           reservation.release()
+           return None
+       reservation.commit()
+       return sale
+
@@ -0,0 +1,193 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+
+from modules.atomic import write_json
+
+
+
+
+# Traza de la ejecución en curso (un rerun de Streamlit o un request); cada hilo tiene la suya
+_current_trace = contextvars.ContextVar("inventory_trace", default=None)
+
+
+
+
+class Trace:
+   """Tiempos de una sola ejecución, en orden de inicio y con su anidamiento"""
+
+
+   def __init__(self):
+       self.entries = []
+       self.counters = {}
+       self.depth = 0
+       self.started = time.perf_counter()
+       self.seconds = None
+
+
+   def rows(self):
+       """Filas para mostrar: operación (sangrada según el anidamiento), milisegundos y % del total"""
+       total = self.seconds or (time.perf_counter() - self.started)
+       return [{
+           'operación': "  " * depth + name,
+           'ms': round(seconds * 1000, 2) if seconds is not None else None,
+           '%': round(seconds / total * 100, 1) if seconds is not None and total else None
+       } for name, seconds, depth in self.entries]
+
+
+
+
+class Metrics:
+   """Tiempos y contadores acumulados del proceso (seguro entre hilos).
+
+
+   timer()/timed() miden una operación: suman a los acumulados del proceso
+   (cantidad, total y máximo por nombre) y, si hay una traza activa en el hilo,
+   la registran también en ella para el desglose por rerun. Los nombres usan
+   puntos por área: storage.*, sales.*, stock.*, report.*, frame.*, chart.*,
+   page.*.
+   """
+
+
+   def __init__(self):
+       self._lock = threading.Lock()
+       self._timers = {}
+       self._counters = {}
+       self._last_dump = 0.0
+       self.started = time.time()
+
+
+   @contextmanager
+   def timer(self, name):
+       """Mide el bloque con el nombre dado"""
+       trace = _current_trace.get()
+       if trace is not None:
+           entry = [name, None, trace.depth]
+           trace.entries.append(entry)
+           trace.depth += 1
+       started = time.perf_counter()
+       try:
+           yield
+       finally:
+           elapsed = time.perf_counter() - started
+           if trace is not None:
+               entry[1] = elapsed
+               trace.depth -= 1
+           self.observe(name, elapsed)
+
+
+   def timed(self, name):
+       """Decorador: mide cada llamada a la función con el nombre dado"""
+       def decorator(func):
+           @functools.wraps(func)
+           def wrapper(*args, **kwargs):
+               with self.timer(name):
+                   return func(*args, **kwargs)
+           return wrapper
+       return decorator
+
+
+   def observe(self, name, seconds):
+       """Suma una medición a los acumulados de name"""
+       with self._lock:
+           timer = self._timers.get(name)
+           if timer is None:
+               self._timers[name] = [1, seconds, seconds]
+           else:
+               timer[0] += 1
+               timer[1] += seconds
+               if seconds > timer[2]:
+                   timer[2] = seconds
+
+
+   def count(self, name, amount=1):
+       """Incrementa un contador (y el de la traza activa, si hay una)"""
+       with self._lock:
+           self._counters[name] = self._counters.get(name, 0) + amount
+       trace = _current_trace.get()
+       if trace is not None:
+           trace.counters[name] = trace.counters.get(name, 0) + amount
+
+
+   @contextmanager
+   def trace(self):
+       """Registra el desglose de tiempos de una ejecución (por ejemplo un rerun)"""
+       trace = Trace()
+       token = _current_trace.set(trace)
+       try:
+           yield trace
+       finally:
+           trace.seconds = time.perf_counter() - trace.started
+           _current_trace.reset(token)
+
+
+   def snapshot(self):
+       """Acumulados del proceso en un dict apto para JSON"""
+       with self._lock:
+           timers = {name: {
+               "count": count,
+               "total_seconds": total,
+               "avg_seconds": total / count,
+               "max_seconds": maximum
+           } for name, (count, total, maximum) in sorted(self._timers.items())}
+           counters = dict(sorted(self._counters.items()))
+       return {"uptime_seconds": time.time() - self.started, "timers": timers, "counters": counters}
+
+
+   def prometheus(self, prefix="inventory"):
+       """Acumulados del proceso en el formato de texto de Prometheus"""
+       snapshot = self.snapshot()
+       lines = [
+           f"# HELP {prefix}_uptime_seconds Segundos desde que arrancó el proceso",
+           f"# TYPE {prefix}_uptime_seconds gauge",
+           f"{prefix}_uptime_seconds {snapshot['uptime_seconds']:.3f}",
+           f"# HELP {prefix}_operation_seconds Duración de las operaciones instrumentadas",
+           f"# TYPE {prefix}_operation_seconds summary"
+       ]
+       for name, timer in snapshot["timers"].items():
+           label = _label(name)
+           lines.append(f'{prefix}_operation_seconds_count{{operation="{label}"}} {timer["count"]}')
+           lines.append(f'{prefix}_operation_seconds_sum{{operation="{label}"}} {timer["total_seconds"]:.6f}')
+       lines.append(f"# HELP {prefix}_operation_max_seconds Duración máxima de cada operación")
+       lines.append(f"# TYPE {prefix}_operation_max_seconds gauge")
+       for name, timer in snapshot["timers"].items():
+           lines.append(f'{prefix}_operation_max_seconds{{operation="{_label(name)}"}} {timer["max_seconds"]:.6f}')
+       lines.append(f"# HELP {prefix}_events_total Contadores de eventos")
+       lines.append(f"# TYPE {prefix}_events_total counter")
+       for name, value in snapshot["counters"].items():
+           lines.append(f'{prefix}_events_total{{event="{_label(name)}"}} {value}')
+       return "\n".join(lines) + "\n"
+
+
+   def dump(self, path, min_interval=0):
+       """Escribe snapshot() en path (JSON, de forma atómica) si pasaron min_interval segundos desde el último"""
+       now = time.monotonic()
+       with self._lock:
+           if self._last_dump and now - self._last_dump < min_interval:
+               return False
+           self._last_dump = now
+       write_json(path, self.snapshot(), pretty=True)
+       return True
+
+
+   def reset(self):
+       """Descarta los acumulados"""
+       with self._lock:
+           self._timers.clear()
+           self._counters.clear()
+           self.started = time.time()
+
+
+
+
+def _label(value):
+   return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+
+
+# Registro compartido por todo el proceso
+metrics = Metrics()
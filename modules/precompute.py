@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+
+from modules.atomic import write_json
+from modules.metrics import metrics
+from modules.serializer import DecodeError, load_file, loads
+from modules.storage import file_signature
+
+
+
+
+def _frame_records(frame):
+   """DataFrame como lista de dicts con tipos JSON (fechas en ISO)"""
+   return loads(frame.to_json(orient="records", date_format="iso")) if frame is not None else []
+
+
+
+
+def _rollup_report(inventory, group_by):
+   return _frame_records(inventory.reports.generate_sales_report(group_by=group_by))
+
+
+
+
+def _sales_by_day(inventory):
+   return _rollup_report(inventory, 'day')
+
+
+
+
+def _sales_by_month(inventory):
+   return _rollup_report(inventory, 'month')
+
+
+
+
+def _top_products(inventory):
+   # Desde los totales por producto: no recorre el historial (se agrupa por nombre como el ranking del período)
+   quantities = {}
+   for entry in inventory.sales.sales_rollup().products().values():
+       quantities[entry['name']] = quantities.get(entry['name'], 0) + entry['items']
+   top = sorted(quantities.items(), key=lambda item: item[1], reverse=True)[:10]
+   return [{'name': name, 'quantity': quantity} for name, quantity in top]
+
+
+
+
+def _category_sales(inventory):
+   # Desde los totales por categoría (la categoría de cada producto al momento de la venta)
+   categories = inventory.sales.sales_rollup().categories()
+   return [{'category': category, 'subtotal': entry['revenue']}
+           for category, entry in sorted(categories.items(), key=lambda item: item[1]['revenue'], reverse=True)]
+
+
+
+
+def _stock_status(inventory):
+   report = inventory.reports.generate_stock_report()
+   by_category = report.groupby('category', sort=True)[['stock', 'stock_value']].sum().reset_index()
+   return {
+       'with_stock': int((report['stock'] > 0).sum()),
+       'without_stock': int((report['stock'] <= 0).sum()),
+       'units': int(report['stock'].sum()),
+       'value': float(report['stock_value'].sum()),
+       'by_category': _frame_records(by_category)
+   }
+
+
+
+
+# Reportes precalculados: nombre -> (datos de los que depende, función que lo calcula sobre un Inventory)
+REPORTS = {
+   'sales_by_day': (('rollups',), _sales_by_day),
+   'sales_by_month': (('rollups',), _sales_by_month),
+   'top_products': (('rollups',), _top_products),
+   'category_sales': (('rollups',), _category_sales),
+   'stock_status': (('products', 'stock'), _stock_status)
+}
+
+
+
+
+class ReportStore:
+   """Reportes ya calculados, un archivo JSON por reporte en data/reports/.
+
+
+   Cada archivo guarda el resultado, cuándo se calculó y la versión de los
+   datos de los que salió (para no recalcularlo si no cambiaron). Las lecturas
+   se cachean hasta que el archivo cambie.
+   """
+
+
+   def __init__(self, store_dir="data/reports"):
+       self.store_dir = store_dir
+       self._cache = {}
+       self._lock = threading.Lock()
+
+
+   def _path(self, name):
+       return os.path.join(self.store_dir, f"{name}.json")
+
+
+   def load(self, name):
+       """{'data', 'computed_at', 'version', 'seconds'} del último cálculo, o None si todavía no hay"""
+       path = self._path(name)
+       signature = file_signature(path)
+       with self._lock:
+           cached = self._cache.get(name)
+           if cached is not None and cached[0] == signature:
+               return cached[1]
+       try:
+           report = load_file(path)
+       except (FileNotFoundError, DecodeError):
+           report = None
+       with self._lock:
+           self._cache[name] = (signature, report)
+       return report
+
+
+   def save(self, name, data, version, seconds):
+       os.makedirs(self.store_dir, exist_ok=True)
+       write_json(self._path(name), {
+           'name': name,
+           'computed_at': datetime.now().isoformat(timespec='seconds'),
+           'version': version,
+           'seconds': round(seconds, 4),
+           'data': data
+       })
+
+
+
+
+class ReportWorker:
+   """Recalcula en segundo plano los reportes cuyos datos cambiaron y los guarda en un ReportStore.
+
+
+   Revisa las firmas de los archivos cada interval segundos (o antes si se
+   llama a request()), así detecta también escrituras de otros procesos (la
+   API, manage.py). Los pedidos seguidos (uno por venta) se juntan en una sola
+   pasada cada debounce segundos. La interfaz lee siempre la última versión
+   guardada sin esperar el cálculo. También se puede correr como proceso
+   aparte con `python manage.py precompute-reports --watch`.
+   """
+
+
+   def __init__(self, inventory, store=None, interval=10, debounce=2):
+       self.inventory = inventory
+       self.store = store or ReportStore(os.path.join(inventory.storage.data_dir, "reports"))
+       self.interval = interval
+       self.debounce = debounce
+       self.errors = {}
+       self._wake = threading.Event()
+       self._stop = threading.Event()
+       self._thread = None
+
+
+   def versions(self):
+       """Versión actual de cada fuente de datos (firmas de sus archivos)"""
+       storage = self.inventory.storage
+       return {
+           'products': repr(storage.signature("products")),
+           'stock': repr(storage.signature("stock")),
+           'rollups': repr(self.inventory.sales.rollup.signature())
+       }
+
+
+   def run_once(self, force=False):
+       """Recalcula los reportes desactualizados (o todos con force); devuelve {nombre: segundos}"""
+       versions = self.versions()
+       computed = {}
+       for name, (sources, compute) in REPORTS.items():
+           version = "|".join(versions[source] for source in sources)
+           stored = self.store.load(name)
+           if not force and stored is not None and stored.get('version') == version:
+               continue
+           started = time.perf_counter()
+           try:
+               with metrics.timer(f"precompute.{name}"):
+                   data = compute(self.inventory)
+           except Exception as e:
+               # Se conserva la versión anterior; se reintenta en la próxima pasada
+               self.errors[name] = str(e)
+               metrics.count("precompute.error")
+               continue
+           seconds = time.perf_counter() - started
+           self.store.save(name, data, version, seconds)
+           self.errors.pop(name, None)
+           computed[name] = seconds
+       return computed
+
+
+   def run(self):
+       """Bucle del worker: una pasada cada interval segundos o poco después de un request()"""
+       while not self._stop.is_set():
+           try:
+               self.run_once()
+           except Exception:
+               metrics.count("precompute.error")
+           if self._wake.wait(self.interval) and self.debounce:
+               # Los pedidos que lleguen mientras tanto se atienden en la misma pasada
+               self._stop.wait(self.debounce)
+           self._wake.clear()
+
+
+   def start(self):
+       """Arranca el worker en un hilo de fondo (daemon)"""
+       if self._thread is None or not self._thread.is_alive():
+           self._stop.clear()
+           self._thread = threading.Thread(target=self.run, name="report-worker", daemon=True)
+           self._thread.start()
+       return self
+
+
+   def request(self):
+       """Pide una pasada pronto (por ejemplo después de registrar una venta); los pedidos seguidos se juntan"""
+       self._wake.set()
+
+
+   def stop(self):
+       self._stop.set()
+       self._wake.set()
@@ -1,54 +1,121 @@
-import json
+import os
 from datetime import datetime
 
 
+from modules.cache import CachedStorage
+from modules.metrics import metrics
+from modules.records import Product, StockEntry
+from modules.search import CatalogSearch
+from modules.serializer import DecodeError
+from modules.storage import JSONStorage
+
+
 
 
 class ProductManager:
-   def __init__(self, data_file="data/products.json"):
+   def __init__(self, data_file="data/products.json", storage=None):
        self.data_file = data_file
+       self.storage = storage or CachedStorage(
+           JSONStorage(os.path.dirname(data_file) or ".", files={"products": data_file}))
+       self.search_index = CatalogSearch(self.storage)
+
 
+   @metrics.timed("products.add_product")
+   def add_product(self, product_data, initial_stock=None):
+       """Agrega un nuevo producto, con su stock inicial en la misma escritura si se indica.
 
-   def add_product(self, product_data):
-       """Agrega un nuevo producto"""
-       products = self.load_products()
-       product_data['id'] = len(products) + 1
-       product_data['created_at'] = datetime.now().isoformat()
-       products.append(product_data)
-       return self.save_products(products)
+
+       Se valida antes de consumir un ID y de guardarlo; el ID asignado queda en product_data['id'].
+       """
+       try:
+           product = Product.from_dict({**product_data, 'id': 1})
+           now = datetime.now().isoformat()
+           stock = StockEntry.from_dict(1, {'quantity': initial_stock, 'last_updated': now}, minimum=0) \
+               if initial_stock is not None else None
+           product_data['id'] = product.id = self.storage.next_id("products")
+           product_data['created_at'] = product.created_at = now
+           product = product.to_dict()
+           before = self.search_index.signature()
+           stock = {product['id']: stock.to_dict()} if stock is not None else {}
+           result = self.storage.add_products([product], stock)
+           if result:
+               self.search_index.changed(before, product['id'], product)
+           return result
+       except Exception:
+           return False
 
 
    def load_products(self):
        """Carga todos los productos"""
        try:
-           with open(self.data_file, 'r') as f:
-               return json.load(f)
-       except (FileNotFoundError, json.JSONDecodeError):
+           return self.storage.load("products")
+       except (FileNotFoundError, DecodeError):
            return []
 
 
    def save_products(self, products):
        """Guarda los productos"""
        try:
-           with open(self.data_file, 'w') as f:
-               json.dump(products, f, indent=2)
-           return True
+           return self.storage.save("products", products)
        except Exception:
            return False
 
 
+   def products(self):
+       """Productos como registros Product"""
+       return [Product.from_dict(product) for product in self.load_products()]
+
+
+   def product(self, product_id):
+       """Producto como registro Product (None si no existe)"""
+       product = self.get_product(product_id)
+       return Product.from_dict(product) if product else None
+
+
+   @metrics.timed("products.search")
+   def search(self, query, limit=20):
+       """Productos que coinciden con la búsqueda (palabras por prefijo, sin tildes), mejores primero"""
+       try:
+           return [self.product(product_id) for product_id in self.search_index.search(query, limit)]
+       except (FileNotFoundError, DecodeError):
+           return []
+
+
    def get_product(self, product_id):
        """Obtiene un producto por ID"""
-       products = self.load_products()
-       return next((p for p in products if p['id'] == product_id), None)
+       try:
+           return self.storage.get_product(product_id)
+       except (FileNotFoundError, DecodeError):
+           return None
 
 
+   @metrics.timed("products.update_product")
    def update_product(self, product_id, updated_data):
-       """Actualiza un producto"""
-       products = self.load_products()
-       for i, product in enumerate(products):
-           if product['id'] == product_id:
-               products[i].update(updated_data)
-               return self.save_products(products)
-       return False
+       """Actualiza un producto (el resultado se valida antes de guardarlo)"""
+       try:
+           current = self.get_product(product_id)
+           if current is None:
+               return False
+           product = Product.from_dict({**current, **updated_data}).to_dict()
+           # Guardar los valores ya validados (precio como float, nombre y SKU sin espacios, ...)
+           updated_data = {key: product.get(key) for key in updated_data}
+           before = self.search_index.signature()
+           result = self.storage.update_product(product_id, updated_data)
+           if result:
+               self.search_index.changed(before, product_id, product)
+           return result
+       except Exception:
+           return False
+
 
+   @metrics.timed("products.delete_product")
+   def delete_product(self, product_id):
+       """Elimina un producto y su stock"""
+       try:
+           before = self.search_index.signature()
+           result = self.storage.delete_product(product_id)
+           if result:
+               self.search_index.changed(before, product_id)
+           return result
+       except Exception:
+           return False
@@ -0,0 +1,214 @@
+import math
+
+
+class InvalidRecordError(ValueError):
+   """Un registro no tiene el formato esperado"""
+
+
+
+
+def _number(data, field, kind, default=None, minimum=None):
+   value = data.get(field, default)
+   if value is None:
+       raise InvalidRecordError(f"Falta el campo '{field}'")
+   try:
+       value = kind(value)
+   except (TypeError, ValueError, OverflowError):
+       raise InvalidRecordError(f"Valor inválido para '{field}': {value!r}")
+   if not math.isfinite(value):
+       # nan / inf no se pueden guardar en JSON
+       raise InvalidRecordError(f"Valor inválido para '{field}': {value!r}")
+   if minimum is not None and value < minimum:
+       raise InvalidRecordError(f"'{field}' no puede ser menor a {minimum}: {value}")
+   return value
+
+
+
+
+def _text(data, field, default=None):
+   value = data.get(field, default)
+   if value is None or (default is None and not str(value).strip()):
+       raise InvalidRecordError(f"Falta el campo '{field}'")
+   return str(value)
+
+
+
+
+def normalize_sku(value):
+   """SKU / código de barras sin espacios sobrantes (None si está vacío)"""
+   if value is None:
+       return None
+   value = str(value).strip()
+   return value or None
+
+
+
+
+class Product:
+   """Producto del catálogo (los campos adicionales se conservan en extra)"""
+
+
+   __slots__ = ("id", "name", "price", "category", "description", "created_at", "sku", "extra")
+   FIELDS = ("id", "name", "price", "category", "description", "created_at", "sku")
+
+
+   def __init__(self, id, name, price, category="Sin categoría", description="", created_at=None, sku=None,
+                extra=None):
+       self.id = id
+       self.name = name
+       self.price = price
+       self.category = category
+       self.description = description
+       self.created_at = created_at
+       self.sku = sku
+       self.extra = extra
+
+
+   @classmethod
+   def from_dict(cls, data):
+       """Crea el producto validando los campos (lanza InvalidRecordError)"""
+       extra = {key: value for key, value in data.items() if key not in cls.FIELDS}
+       return cls(
+           _number(data, "id", int, minimum=1),
+           _text(data, "name").strip(),
+           _number(data, "price", float, minimum=0),
+           _text(data, "category", "Sin categoría"),
+           _text(data, "description", ""),
+           data.get("created_at"),
+           normalize_sku(data.get("sku")),
+           extra or None
+       )
+
+
+   def to_dict(self):
+       data = {
+           "id": self.id,
+           "name": self.name,
+           "price": self.price,
+           "category": self.category,
+           "description": self.description,
+           "created_at": self.created_at
+       }
+       if self.sku is not None:
+           data["sku"] = self.sku
+       if self.extra:
+           data.update(self.extra)
+       return data
+
+
+   def __repr__(self):
+       return f"Product(id={self.id!r}, name={self.name!r}, price={self.price!r})"
+
+
+
+
+class StockEntry:
+   """Stock de un producto"""
+
+
+   __slots__ = ("product_id", "quantity", "last_updated")
+
+
+   def __init__(self, product_id, quantity=0, last_updated=None):
+       self.product_id = product_id
+       self.quantity = quantity
+       self.last_updated = last_updated
+
+
+   @classmethod
+   def from_dict(cls, product_id, data, minimum=None):
+       """Crea la entrada desde el formato de stock.json ({} equivale a stock 0).
+
+
+       Al leer se aceptan cantidades negativas (datos de versiones anteriores);
+       para validar una cantidad nueva se pasa minimum=0.
+       """
+       return cls(int(product_id), _number(data, "quantity", int, default=0, minimum=minimum),
+                  data.get("last_updated"))
+
+
+   def to_dict(self):
+       return {'quantity': self.quantity, 'last_updated': self.last_updated}
+
+
+   def __repr__(self):
+       return f"StockEntry(product_id={self.product_id!r}, quantity={self.quantity!r})"
+
+
+
+
+class SaleLine:
+   """Línea de una venta"""
+
+
+   __slots__ = ("product_id", "name", "price", "quantity", "subtotal")
+
+
+   def __init__(self, product_id, name, price, quantity, subtotal=None):
+       self.product_id = product_id
+       self.name = name
+       self.price = price
+       self.quantity = quantity
+       self.subtotal = price * quantity if subtotal is None else subtotal
+
+
+   @classmethod
+   def from_dict(cls, data):
+       price = _number(data, "price", float, minimum=0)
+       quantity = _number(data, "quantity", int, minimum=1)
+       return cls(_number(data, "product_id", int), _text(data, "name", ""), price, quantity,
+                  _number(data, "subtotal", float, default=price * quantity))
+
+
+   def to_dict(self):
+       return {
+           'product_id': self.product_id,
+           'name': self.name,
+           'price': self.price,
+           'quantity': self.quantity,
+           'subtotal': self.subtotal
+       }
+
+
+   def __repr__(self):
+       return f"SaleLine(product_id={self.product_id!r}, quantity={self.quantity!r}, subtotal={self.subtotal!r})"
+
+
+
+
+class Sale:
+   """Venta con sus líneas (tupla de SaleLine)"""
+
+
+   __slots__ = ("id", "date", "lines", "total", "items_count")
+
+
+   def __init__(self, id, date, lines, total=None, items_count=None):
+       self.id = id
+       self.date = date
+       self.lines = tuple(lines)
+       self.total = sum(line.subtotal for line in self.lines) if total is None else total
+       self.items_count = sum(line.quantity for line in self.lines) if items_count is None else items_count
+
+
+   @classmethod
+   def from_dict(cls, data):
+       """Crea la venta desde el formato de sales.json (lanza InvalidRecordError)"""
+       lines = tuple(SaleLine.from_dict(line) for line in data.get("products", ()))
+       return cls(_number(data, "id", int, minimum=1), _text(data, "date"), lines,
+                  _number(data, "total", float, default=sum(line.subtotal for line in lines)),
+                  _number(data, "items_count", int, default=sum(line.quantity for line in lines)))
+
+
+   def to_dict(self):
+       return {
+           "id": self.id,
+           "date": self.date,
+           "products": [line.to_dict() for line in self.lines],
+           "total": self.total,
+           "items_count": self.items_count
+       }
+
+
+   def __repr__(self):
+       return f"Sale(id={self.id!r}, date={self.date!r}, total={self.total!r}, lines={len(self.lines)})"
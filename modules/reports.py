@@ -2,6 +2,11 @@ import pandas as pd
 from datetime import datetime, timedelta
 
 
+from modules.metrics import metrics
+from modules.records import StockEntry
+from modules.rollups import to_frame
+
+
 
 
 class ReportGenerator:
@@ -11,34 +16,93 @@ class ReportGenerator:
        self.stock_manager = stock_manager
 
 
-   def generate_sales_report(self, start_date=None, end_date=None):
-       """Genera reporte de ventas para un período"""
-       sales = self.sales_manager.load_sales()
+   @metrics.timed("report.sales")
+   def generate_sales_report(self, start_date=None, end_date=None, group_by=None):
+       """Genera reporte de ventas para un período.
+
+
+       Con group_by ('day', 'month', 'product' o 'category') devuelve los totales
+       precalculados en lugar de las ventas; los de producto y categoría son del
+       historial completo.
+       """
+       if group_by is not None:
+           return self._rollup_report(start_date, end_date, group_by)
+
+
+       # Solo las ventas del rango: meses archivados (memory-map) + índice por fecha de las vivas
+       if start_date and end_date:
+           sales = self.sales_manager.get_sales_between(start_date, end_date)
+           if not sales and (len(self.sales_manager.date_index()) or self.sales_manager.archive.last_sale_id):
+               return pd.DataFrame(columns=['id', 'date', 'products', 'total', 'items_count'])
+       else:
+           sales = self.sales_manager.archive.sales() + self.sales_manager.load_sales()
 
 
        if not sales:
            return None
 
 
+       # get_sales_between ya filtró el rango (un end_date sin hora incluye todo ese día)
        sales_df = pd.DataFrame(sales)
-       sales_df['date'] = pd.to_datetime(sales_df['date'])
+       sales_df['date'] = pd.to_datetime(sales_df['date'], format="ISO8601")
+       return sales_df
 
 
-       if start_date and end_date:
-           mask = (sales_df['date'] >= start_date) & (sales_df['date'] <= end_date)
-           sales_df = sales_df.loc[mask]
+   @metrics.timed("report.top_products")
+   def generate_top_products_report(self, n=10, start_date=None, end_date=None, by='quantity'):
+       """Ranking de productos más vendidos del período (por cantidad o por importe con by='subtotal')"""
+       return self.sales_manager.sales_lines(start_date, end_date).top_products(n, start_date, end_date, by)
 
 
-       return sales_df
+   @metrics.timed("report.category_sales")
+   def generate_category_sales_report(self, start_date=None, end_date=None, by='subtotal'):
+       """Ventas por categoría del período"""
+       categories = {product.id: product.category for product in self.product_manager.products()}
+       return self.sales_manager.sales_lines(start_date, end_date).by_category(categories, start_date, end_date, by)
+
+
+   def _rollup_report(self, start_date, end_date, group_by):
+       rollup = self.sales_manager.sales_rollup()
+
+
+       if group_by == 'day':
+           report = to_frame(rollup.days(start_date, end_date), 'date')
+           report['date'] = pd.to_datetime(report['date'])
+       elif group_by == 'month':
+           report = to_frame(rollup.months(start_date, end_date), 'month')
+       elif group_by == 'product':
+           products = rollup.products()
+           report = to_frame(products, 'product_id')
+           report['name'] = [products[product_id].get('name') for product_id in report['product_id']]
+       elif group_by == 'category':
+           report = to_frame(rollup.categories(), 'category')
+       else:
+           raise ValueError(f"Agrupación desconocida: {group_by}")
+       return report
 
 
+   @metrics.timed("report.stock")
    def generate_stock_report(self):
        """Genera reporte de stock"""
-       products = self.product_manager.load_products()
-       stock_data = self.stock_manager.load_stock()
+       products = self.product_manager.products()
+       entries = self.stock_manager.entries()
 
 
        stock_report = []
        for product in products:
-           product_id = str(product['id'])
-           stock_info = stock_data.get(product_id, {})
+           entry = entries.get(product.id) or StockEntry(product.id)
+
+
+           stock_report.append({
+               'id': product.id,
+               'name': product.name,
+               'category': product.category,
+               'price': product.price,
+               'stock': entry.quantity,
+               'stock_value': product.price * entry.quantity,
+               'last_updated': entry.last_updated or 'Nunca'
+           })
+
+
+       return pd.DataFrame(stock_report, columns=['id', 'name', 'category', 'price', 'stock', 'stock_value',
+                                                  'last_updated'])
@@ -0,0 +1,54 @@
+class StockReservation:
+   """Reserva de stock para una venta: reserve() descuenta, commit() confirma, release() devuelve.
+
+
+   El descuento se hace de forma atómica en el backend (rechaza sobreventas),
+   por lo que no hace falta ningún lock mientras la venta termina de registrarse.
+   Usada como context manager, libera la reserva si ocurre una excepción.
+   """
+
+
+   def __init__(self, storage, items):
+       self.storage = storage
+       self.items = {}
+       for product_id, quantity in items:
+           self.items[product_id] = self.items.get(product_id, 0) + quantity
+       self.state = "pending"
+
+
+   def reserve(self):
+       """Descuenta el stock reservado (lanza InsufficientStockError si no alcanza)"""
+       if self.state != "pending":
+           raise RuntimeError(f"La reserva ya está en estado '{self.state}'")
+       self.storage.adjust_stock({product_id: -quantity for product_id, quantity in self.items.items()})
+       self.state = "reserved"
+       return self
+
+
+   def commit(self):
+       """Confirma la reserva (el stock ya fue descontado)"""
+       if self.state != "reserved":
+           raise RuntimeError(f"La reserva está en estado '{self.state}'")
+       self.state = "committed"
+       return True
+
+
+   def release(self):
+       """Devuelve el stock reservado"""
+       if self.state != "reserved":
+           return False
+       self.storage.adjust_stock(dict(self.items))
+       self.state = "released"
+       return True
+
+
+   def __enter__(self):
+       return self.reserve()
+
+
+   def __exit__(self, exc_type, exc_value, traceback):
+       if exc_type is None:
+           self.commit()
+       else:
+           self.release()
+       return False
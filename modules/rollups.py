@@ -0,0 +1,314 @@
+import math
+import os
+from bisect import bisect_right
+
+
+import pandas as pd
+
+
+from modules.atomic import write_json
+from modules.locking import FileLock
+from modules.metrics import metrics
+from modules.serializer import DecodeError, dumps_line, load_file, loads
+from modules.storage import file_signature
+
+
+
+
+def _empty_rollup():
+   return {"last_sale_id": 0, "applied": [], "days": {}, "months": {}, "products": {}, "categories": {}}
+
+
+
+
+def _add(bucket, key, revenue, items, tickets=1, **fields):
+   # Entrada nueva en lugar de modificar la existente: los lectores pueden estar usando la anterior
+   entry = bucket.get(key) or {"revenue": 0.0, "items": 0, "tickets": 0}
+   bucket[key] = {**entry, "revenue": entry["revenue"] + revenue, "items": entry["items"] + items,
+                  "tickets": entry["tickets"] + tickets, **fields}
+
+
+
+
+def _is_applied(ranges, sale_id):
+   """Si el ID está en la lista ordenada de rangos [desde, hasta]"""
+   index = bisect_right(ranges, [sale_id, math.inf]) - 1
+   return index >= 0 and ranges[index][0] <= sale_id <= ranges[index][1]
+
+
+
+
+def _mark_applied(ranges, sale_id):
+   """Agrega un ID a la lista de rangos [desde, hasta], uniendo rangos contiguos"""
+   index = bisect_right(ranges, [sale_id, math.inf])
+   joins_left = index > 0 and ranges[index - 1][1] == sale_id - 1
+   joins_right = index < len(ranges) and ranges[index][0] == sale_id + 1
+   if joins_left and joins_right:
+       ranges[index - 1:index + 1] = [[ranges[index - 1][0], ranges[index][1]]]
+   elif joins_left:
+       ranges[index - 1] = [ranges[index - 1][0], sale_id]
+   elif joins_right:
+       ranges[index] = [sale_id, ranges[index][1]]
+   else:
+       ranges.insert(index, [sale_id, sale_id])
+
+
+
+
+def _summary(sale, category_of):
+   """Lo que aporta una venta a los totales (con la categoría de cada producto al momento de la venta)"""
+   return {
+       "id": sale['id'],
+       "date": sale['date'],
+       "total": sale.get('total', 0),
+       "items": sale.get('items_count', 0),
+       "lines": [[str(line['product_id']), line['name'], category_of(line['product_id']), line['subtotal'],
+                  line['quantity']] for line in sale.get('products', [])]
+   }
+
+
+
+
+def to_frame(buckets, key_name='date'):
+   """Convierte {clave: totales} en un DataFrame ordenado (columnas key_name, total, items, tickets)"""
+   keys = sorted(buckets)
+   return pd.DataFrame({
+       key_name: keys,
+       'total': [buckets[key]["revenue"] for key in keys],
+       'items': [buckets[key]["items"] for key in keys],
+       'tickets': [buckets[key]["tickets"] for key in keys]
+   })
+
+
+
+
+class SalesRollup:
+   """Totales de ventas precalculados por día, mes, producto y categoría.
+
+
+   Cada venta suma sus importes una sola vez al registrarse, así el dashboard y
+   los reportes no recorren todo el historial en cada render. Lo que aporta
+   cada venta se agrega como una línea a rollups.log.jsonl en lugar de
+   reescribir rollups.json; cada fold_every ventas el log se vuelca en el
+   archivo. Los IDs ya sumados se guardan como rangos, así una venta que llega
+   fuera de orden se suma igual y una repetida no se suma dos veces.
+   """
+
+
+   def __init__(self, rollup_file="data/rollups.json", log_file=None, fold_every=200):
+       self.rollup_file = rollup_file
+       self.log_file = log_file or os.path.splitext(rollup_file)[0] + ".log.jsonl"
+       self.fold_every = fold_every
+       self._lock = FileLock(rollup_file + ".lock")
+       self._data = None
+       self._signature = None
+       self._pending = 0
+
+
+   def exists(self):
+       return os.path.exists(self.rollup_file)
+
+
+   def signature(self):
+       """Versión de los totales (cambia con cada venta registrada)"""
+       return file_signature(self.rollup_file, self.log_file)
+
+
+   def load(self):
+       """Devuelve los totales (releyendo los archivos solo si cambiaron; no modificarlos)"""
+       signature = self.signature()
+       if self._data is None or signature != self._signature:
+           summaries = self._load_log()
+           self._data = self._read(summaries)
+           self._pending = len(summaries)
+           self._signature = signature
+       return self._data
+
+
+   def ensure(self, history):
+       """Arma los totales desde el historial si todavía no existen; history() devuelve (ventas, productos)"""
+       if self.exists():
+           return False
+       with self._lock:
+           # Con el lock tomado: una venta registrada mientras tanto queda en el historial o se suma después
+           if self.exists():
+               return False
+           self._write(self._build(*history()))
+       return True
+
+
+   def apply(self, sale, category_of):
+       """Suma una venta a los totales; category_of(product_id) devuelve la categoría.
+
+
+       Si los totales todavía no existen no hace nada: se arman desde el
+       historial (que ya incluye la venta) con ensure() o rebuild().
+       """
+       with self._lock:
+           if not self.exists():
+               return False
+           data = self.load()
+           if _is_applied(data["applied"], sale['id']):
+               return False
+           summary = _summary(sale, category_of)
+           self._append_log(summary)
+
+
+           # Copia propia de los grupos que cambian: los lectores siguen usando la versión anterior
+           data = {**data, "applied": list(data["applied"]),
+                   **{key: dict(data[key]) for key in ("days", "months", "products", "categories")}}
+           self._apply(data, summary)
+           self._pending += 1
+           if self.fold_every and self._pending >= self.fold_every:
+               self._write(data)
+           else:
+               self._data = data
+               self._signature = self.signature()
+       return True
+
+
+   def invalidate(self):
+       """Marca los totales como desactualizados: se vuelven a armar desde el historial en el próximo uso.
+
+
+       Devuelve False si no se pudieron borrar los archivos (no lanza excepciones).
+       """
+       try:
+           with self._lock:
+               for path in (self.rollup_file, self.log_file):
+                   try:
+                       os.remove(path)
+                   except FileNotFoundError:
+                       pass
+               self._data = None
+               self._signature = None
+       except OSError:
+           return False
+       return True
+
+
+   @metrics.timed("rollup.rebuild")
+   def rebuild(self, sales, products):
+       """Recalcula todos los totales desde el historial (backfill)"""
+       data = self._build(sales, products)
+       with self._lock:
+           self._write(data)
+       return data
+
+
+   def days(self, start_date=None, end_date=None):
+       """Totales diarios {fecha ISO: totales}, opcionalmente filtrados por rango de fechas"""
+       return self._range(self.load()["days"], start_date, end_date)
+
+
+   def months(self, start_date=None, end_date=None):
+       """Totales mensuales {AAAA-MM: totales}"""
+       start = start_date.isoformat()[:7] if start_date else None
+       end = end_date.isoformat()[:7] if end_date else None
+       return {key: value for key, value in self.load()["months"].items()
+               if (start is None or key >= start) and (end is None or key <= end)}
+
+
+   def totals(self, start_date=None, end_date=None):
+       """Totales agregados del período: ingresos, items y cantidad de ventas"""
+       result = {"revenue": 0.0, "items": 0, "tickets": 0}
+       for entry in self.days(start_date, end_date).values():
+           result["revenue"] += entry["revenue"]
+           result["items"] += entry["items"]
+           result["tickets"] += entry["tickets"]
+       return result
+
+
+   def products(self):
+       return self.load()["products"]
+
+
+   def categories(self):
+       return self.load()["categories"]
+
+
+   @staticmethod
+   def _range(bucket, start_date, end_date):
+       start = start_date.isoformat()[:10] if start_date else None
+       end = end_date.isoformat()[:10] if end_date else None
+       return {key: value for key, value in bucket.items()
+               if (start is None or key >= start) and (end is None or key <= end)}
+
+
+   def _build(self, sales, products):
+       categories = {p['id']: p.get('category', 'Sin categoría') for p in products}
+       data = _empty_rollup()
+       for sale in sorted(sales, key=lambda s: s['id']):
+           if not _is_applied(data["applied"], sale['id']):
+               self._apply(data, _summary(sale, lambda product_id: categories.get(product_id, 'Sin categoría')))
+       return data
+
+
+   @staticmethod
+   def _apply(data, summary):
+       _add(data["days"], summary['date'][:10], summary['total'], summary['items'])
+       _add(data["months"], summary['date'][:7], summary['total'], summary['items'])
+
+
+       seen_products, seen_categories = set(), set()
+       for product_id, name, category, subtotal, quantity in summary['lines']:
+           _add(data["products"], product_id, subtotal, quantity, int(product_id not in seen_products), name=name)
+           _add(data["categories"], category, subtotal, quantity, int(category not in seen_categories))
+           seen_products.add(product_id)
+           seen_categories.add(category)
+       _mark_applied(data["applied"], summary['id'])
+       data["last_sale_id"] = max(data["last_sale_id"], summary['id'])
+
+
+   def _read(self, summaries):
+       try:
+           data = load_file(self.rollup_file)
+       except (FileNotFoundError, DecodeError):
+           data = _empty_rollup()
+       if not isinstance(data, dict) or not data.keys() >= _empty_rollup().keys():
+           # Archivo dañado o editado a mano: igual que uno ilegible
+           data = _empty_rollup()
+       for summary in summaries:
+           if not _is_applied(data["applied"], summary['id']):
+               self._apply(data, summary)
+       return data
+
+
+   def _load_log(self):
+       summaries = []
+       try:
+           with open(self.log_file, 'rb') as f:
+               for line in f:
+                   line = line.strip()
+                   if not line:
+                       continue
+                   try:
+                       summaries.append(loads(line))
+                   except DecodeError:
+                       # Línea incompleta por un corte durante la escritura
+                       continue
+       except FileNotFoundError:
+           pass
+       return summaries
+
+
+   def _append_log(self, summary):
+       line = dumps_line(summary)
+       with open(self.log_file, 'ab') as f:
+           if f.tell() > 0 and not self._ends_with_newline():
+               line = b"\n" + line  # aislar una línea incompleta de un corte anterior
+           f.write(line)
+
+
+   def _ends_with_newline(self):
+       with open(self.log_file, 'rb') as f:
+           f.seek(-1, os.SEEK_END)
+           return f.read(1) == b"\n"
+
+
+   def _write(self, data):
+       write_json(self.rollup_file, data)
+       open(self.log_file, 'w', encoding='utf-8').close()
+       self._data = data
+       self._pending = 0
+       self._signature = self.signature()
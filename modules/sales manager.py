@@ -1,74 +1,189 @@
-import json
+import calendar
+import logging
+import os
 from datetime import datetime
 
 
+from modules.archive import SalesArchive
+from modules.cache import CachedStorage
+from modules.columnar import SalesLines
+from modules.date_index import SalesDateIndex
+from modules.metrics import metrics
+from modules.records import Sale, SaleLine
+from modules.rollups import SalesRollup
+from modules.serializer import DecodeError
+from modules.storage import JSONStorage
+
+
+
+
+logger = logging.getLogger(__name__)
+
+
 
 
 class SalesManager:
-   def __init__(self, data_file="data/sales.json"):
+   def __init__(self, data_file="data/sales.json", storage=None):
        self.data_file = data_file
+       self.storage = storage or CachedStorage(
+           JSONStorage(os.path.dirname(data_file) or ".", files={"sales": data_file}))
+       self.rollup = SalesRollup(os.path.join(self.storage.data_dir, "rollups.json"))
+       self.archive = SalesArchive(os.path.join(self.storage.data_dir, "archive"))
+       self._lines = None
+       self._lines_signature = None
+       self._index = None
+       self._index_signature = None
 
 
+   @metrics.timed("sales.record_sale")
    def record_sale(self, products, total_amount):
        """Registra una nueva venta"""
-       sales = self.load_sales()
+       # Validar las líneas antes de registrar (lanza InvalidRecordError); el ID se asigna al escribir
+       lines = [SaleLine.from_dict(item) for item in products]
+       sale_data = Sale(None, datetime.now().isoformat(), lines, total_amount).to_dict()
 
 
-       sale_data = {
-           "id": len(sales) + 1,
-           "date": datetime.now().isoformat(),
-           "products": products,
-           "total": total_amount,
-           "items_count": sum(item['quantity'] for item in products)
-       }
+       try:
+           before = self.storage.signature("sales")
+           self.storage.append_sale(sale_data, self.archive.last_sale_id)
+       except Exception:
+           return False, sale_data
 
 
-       sales.append(sale_data)
-       return self.save_sales(sales), sale_data
+       try:
+           self.sales_rollup().apply(sale_data, self._category_of)
+       except Exception:
+           # La venta ya quedó guardada: los totales se vuelven a armar desde el historial en el próximo uso
+           logger.exception("No se pudieron actualizar los totales con la venta %s", sale_data['id'])
+           metrics.count("rollup.error")
+           self.rollup.invalidate()
+
+
+       after = self.storage.signature("sales")
+       if self._lines is not None and self._lines_signature == before:
+           self._lines.append(sale_data)
+           self._lines_signature = after
+       if self._index is not None and self._index_signature == before:
+           self._index.add(sale_data)
+           self._index_signature = after
+       return True, sale_data
 
 
    def load_sales(self):
        """Carga todas las ventas"""
        try:
-           with open(self.data_file, 'r') as f:
-               return json.load(f)
-       except (FileNotFoundError, json.JSONDecodeError):
+           return self.storage.load("sales")
+       except DecodeError:
            return []
 
 
+   def sales(self, start=None, end=None):
+       """Ventas como registros Sale (del rango si se indica, incluyendo los meses archivados)"""
+       if start is None and end is None:
+           sales = self.archive.sales() + self.load_sales()
+       else:
+           sales = self.get_sales_between(start, end)
+       return [Sale.from_dict(sale) for sale in sales]
+
+
    def save_sales(self, sales):
        """Guarda las ventas"""
        try:
-           with open(self.data_file, 'w') as f:
-               json.dump(sales, f, indent=2)
+           self.storage.save("sales", sales)
+           self.rebuild_rollups(sales)
            return True
        except Exception:
            return False
 
 
+   def sales_lines(self, start_date=None, end_date=None):
+       """Líneas de venta en formato columnar: ventas vivas más los meses archivados del rango"""
+       signature = self.storage.signature("sales")
+       if self._lines is None or signature != self._lines_signature:
+           with metrics.timer("frame.sales_lines"):
+               self._lines = SalesLines.from_sales(self.load_sales())
+           self._lines_signature = signature
+
+
+       if self.archive.available and self.archive.months(start_date, end_date):
+           return SalesLines.concat([self.archive.sales_lines(start_date, end_date), self._lines])
+       return self._lines
+
+
+   def date_index(self):
+       """Índice por fecha de las ventas vivas (se reconstruye solo si cambiaron las ventas)"""
+       signature = self.storage.signature("sales")
+       if self._index is None or signature != self._index_signature:
+           with metrics.timer("sales.date_index"):
+               self._index = SalesDateIndex(self.load_sales())
+           self._index_signature = signature
+       return self._index
+
+
+   @metrics.timed("sales.get_sales_between")
+   def get_sales_between(self, start=None, end=None):
+       """Ventas con start <= fecha <= end (incluye los meses archivados del rango)"""
+       archived = SalesDateIndex(self.archive.sales(start, end)).between(start, end)
+       return archived + self.date_index().between(start, end)
+
+
+   def get_sale(self, sale_id):
+       """Venta por ID (también de los meses archivados)"""
+       return self.storage.get_sale(sale_id) or self.archive.get_sale(sale_id)
+
+
+   def archive_closed_months(self, before=None):
+       """Mueve las ventas de meses cerrados al archivo histórico (Arrow)"""
+       archived = self.archive.roll_closed_months(self.storage, before)
+       self._lines = None
+       return archived
+
+
+   def sales_rollup(self):
+       """Totales de ventas precalculados (se arman desde el historial si todavía no existen)"""
+       self.rollup.ensure(lambda: (self.archive.sales() + self.load_sales(), self.storage.load("products")))
+       return self.rollup
+
+
+   @metrics.timed("sales.rebuild_rollups")
+   def rebuild_rollups(self, sales=None):
+       """Recalcula los totales por día, mes, producto y categoría desde el historial"""
+       if sales is None:
+           sales = self.load_sales()
+       return self.rollup.rebuild(self.archive.sales() + sales, self.storage.load("products"))
+
+
+   def _category_of(self, product_id):
+       product = self.storage.get_product(product_id)
+       return product.get('category', 'Sin categoría') if product else 'Sin categoría'
+
+
+   def compact(self):
+       """Compacta el almacenamiento de ventas"""
+       return self.storage.compact()
+
+
+   @metrics.timed("sales.get_daily_sales")
    def get_daily_sales(self, date=None):
        """Obtiene ventas del día"""
-       sales = self.load_sales()
        if date is None:
            date = datetime.now().date()
 
 
-       daily_sales = [s for s in sales if datetime.fromisoformat(s['date']).date() == date]
+       daily_sales = self.archive.sales(date, date) + self.date_index().on_day(date)
        return daily_sales
 
 
+   @metrics.timed("sales.get_monthly_sales")
    def get_monthly_sales(self, year=None, month=None):
        """Obtiene ventas del mes"""
-       sales = self.load_sales()
        if year is None:
            year = datetime.now().year
        if month is None:
            month = datetime.now().month
 
 
-       monthly_sales = [
-           s for s in sales
-           if datetime.fromisoformat(s['date']).year == year and
-              datetime.fromisoformat(s['date']).month == month
-       ]
+       first_day = datetime(year, month, 1).date()
+       last_day = first_day.replace(day=calendar.monthrange(year, month)[1])
+       monthly_sales = self.archive.sales(first_day, last_day) + self.date_index().in_month(year, month)
        return monthly_sales
@@ -0,0 +1,261 @@
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+
+
+import numpy as np
+
+
+from modules.metrics import metrics
+
+
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+# Peso de cada campo al ordenar los resultados (una coincidencia en el nombre vale más)
+FIELD_WEIGHTS = {"name": 4, "sku": 3, "category": 2, "description": 1}
+
+
+
+
+def normalize(text):
+   """Minúsculas y sin tildes ('Cuaderno Éxito' -> 'cuaderno exito')"""
+   text = str(text or "")
+   if text.isascii():
+       return text.lower()
+   decomposed = unicodedata.normalize("NFKD", text)
+   return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+
+
+def tokenize(text):
+   """Palabras normalizadas de un texto"""
+   return _TOKEN.findall(normalize(text))
+
+
+
+
+def _field(product, name):
+   return product.get(name) if isinstance(product, dict) else getattr(product, name, None)
+
+
+
+
+class SearchIndex:
+   """Índice invertido en memoria sobre nombre, SKU, categoría y descripción de los productos.
+
+
+   Cada palabra normalizada apunta a los productos que la contienen (posición y
+   peso del campo en dos arreglos compactos) y el vocabulario se guarda ordenado
+   para resolver prefijos con búsqueda binaria: 'cuad exi' encuentra 'Cuaderno
+   Éxito'. Los puntajes se suman con NumPy sobre esos arreglos, sin recorrer
+   producto por producto. Se mantiene al día con add()/remove(), sin reconstruirlo.
+   """
+
+
+   def __init__(self):
+       self._postings = {}
+       self._vocabulary = []
+       self._slots = {}
+       self._ids = array("q")
+       self._tokens = []
+       self._lock = threading.RLock()
+
+
+   @classmethod
+   def build(cls, products):
+       """Arma el índice de un catálogo completo (con IDs repetidos vale el primero, como en get_product)"""
+       index = cls()
+       for product in products:
+           product_id = _field(product, "id")
+           if product_id is not None and int(product_id) not in index._slots:
+               index._index(int(product_id), product)
+       index._vocabulary = sorted(index._postings)
+       return index
+
+
+   def __len__(self):
+       return len(self._slots)
+
+
+   def __contains__(self, product_id):
+       return int(product_id) in self._slots
+
+
+   def _index(self, product_id, product):
+       weights = {}
+       for field, weight in FIELD_WEIGHTS.items():
+           for token in tokenize(_field(product, field)):
+               if weights.get(token, 0) < weight:
+                   weights[token] = weight
+       # La primera palabra del nombre pesa un poco más: 'cuaderno' prefiere 'Cuaderno ...' a '... cuaderno'
+       first = tokenize(_field(product, "name"))[:1]
+       for token in first:
+           weights[token] = FIELD_WEIGHTS["name"] + 1
+
+
+       slot = len(self._ids)
+       self._ids.append(product_id)
+       self._tokens.append(tuple(weights))
+       self._slots[product_id] = slot
+       for token, weight in weights.items():
+           postings = self._postings.get(token)
+           if postings is None:
+               postings = self._postings[token] = (array("i"), array("b"))
+           postings[0].append(slot)
+           postings[1].append(weight)
+
+
+   def add(self, product):
+       """Agrega un producto o reemplaza su versión anterior"""
+       product_id = int(_field(product, "id"))
+       with self._lock:
+           self.remove(product_id)
+           self._index(product_id, product)
+           for token in self._tokens[self._slots[product_id]]:
+               if len(self._postings[token][0]) == 1:
+                   insort(self._vocabulary, token)
+
+
+   def remove(self, product_id):
+       """Quita un producto del índice (si no está, no hace nada)"""
+       product_id = int(product_id)
+       with self._lock:
+           slot = self._slots.pop(product_id, None)
+           if slot is None:
+               return
+           # La posición queda libre: ya no figura en ninguna lista, así que nunca vuelve a aparecer
+           for token in self._tokens[slot]:
+               slots, weights = self._postings[token]
+               keep = np.frombuffer(slots, dtype=np.int32) != slot
+               if keep.any():
+                   self._postings[token] = (array("i", np.frombuffer(slots, dtype=np.int32)[keep].tobytes()),
+                                            array("b", np.frombuffer(weights, dtype=np.int8)[keep].tobytes()))
+               else:
+                   del self._postings[token]
+                   del self._vocabulary[bisect_left(self._vocabulary, token)]
+           self._tokens[slot] = ()
+
+
+   def _expand(self, term):
+       """Palabras del vocabulario que empiezan con term"""
+       start = bisect_left(self._vocabulary, term)
+       end = bisect_left(self._vocabulary, term + "\uffff", start)
+       return self._vocabulary[start:end]
+
+
+   def _scores(self, term):
+       """Puntaje de cada posición para term (0 si ninguna de sus palabras empieza con term)"""
+       scores = np.zeros(len(self._ids), dtype=np.int16)
+       for token in self._expand(term):
+           slots, weights = self._postings[token]
+           slots = np.frombuffer(slots, dtype=np.int32)
+           # Palabra exacta: doble puntaje que una que solo empieza igual
+           weights = np.frombuffer(weights, dtype=np.int8).astype(np.int16) * (2 if token == term else 1)
+           scores[slots] = np.maximum(scores[slots], weights)
+       return scores
+
+
+   def search(self, query, limit=20, accept=None):
+       """IDs de los productos que contienen todas las palabras de la consulta (por prefijo), mejores primero.
+
+
+       accept(product_id) permite descartar resultados (por ejemplo, sin stock)
+       antes de elegir los primeros limit.
+       """
+       terms = list(dict.fromkeys(tokenize(query)))
+       query = str(query).strip()
+       with self._lock:
+           best = []
+           # Una consulta numérica busca primero el producto con ese ID
+           if query.isdigit() and int(query) in self._slots and (accept is None or accept(int(query))):
+               best.append(int(query))
+           if not terms or not self._ids:
+               return best
+
+
+           total = self._scores(terms[0])
+           found = total > 0
+           for term in terms[1:]:
+               scores = self._scores(term)
+               found &= scores > 0
+               total += scores
+           candidates = np.flatnonzero(found)
+           if not len(candidates):
+               return best
+
+
+           # Orden: mayor puntaje y, a igual puntaje, menor ID
+           ids = np.frombuffer(self._ids, dtype=np.int64)[candidates]
+           key = (int(total.max()) - total[candidates].astype(np.int64)) * (int(ids.max()) + 1) + ids
+           if accept is None and len(key) > limit:
+               top = np.argpartition(key, limit)[:limit]
+               ranked = ids[top[np.argsort(key[top])]]
+           else:
+               ranked = ids[np.argsort(key)]
+
+
+           for product_id in ranked.tolist():
+               if len(best) >= limit:
+                   break
+               if product_id not in best[:1] and (accept is None or accept(product_id)):
+                   best.append(product_id)
+           return best
+
+
+
+
+class CatalogSearch:
+   """SearchIndex de los productos de un almacenamiento.
+
+
+   Se arma una vez por versión del catálogo; los cambios hechos por este proceso
+   se aplican al índice con changed() en lugar de reconstruirlo.
+   """
+
+
+   def __init__(self, storage):
+       self.storage = storage
+       self._index = None
+       self._signature = None
+       self._lock = threading.Lock()
+
+
+   def index(self):
+       with self._lock:
+           signature = self.storage.signature("products")
+           if self._index is None or self._signature != signature:
+               try:
+                   products = self.storage.load("products")
+               except FileNotFoundError:
+                   products = []
+               with metrics.timer("search.build"):
+                   self._index = SearchIndex.build(products)
+               self._signature = signature
+           return self._index
+
+
+   def signature(self):
+       """Versión actual del catálogo (tomarla antes de modificarlo y pasarla a changed())"""
+       return self.storage.signature("products")
+
+
+   def search(self, query, limit=20, accept=None):
+       return self.index().search(query, limit, accept)
+
+
+   def changed(self, before, product_id, product=None):
+       """Aplica un alta o modificación (product) o una baja (product=None) hecha sobre la versión before"""
+       with self._lock:
+           if self._index is None or self._signature != before:
+               return
+           if product is None:
+               self._index.remove(product_id)
+           else:
+               self._index.add(product)
+           self._signature = self.storage.signature("products")
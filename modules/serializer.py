@@ -0,0 +1,64 @@
+import json
+import os
+
+
+try:
+   import orjson
+except ImportError:  # orjson es opcional: sin él se usa el módulo json de la biblioteca estándar
+   orjson = None
+
+
+
+
+# Salida compacta por defecto; INVENTORY_PRETTY_JSON=1 vuelve a escribir con sangría (más fácil de leer a mano)
+PRETTY = os.environ.get("INVENTORY_PRETTY_JSON", "0") == "1"
+
+
+# Los errores de orjson heredan de json.JSONDecodeError, así que alcanza con capturar este
+DecodeError = json.JSONDecodeError
+
+
+
+
+def backend():
+   """Nombre de la biblioteca usada para serializar"""
+   return "orjson" if orjson is not None else "json"
+
+
+
+
+def dumps(data, pretty=None):
+   """Serializa a JSON (bytes UTF-8); pretty=None usa la configuración global"""
+   pretty = PRETTY if pretty is None else pretty
+   if orjson is not None:
+       options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+       if pretty:
+           options |= orjson.OPT_INDENT_2
+       return orjson.dumps(data, option=options)
+   if pretty:
+       return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+   return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+
+
+def dumps_line(data):
+   """Serializa un registro como una línea de JSON Lines (siempre compacta, con salto de línea)"""
+   return dumps(data, pretty=False) + b"\n"
+
+
+
+
+def loads(data):
+   """Decodifica JSON desde bytes o texto"""
+   if orjson is not None:
+       return orjson.loads(data)
+   return json.loads(data)
+
+
+
+
+def load_file(path):
+   """Lee un documento JSON completo"""
+   with open(path, 'rb') as f:
+       return loads(f.read())
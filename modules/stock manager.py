@@ -1,90 +1,110 @@
-import json
+import os
 from datetime import datetime
 
 
+from modules.cache import CachedStorage
+from modules.catalog import inventory_frame
+from modules.metrics import metrics
+from modules.records import StockEntry
+from modules.reservations import StockReservation
+from modules.serializer import DecodeError
+from modules.storage import JSONStorage
+
+
 
 
 class StockManager:
-   def __init__(self, data_file="data/stock.json"):
+   def __init__(self, data_file="data/stock.json", storage=None):
        self.data_file = data_file
+       self.storage = storage or CachedStorage(
+           JSONStorage(os.path.dirname(data_file) or ".", files={"stock": data_file}))
 
 
+   @metrics.timed("stock.set_stock")
    def set_stock(self, product_id, quantity):
        """Establece el stock de un producto"""
-       stock_data = self.load_stock()
-
-
-       stock_data[str(product_id)] = {
-           'quantity': quantity,
-           'last_updated': datetime.now().isoformat()
-       }
-
-
-       return self.save_stock(stock_data)
+       try:
+           entry = StockEntry.from_dict(product_id, {'quantity': quantity, 'last_updated': datetime.now().isoformat()},
+                                        minimum=0)
+           return self.storage.set_stock(product_id, entry.to_dict())
+       except Exception:
+           return False
 
 
+   @metrics.timed("stock.update_stock")
    def update_stock(self, product_id, quantity_change):
        """Actualiza el stock (suma o resta)"""
-       stock_data = self.load_stock()
+       try:
+           self.storage.adjust_stock({product_id: quantity_change}, clamp=True)
+           return True
+       except Exception:
+           return False
 
 
-       current_quantity = stock_data.get(str(product_id), {}).get('quantity', 0)
-       new_quantity = max(0, current_quantity + quantity_change)
+   @metrics.timed("stock.apply_batch")
+   def apply_batch(self, adjustments, clamp=True):
+       """Aplica varios ajustes de stock en una sola escritura.
 
 
-       stock_data[str(product_id)] = {
-           'quantity': new_quantity,
-           'last_updated': datetime.now().isoformat()
-       }
+       adjustments es una lista de {'product_id', 'delta'} (suma o resta) o
+       {'product_id', 'quantity'} (cantidad absoluta). Devuelve las nuevas
+       cantidades o None si falla (en ese caso no se aplica ninguno).
+       """
+       try:
+           return self.storage.apply_stock_batch(adjustments, clamp=clamp)
+       except Exception:
+           return None
+
 
+   @metrics.timed("stock.reserve")
+   def reserve(self, items):
+       """Reserva stock para una venta: items es una lista de (product_id, cantidad).
 
-       return self.save_stock(stock_data)
+
+       Lanza InsufficientStockError si algún producto no alcanza; en ese caso no
+       se descuenta nada.
+       """
+       return StockReservation(self.storage, items).reserve()
 
 
    def load_stock(self):
        """Carga todos los datos de stock"""
        try:
-           with open(self.data_file, 'r') as f:
-               return json.load(f)
-       except (FileNotFoundError, json.JSONDecodeError):
+           return self.storage.load("stock")
+       except (FileNotFoundError, DecodeError):
            return {}
 
 
    def save_stock(self, stock_data):
        """Guarda los datos de stock"""
        try:
-           with open(self.data_file, 'w') as f:
-               json.dump(stock_data, f, indent=2)
-           return True
+           return self.storage.save("stock", stock_data)
        except Exception:
            return False
 
 
-   def get_stock_level(self, product_id):
-       """Obtiene el nivel de stock de un producto"""
-       stock_data = self.load_stock()
-       return stock_data.get(str(product_id), {}).get('quantity', 0)
+   def entries(self):
+       """Stock de todos los productos como {product_id: StockEntry}"""
+       return {int(product_id): StockEntry.from_dict(product_id, entry)
+               for product_id, entry in self.load_stock().items()}
 
 
-   def get_all_stock(self, products):
-       """Obtiene todo el stock con información de productos"""
-       stock_data = self.load_stock()
-       stock_with_products = []
-
-
-       for product in products:
-           product_id = str(product['id'])
-           stock_info = stock_data.get(product_id, {})
+   def entry(self, product_id):
+       """Stock de un producto como StockEntry (cantidad 0 si no tiene)"""
+       try:
+           return StockEntry.from_dict(product_id, self.storage.get_stock(product_id))
+       except (FileNotFoundError, DecodeError):
+           return StockEntry(int(product_id))
 
 
-           stock_with_products.append({
-               'id': product['id'],
-               'name': product['name'],
-               'category': product['category'],
-               'price': product['price'],
-               'stock': stock_info.get('quantity', 0),
-               'last_updated': stock_info.get('last_updated', 'Nunca')
-           })
+   def get_stock_level(self, product_id):
+       """Obtiene el nivel de stock de un producto"""
+       return self.entry(product_id).quantity
 
 
-       return stock_with_products
+   def get_all_stock(self, products):
+       """Obtiene todo el stock con información de productos (acepta dicts o registros Product)"""
+       products = [product if isinstance(product, dict) else product.to_dict() for product in products]
+       frame = inventory_frame(products, self.load_stock())
+       return frame[['id', 'name', 'category', 'price', 'quantity', 'last_updated']] \
+           .rename(columns={'quantity': 'stock'}).to_dict('records')
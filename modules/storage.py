@@ -0,0 +1,812 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+from modules.atomic import read_json, write_json
+from modules.journal import DocumentLog, SalesJournal
+from modules.locking import FileLock
+from modules.records import normalize_sku
+from modules.serializer import DecodeError, dumps, loads
+
+
+
+
+DATA_TYPES = ("products", "sales", "stock", "categories")
+
+
+
+
+def empty_value(file_type):
+   """Valor vacío para cada tipo de datos"""
+   return {} if file_type == "stock" else []
+
+
+
+
+class InsufficientStockError(Exception):
+   """Se pidió más stock del disponible"""
+
+
+   def __init__(self, product_id, requested, available):
+       super().__init__(f"Stock insuficiente para el producto {product_id}: "
+                        f"pedido {requested}, disponible {available}")
+       self.product_id = product_id
+       self.requested = requested
+       self.available = available
+
+
+
+
+class DuplicateSkuError(ValueError):
+   """El SKU / código de barras ya pertenece a otro producto"""
+
+
+   def __init__(self, sku, product_id):
+       super().__init__(f"El código '{sku}' ya está asignado al producto {product_id}")
+       self.sku = sku
+       self.product_id = product_id
+
+
+
+
+def _check_skus(products, existing):
+   """Verifica que los SKU de products no se repitan entre sí ni con los demás productos de existing"""
+   incoming = {product['id'] for product in products}
+   taken = {}
+   for product in existing:
+       sku = normalize_sku(product.get('sku'))
+       if sku is not None and product['id'] not in incoming:
+           taken.setdefault(sku, product['id'])
+   for product in products:
+       sku = normalize_sku(product.get('sku'))
+       if sku is None:
+           continue
+       if taken.get(sku, product['id']) != product['id']:
+           raise DuplicateSkuError(sku, taken[sku])
+       taken[sku] = product['id']
+
+
+
+
+def _apply_change(product_id, current, delta, clamp):
+   """Nueva cantidad tras una variación; rechaza dejar el stock negativo salvo con clamp"""
+   new_quantity = current + delta
+   if new_quantity < 0:
+       if not clamp:
+           raise InsufficientStockError(product_id, -delta, current)
+       new_quantity = 0
+   return new_quantity
+
+
+
+
+def _batch_quantities(adjustments, current_of, clamp):
+   """Nuevas cantidades para una lista de ajustes {'product_id', 'delta'} o {'product_id', 'quantity'}.
+
+
+   Los ajustes se aplican en orden, así un mismo producto puede aparecer más
+   de una vez (por ejemplo, fijar el conteo y después sumar una entrega).
+   """
+   new_quantities = {}
+   for adjustment in adjustments:
+       product_id = adjustment['product_id']
+       current = new_quantities[product_id] if product_id in new_quantities else current_of(product_id)
+       if adjustment.get('quantity') is not None:
+           if adjustment['quantity'] < 0:
+               raise ValueError(f"Cantidad negativa para el producto {product_id}: {adjustment['quantity']}")
+           new_quantities[product_id] = adjustment['quantity']
+       else:
+           new_quantities[product_id] = _apply_change(product_id, current, adjustment['delta'], clamp)
+   return new_quantities
+
+
+
+
+def file_signature(*paths):
+   """Firma (mtime, tamaño) de uno o más archivos, para detectar cambios"""
+   signature = []
+   for path in paths:
+       try:
+           stat = os.stat(path)
+           signature.append((stat.st_mtime_ns, stat.st_size))
+       except FileNotFoundError:
+           signature.append(None)
+   return tuple(signature)
+
+
+
+
+class JSONStorage:
+   """Almacenamiento en archivos JSON (un documento por tipo de datos).
+
+
+   Productos y stock se guardan como documento base + log de cambios por
+   registro (DocumentLog): modificar un precio o una cantidad agrega una línea
+   en vez de reescribir todo el catálogo.
+   """
+
+
+   def __init__(self, data_dir="data", files=None, backups=0):
+       self.data_dir = data_dir
+       self.files = {file_type: os.path.join(data_dir, f"{file_type}.json") for file_type in DATA_TYPES}
+       self.files.update(files or {})
+       self.backups = backups
+       self.sales_journal = SalesJournal(self.files["sales"], backups=backups)
+       self.logs = {file_type: DocumentLog(self.files[file_type], backups=backups)
+                    for file_type in ("products", "stock")}
+       self._initialize_files()
+       self.stock_lock = FileLock(self.files["stock"] + ".lock")
+       self._stock = None  # (firma, {product_id: cantidad}) para los ajustes de stock
+       self.products_lock = FileLock(self.files["products"] + ".lock")
+       self.sequences_file = os.path.join(data_dir, "sequences.json")
+       self.sequences_lock = FileLock(self.sequences_file + ".lock")
+
+
+   def _initialize_files(self):
+       """Inicializa los archivos JSON si no existen"""
+       os.makedirs(self.data_dir, exist_ok=True)
+
+
+       for file_type, path in self.files.items():
+           if not os.path.exists(path):
+               write_json(path, empty_value(file_type))
+
+
+   def load(self, file_type):
+       """Carga un documento completo"""
+       if file_type == "sales":
+           return self.sales_journal.load()
+       if file_type in self.logs:
+           return self.logs[file_type].load()
+       return read_json(self.files[file_type])
+
+
+   def save(self, file_type, data):
+       """Guarda un documento completo (productos y stock: solo los registros que cambiaron)"""
+       if file_type == "sales":
+           return self.sales_journal.replace(data)
+       if file_type == "stock":
+           with self.stock_lock:
+               return self.logs["stock"].save(data)
+       if file_type in self.logs:
+           return self.logs[file_type].save(data)
+       return self._write(file_type, data)
+
+
+   def _write(self, file_type, data):
+       return write_json(self.files[file_type], data, self.backups)
+
+
+   def signature(self, file_type):
+       """Firma de los archivos de un tipo de datos"""
+       if file_type == "sales":
+           return file_signature(self.sales_journal.snapshot_file, self.sales_journal.journal_file)
+       if file_type in self.logs:
+           return file_signature(self.logs[file_type].base_file, self.logs[file_type].log_file)
+       return file_signature(self.files[file_type])
+
+
+   def append_sale(self, sale, floor=0):
+       """Agrega una venta al journal sin reescribir el historial.
+
+
+       Si la venta no tiene ID se le asigna el próximo de la secuencia (con
+       floor como en next_id) mientras se escribe, con el journal bloqueado.
+       """
+       assign_id = (lambda: self.next_id("sales", floor)) if sale.get('id') is None else None
+       self.sales_journal.append(sale, assign_id)
+       self.sales_journal.maybe_compact()
+       return True
+
+
+   def rewrite_sales(self, rewrite):
+       """Reemplaza las ventas por rewrite(ventas) sin que entre ninguna venta nueva en el medio"""
+       return self.sales_journal.rewrite(rewrite)
+
+
+   def get_product(self, product_id):
+       """Obtiene un producto por ID"""
+       return next((p for p in self.load("products") if p['id'] == product_id), None)
+
+
+   def get_product_by_sku(self, sku):
+       """Obtiene un producto por SKU / código de barras"""
+       sku = normalize_sku(sku)
+       return next((p for p in self.load("products") if sku is not None and normalize_sku(p.get('sku')) == sku),
+                   None)
+
+
+   def update_product(self, product_id, updated_data):
+       """Actualiza los campos de un producto (lanza DuplicateSkuError si el SKU nuevo ya está en uso)"""
+       with self.products_lock:
+           products = self.load("products")
+           product = next((p for p in products if p['id'] == product_id), None)
+           if product is None:
+               return False
+           product.update(updated_data)
+           if 'sku' in updated_data:
+               _check_skus([product], products)
+           if product['id'] != product_id:
+               self.logs["products"].delete(product_id)
+           return self.logs["products"].put(product['id'], product)
+
+
+   def delete_product(self, product_id):
+       """Elimina un producto y su stock"""
+       with self.products_lock:
+           self.logs["products"].delete(product_id)
+       with self.stock_lock:
+           return self.logs["stock"].delete(str(product_id))
+
+
+   def add_products(self, products, stock_entries, categories=()):
+       """Agrega productos nuevos, su stock inicial y categorías en una sola escritura por archivo"""
+       with self.products_lock:
+           # Solo se recorre el catálogo si los productos nuevos traen SKU
+           if any(normalize_sku(p.get('sku')) for p in products):
+               _check_skus(products, self.load("products"))
+           if categories:
+               self._write("categories", self.load("categories") + list(categories))
+           self.logs["products"].append([{'op': 'put', 'key': p['id'], 'value': p} for p in products])
+       with self.stock_lock:
+           return self.logs["stock"].append([{'op': 'put', 'key': str(product_id), 'value': entry}
+                                             for product_id, entry in stock_entries.items()])
+
+
+   def get_stock(self, product_id):
+       """Obtiene la entrada de stock de un producto ({} si no tiene)"""
+       return self.load("stock").get(str(product_id), {})
+
+
+   def set_stock(self, product_id, entry):
+       """Guarda la entrada de stock de un producto"""
+       with self.stock_lock:
+           return self.logs["stock"].put(str(product_id), entry)
+
+
+   def adjust_stock(self, changes, clamp=False):
+       """Aplica variaciones {product_id: delta} de forma atómica (todas o ninguna).
+
+
+       Lee el stock vigente bajo el lock del archivo, así dos cajas que venden a la
+       vez no pisan sus cambios. Sin clamp, una variación que deje stock negativo
+       lanza InsufficientStockError y no se guarda nada.
+       """
+       now = datetime.now().isoformat()
+       with self.stock_lock:
+           quantities = self._stock_quantities()
+           new_quantities = {}
+           for product_id, delta in changes.items():
+               new_quantities[product_id] = _apply_change(product_id, quantities.get(str(product_id), 0), delta, clamp)
+           self._put_quantities(new_quantities, now)
+       return new_quantities
+
+
+   def next_id(self, file_type, floor=0, count=1):
+       """Reserva IDs de una secuencia persistente y devuelve el primero.
+
+
+       La secuencia nunca retrocede, así que los IDs no se repiten aunque se
+       borren registros. La primera vez arranca desde el mayor ID guardado;
+       floor permite respetar IDs que viven fuera del almacenamiento (por
+       ejemplo, las ventas archivadas).
+       """
+       with self.sequences_lock:
+           try:
+               sequences = read_json(self.sequences_file)
+           except (FileNotFoundError, DecodeError):
+               sequences = {}
+           if file_type not in sequences:
+               sequences[file_type] = max((record['id'] for record in self.load(file_type)), default=0)
+
+
+           first_id = max(sequences[file_type], floor) + 1
+           sequences[file_type] = first_id + count - 1
+           write_json(self.sequences_file, sequences)
+       return first_id
+
+
+   def get_sale(self, sale_id):
+       """Obtiene una venta por ID"""
+       return next((s for s in self.load("sales") if s['id'] == sale_id), None)
+
+
+   def apply_stock_batch(self, adjustments, clamp=False):
+       """Aplica una lista de ajustes (variaciones o cantidades absolutas) en una sola escritura.
+
+
+       Todo o nada: si un ajuste deja stock negativo (sin clamp) no se guarda
+       ninguno.
+       """
+       now = datetime.now().isoformat()
+       with self.stock_lock:
+           quantities = self._stock_quantities()
+           new_quantities = _batch_quantities(
+               adjustments, lambda product_id: quantities.get(str(product_id), 0), clamp)
+           self._put_quantities(new_quantities, now)
+       return new_quantities
+
+
+   def _stock_quantities(self):
+       # {product_id: cantidad} en memoria; se relee el stock solo si otro escritor cambió los archivos.
+       # Se usa con stock_lock tomado.
+       signature = self.signature("stock")
+       if self._stock is None or self._stock[0] != signature:
+           self._stock = (signature, {key: entry.get('quantity', 0) for key, entry in self.load("stock").items()})
+       return self._stock[1]
+
+
+   def _put_quantities(self, new_quantities, now):
+       self.logs["stock"].append([
+           {'op': 'put', 'key': str(product_id), 'value': {'quantity': quantity, 'last_updated': now}}
+           for product_id, quantity in new_quantities.items()
+       ])
+       # El mapa estaba vigente (se leyó con el mismo lock): se actualiza en lugar de releer el stock
+       quantities = self._stock[1]
+       quantities.update((str(product_id), quantity) for product_id, quantity in new_quantities.items())
+       self._stock = (self.signature("stock"), quantities)
+
+
+   def compact(self):
+       """Compacta el journal de ventas y vuelca los logs de productos y stock en sus archivos"""
+       self.logs["products"].checkpoint()
+       with self.stock_lock:
+           self.logs["stock"].checkpoint()
+       return self.sales_journal.compact()
+
+
+
+
+class SQLiteStorage:
+   """Almacenamiento en SQLite con índices para consultas puntuales"""
+
+
+   SCHEMA = """
+       CREATE TABLE IF NOT EXISTS products (
+           seq INTEGER PRIMARY KEY AUTOINCREMENT,
+           id INTEGER NOT NULL,
+           name TEXT,
+           category TEXT,
+           sku TEXT,
+           data TEXT NOT NULL
+       );
+       CREATE INDEX IF NOT EXISTS idx_products_id ON products (id);
+       CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+       CREATE UNIQUE INDEX IF NOT EXISTS idx_products_sku ON products (sku);
+
+
+       CREATE TABLE IF NOT EXISTS stock (
+           product_id TEXT PRIMARY KEY,
+           quantity INTEGER NOT NULL DEFAULT 0,
+           last_updated TEXT
+       );
+
+
+       CREATE TABLE IF NOT EXISTS sales (
+           id INTEGER PRIMARY KEY,
+           date TEXT NOT NULL,
+           total REAL NOT NULL,
+           items_count INTEGER NOT NULL
+       );
+       CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (date);
+
+
+       CREATE TABLE IF NOT EXISTS sale_lines (
+           sale_id INTEGER NOT NULL REFERENCES sales (id),
+           line_no INTEGER NOT NULL,
+           product_id INTEGER,
+           name TEXT,
+           price REAL,
+           quantity INTEGER,
+           subtotal REAL,
+           PRIMARY KEY (sale_id, line_no)
+       );
+       CREATE INDEX IF NOT EXISTS idx_sale_lines_product ON sale_lines (product_id);
+
+
+       CREATE TABLE IF NOT EXISTS categories (
+           seq INTEGER PRIMARY KEY AUTOINCREMENT,
+           name TEXT NOT NULL UNIQUE
+       );
+
+
+       CREATE TABLE IF NOT EXISTS sequences (
+           name TEXT PRIMARY KEY,
+           value INTEGER NOT NULL
+       );
+   """
+
+
+   def __init__(self, db_file="data/inventory.db"):
+       self.db_file = db_file
+       self.data_dir = os.path.dirname(db_file) or "."
+       self._local = threading.local()
+       os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+
+
+       with self._connect() as conn:
+           conn.executescript(self.SCHEMA)
+
+
+   def _connect(self):
+       """Una conexión por hilo (Streamlit atiende cada sesión en su propio hilo)"""
+       conn = getattr(self._local, "conn", None)
+       if conn is None:
+           conn = sqlite3.connect(self.db_file, timeout=30)
+           conn.execute("PRAGMA journal_mode=WAL")
+           conn.execute("PRAGMA synchronous=NORMAL")
+           self._local.conn = conn
+       return conn
+
+
+   def is_empty(self):
+       """Indica si la base todavía no tiene datos"""
+       conn = self._connect()
+       return not any(
+           conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+           for table in ("products", "stock", "sales", "categories")
+       )
+
+
+   def load(self, file_type):
+       """Carga un documento completo con el mismo formato que los archivos JSON"""
+       conn = self._connect()
+
+
+       if file_type == "products":
+           return [loads(row[0]) for row in conn.execute("SELECT data FROM products ORDER BY seq")]
+
+
+       if file_type == "stock":
+           return {
+               product_id: {'quantity': quantity, 'last_updated': last_updated}
+               for product_id, quantity, last_updated in conn.execute(
+                   "SELECT product_id, quantity, last_updated FROM stock")
+           }
+
+
+       if file_type == "categories":
+           return [row[0] for row in conn.execute("SELECT name FROM categories ORDER BY seq")]
+
+
+       if file_type == "sales":
+           sales = {}
+           for sale_id, date, total, items_count in conn.execute(
+                   "SELECT id, date, total, items_count FROM sales ORDER BY id"):
+               sales[sale_id] = {
+                   "id": sale_id,
+                   "date": date,
+                   "products": [],
+                   "total": total,
+                   "items_count": items_count
+               }
+           for sale_id, product_id, name, price, quantity, subtotal in conn.execute(
+                   "SELECT sale_id, product_id, name, price, quantity, subtotal FROM sale_lines "
+                   "ORDER BY sale_id, line_no"):
+               sales[sale_id]["products"].append({
+                   'product_id': product_id,
+                   'name': name,
+                   'price': price,
+                   'quantity': quantity,
+                   'subtotal': subtotal
+               })
+           return list(sales.values())
+
+
+       raise KeyError(file_type)
+
+
+   def save(self, file_type, data):
+       """Reemplaza un documento completo dentro de una transacción"""
+       conn = self._connect()
+
+
+       with conn:
+           if file_type == "products":
+               conn.execute("DELETE FROM products")
+               self._insert_products(conn, data)
+
+
+           elif file_type == "stock":
+               conn.execute("DELETE FROM stock")
+               conn.executemany(
+                   "INSERT INTO stock (product_id, quantity, last_updated) VALUES (?, ?, ?)",
+                   [(str(product_id), entry.get('quantity', 0), entry.get('last_updated'))
+                    for product_id, entry in data.items()])
+
+
+           elif file_type == "categories":
+               conn.execute("DELETE FROM categories")
+               conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)",
+                                [(name,) for name in data])
+
+
+           elif file_type == "sales":
+               conn.execute("DELETE FROM sale_lines")
+               conn.execute("DELETE FROM sales")
+               for sale in data:
+                   self._insert_sale(conn, sale)
+
+
+           else:
+               raise KeyError(file_type)
+       return True
+
+
+   def signature(self, file_type):
+       """Firma de la base (cualquier escritura cambia la base o su WAL)"""
+       return file_signature(self.db_file, self.db_file + "-wal")
+
+
+   def append_sale(self, sale, floor=0):
+       """Inserta una venta y sus líneas (si no tiene ID, le asigna el próximo en la misma transacción)"""
+       conn = self._connect()
+       assign_id = sale.get('id') is None
+       try:
+           with conn:
+               if assign_id:
+                   conn.execute("BEGIN IMMEDIATE")
+                   sale['id'] = self._reserve_ids(conn, "sales", floor, 1)
+               self._insert_sale(conn, sale)
+       except BaseException:
+           if assign_id:
+               sale['id'] = None  # el ID volvió a la secuencia con el rollback
+           raise
+       return True
+
+
+   def rewrite_sales(self, rewrite):
+       """Reemplaza las ventas por rewrite(ventas) en una sola transacción (bloquea las escrituras)"""
+       conn = self._connect()
+       with conn:
+           conn.execute("BEGIN IMMEDIATE")
+           sales = rewrite(self.load("sales"))
+           conn.execute("DELETE FROM sale_lines")
+           conn.execute("DELETE FROM sales")
+           for sale in sales:
+               self._insert_sale(conn, sale)
+       return True
+
+
+   def get_product(self, product_id):
+       """Obtiene un producto por ID usando el índice"""
+       row = self._connect().execute(
+           "SELECT data FROM products WHERE id = ? ORDER BY seq LIMIT 1", (product_id,)).fetchone()
+       return loads(row[0]) if row else None
+
+
+   def get_product_by_sku(self, sku):
+       """Obtiene un producto por SKU / código de barras usando el índice único"""
+       row = self._connect().execute(
+           "SELECT data FROM products WHERE sku = ?", (normalize_sku(sku),)).fetchone()
+       return loads(row[0]) if row else None
+
+
+   def update_product(self, product_id, updated_data):
+       """Actualiza los campos de un producto (lanza DuplicateSkuError si el SKU nuevo ya está en uso)"""
+       conn = self._connect()
+       with conn:
+           row = conn.execute(
+               "SELECT seq, data FROM products WHERE id = ? ORDER BY seq LIMIT 1", (product_id,)).fetchone()
+           if row is None:
+               return False
+           product = loads(row[1])
+           product.update(updated_data)
+           _, name, category, sku, data = self._product_row(product)
+           try:
+               conn.execute("UPDATE products SET id = ?, name = ?, category = ?, sku = ?, data = ? WHERE seq = ?",
+                            (product['id'], name, category, sku, data, row[0]))
+           except sqlite3.IntegrityError:
+               raise self._duplicate_sku(conn, [product])
+       return True
+
+
+   def delete_product(self, product_id):
+       """Elimina un producto y su stock"""
+       conn = self._connect()
+       with conn:
+           conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+           conn.execute("DELETE FROM stock WHERE product_id = ?", (str(product_id),))
+       return True
+
+
+   def add_products(self, products, stock_entries, categories=()):
+       """Agrega productos nuevos, su stock inicial y categorías en una sola transacción"""
+       conn = self._connect()
+       with conn:
+           conn.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)",
+                            [(name,) for name in categories])
+           self._insert_products(conn, products)
+           conn.executemany(
+               "INSERT OR REPLACE INTO stock (product_id, quantity, last_updated) VALUES (?, ?, ?)",
+               [(str(product_id), entry.get('quantity', 0), entry.get('last_updated'))
+                for product_id, entry in stock_entries.items()])
+       return True
+
+
+   def get_stock(self, product_id):
+       """Obtiene la entrada de stock de un producto ({} si no tiene)"""
+       row = self._connect().execute(
+           "SELECT quantity, last_updated FROM stock WHERE product_id = ?", (str(product_id),)).fetchone()
+       return {'quantity': row[0], 'last_updated': row[1]} if row else {}
+
+
+   def set_stock(self, product_id, entry):
+       """Guarda la entrada de stock de un producto"""
+       conn = self._connect()
+       with conn:
+           conn.execute(
+               "INSERT OR REPLACE INTO stock (product_id, quantity, last_updated) VALUES (?, ?, ?)",
+               (str(product_id), entry.get('quantity', 0), entry.get('last_updated')))
+       return True
+
+
+   def adjust_stock(self, changes, clamp=False):
+       """Aplica variaciones {product_id: delta} en una transacción (todas o ninguna).
+
+
+       BEGIN IMMEDIATE toma el lock de escritura antes de leer, así ninguna otra
+       conexión cambia las cantidades entre la lectura y la escritura.
+       """
+       now = datetime.now().isoformat()
+       conn = self._connect()
+       new_quantities = {}
+
+
+       with conn:
+           conn.execute("BEGIN IMMEDIATE")
+           for product_id, delta in changes.items():
+               row = conn.execute("SELECT quantity FROM stock WHERE product_id = ?", (str(product_id),)).fetchone()
+               current = row[0] if row else 0
+               new_quantity = _apply_change(product_id, current, delta, clamp)
+
+
+               conn.execute("INSERT OR REPLACE INTO stock (product_id, quantity, last_updated) VALUES (?, ?, ?)",
+                            (str(product_id), new_quantity, now))
+               new_quantities[product_id] = new_quantity
+       return new_quantities
+
+
+   def next_id(self, file_type, floor=0, count=1):
+       """Reserva IDs de una secuencia persistente y devuelve el primero (nunca se repiten)"""
+       if file_type not in ("products", "sales"):
+           raise KeyError(file_type)
+       conn = self._connect()
+
+
+       with conn:
+           conn.execute("BEGIN IMMEDIATE")
+           return self._reserve_ids(conn, file_type, floor, count)
+
+
+   @staticmethod
+   def _reserve_ids(conn, file_type, floor, count):
+       row = conn.execute("SELECT value FROM sequences WHERE name = ?", (file_type,)).fetchone()
+       current = row[0] if row else conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {file_type}").fetchone()[0]
+       first_id = max(current, floor) + 1
+       conn.execute("INSERT OR REPLACE INTO sequences (name, value) VALUES (?, ?)", (file_type, first_id + count - 1))
+       return first_id
+
+
+   def get_sale(self, sale_id):
+       """Obtiene una venta por ID con sus líneas"""
+       conn = self._connect()
+       row = conn.execute("SELECT id, date, total, items_count FROM sales WHERE id = ?", (sale_id,)).fetchone()
+       if row is None:
+           return None
+       return {
+           "id": row[0],
+           "date": row[1],
+           "products": [
+               {'product_id': product_id, 'name': name, 'price': price, 'quantity': quantity, 'subtotal': subtotal}
+               for product_id, name, price, quantity, subtotal in conn.execute(
+                   "SELECT product_id, name, price, quantity, subtotal FROM sale_lines WHERE sale_id = ? "
+                   "ORDER BY line_no", (sale_id,))
+           ],
+           "total": row[2],
+           "items_count": row[3]
+       }
+
+
+   def apply_stock_batch(self, adjustments, clamp=False):
+       """Aplica una lista de ajustes (variaciones o cantidades absolutas) en una sola transacción"""
+       now = datetime.now().isoformat()
+       conn = self._connect()
+
+
+       with conn:
+           conn.execute("BEGIN IMMEDIATE")
+
+
+           def current_of(product_id):
+               row = conn.execute("SELECT quantity FROM stock WHERE product_id = ?", (str(product_id),)).fetchone()
+               return row[0] if row else 0
+
+
+           new_quantities = _batch_quantities(adjustments, current_of, clamp)
+           conn.executemany(
+               "INSERT OR REPLACE INTO stock (product_id, quantity, last_updated) VALUES (?, ?, ?)",
+               [(str(product_id), quantity, now) for product_id, quantity in new_quantities.items()])
+       return new_quantities
+
+
+   def compact(self):
+       """Vuelca el WAL de SQLite en la base"""
+       self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+       return True
+
+
+   @staticmethod
+   def _product_row(product):
+       return (product['id'], product.get('name'), product.get('category'), normalize_sku(product.get('sku')),
+               dumps(product, pretty=False).decode("utf-8"))
+
+
+   def _insert_products(self, conn, products):
+       try:
+           conn.executemany("INSERT INTO products (id, name, category, sku, data) VALUES (?, ?, ?, ?, ?)",
+                            [self._product_row(p) for p in products])
+       except sqlite3.IntegrityError:
+           raise self._duplicate_sku(conn, products)
+
+
+   @staticmethod
+   def _duplicate_sku(conn, products):
+       """DuplicateSkuError para el primer SKU de products que choca con el índice único"""
+       seen = {}
+       for product in products:
+           sku = normalize_sku(product.get('sku'))
+           if sku is None:
+               continue
+           row = conn.execute("SELECT id FROM products WHERE sku = ? AND id != ?", (sku, product['id'])).fetchone()
+           if row or sku in seen:
+               return DuplicateSkuError(sku, row[0] if row else seen[sku])
+           seen[sku] = product['id']
+       return DuplicateSkuError(None, None)
+
+
+   @staticmethod
+   def _insert_sale(conn, sale):
+       conn.execute(
+           "INSERT OR REPLACE INTO sales (id, date, total, items_count) VALUES (?, ?, ?, ?)",
+           (sale['id'], sale['date'], sale['total'], sale['items_count']))
+       conn.execute("DELETE FROM sale_lines WHERE sale_id = ?", (sale['id'],))
+       conn.executemany(
+           "INSERT INTO sale_lines (sale_id, line_no, product_id, name, price, quantity, subtotal) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)",
+           [(sale['id'], line_no, item['product_id'], item['name'], item['price'], item['quantity'],
+             item['subtotal'])
+            for line_no, item in enumerate(sale['products'])])
+
+
+
+
+def copy_storage(source, target):
+   """Copia todos los datos entre backends (por ejemplo, importar/exportar los JSON)"""
+   for file_type in DATA_TYPES:
+       target.save(file_type, source.load(file_type))
+   return True
+
+
+
+
+def create_storage(backend=None, data_dir="data"):
+   """Crea el backend configurado (INVENTORY_BACKEND=json|sqlite, INVENTORY_BACKUPS=n copias de respaldo)"""
+   backend = backend or os.environ.get("INVENTORY_BACKEND", "json")
+
+
+   if backend == "json":
+       return JSONStorage(data_dir, backups=int(os.environ.get("INVENTORY_BACKUPS", "0")))
+
+
+   if backend == "sqlite":
+       storage = SQLiteStorage(os.path.join(data_dir, "inventory.db"))
+       # Primera ejecución: importar los archivos JSON existentes
+       if storage.is_empty():
+           copy_storage(JSONStorage(data_dir), storage)
+       return storage
+
+
+   raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
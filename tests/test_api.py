@@ -0,0 +1,119 @@
+import json
+from datetime import date
+
+import pytest
+
+pytest.importorskip("starlette")
+anyio = pytest.importorskip("anyio")
+
+import api  # noqa: E402
+from modules.managers import Inventory  # noqa: E402
+
+
+def request(app, method, path, body=None):
+    """Llama a la aplicación ASGI directamente (sin cliente HTTP); devuelve (status, json)"""
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "root_path": "", "query_string": query.encode(),
+             "headers": [], "server": ("test", 80), "app": app}
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b"",
+                 "more_body": False}]
+    response = {"body": b""}
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            await app(scope, receive, send)
+
+    anyio.run(run)
+    return response["status"], json.loads(response["body"] or b"null")
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = api.create_app(data_dir=str(tmp_path))
+    status, _ = request(app, "POST", "/products", {"name": "Lapicera", "price": 5, "sku": "779", "stock": 10})
+    assert status == 201
+    return app
+
+
+def test_record_sale_reserves_stock(app):
+    status, sale = request(app, "POST", "/sales", {"items": [{"sku": "779", "quantity": 3}]})
+    assert status == 201
+    assert sale["total"] == 15.0
+    assert request(app, "GET", f"/sales/{sale['id']}") == (200, sale)
+    assert request(app, "GET", "/stock/1")[1]["quantity"] == 7
+
+    status, body = request(app, "POST", "/sales", {"items": [{"product_id": 1, "quantity": 8}]})
+    assert status == 409
+    assert (body["requested"], body["available"]) == (8, 7)
+
+
+@pytest.mark.parametrize("quantity, message", [
+    ("dos", "'items[0].quantity' debe ser un número entero"),
+    (1.5, "'items[0].quantity' debe ser un número entero"),
+    (0, "'items[0].quantity' no puede ser menor a 1"),
+])
+def test_record_sale_rejects_invalid_quantity(app, quantity, message):
+    assert request(app, "POST", "/sales", {"items": [{"product_id": 1, "quantity": quantity}]}) == (
+        400, {"error": message})
+    assert request(app, "GET", "/stock/1")[1]["quantity"] == 10
+
+
+def test_stock_endpoints_reject_invalid_quantities(app):
+    assert request(app, "POST", "/stock/adjustments", [{"product_id": 1, "delta": "5"}]) == (
+        400, {"error": "'[0].delta' debe ser un número entero"})
+    assert request(app, "POST", "/products", {"name": "Goma", "price": 1, "stock": "diez"}) == (
+        400, {"error": "'stock' debe ser un número entero"})
+    assert request(app, "POST", "/stock/adjustments", [{"product_id": 1, "delta": -4}]) == (200, {"1": 6})
+
+
+def test_stock_adjustments_validate_every_field_and_product(app):
+    assert request(app, "POST", "/stock/adjustments", [{"product_id": 1, "delta": 1, "quantity": "x"}]) == (
+        400, {"error": "'[0].quantity' debe ser un número entero"})
+    assert request(app, "POST", "/stock/adjustments", [{"product_id": 1, "quantity": -1}]) == (
+        400, {"error": "'[0].quantity' no puede ser menor a 0"})
+    assert request(app, "POST", "/stock/adjustments", [{"product_id": 1}])[0] == 400
+    adjustments = [{"product_id": 1, "delta": 1}, {"product_id": 99, "delta": 5}]
+    assert request(app, "POST", "/stock/adjustments", adjustments) == (404, {"error": "Producto desconocido: 99"})
+    assert list(request(app, "GET", "/stock")[1]) == ["1"]
+    assert request(app, "GET", "/stock/1")[1]["quantity"] == 10
+
+
+def test_update_and_errors(app):
+    status, product = request(app, "PATCH", "/products/1", {"price": "7.5", "sku": " 780 "})
+    assert status == 200
+    assert (product["price"], product["sku"]) == (7.5, "780")
+    assert request(app, "PATCH", "/products/1", {"price": "caro"})[0] == 400
+    assert request(app, "GET", "/products/99")[0] == 404
+    assert request(app, "GET", "/sales?start=ayer")[0] == 400
+
+
+def test_create_product_writes_stock_with_the_product(app):
+    status, product = request(app, "POST", "/products", {"name": "Goma", "price": 1, "stock": 4})
+    assert status == 201
+    assert (product["id"], product["stock"]) == (2, 4)
+    assert request(app, "GET", "/stock/2")[1]["quantity"] == 4
+    assert request(app, "GET", "/stock/99") == (404, {"error": "Producto no encontrado"})
+
+
+def test_list_sales_includes_archived_months(tmp_path):
+    pytest.importorskip("pyarrow")
+    inventory = Inventory(data_dir=str(tmp_path))
+    inventory.storage.save("sales", [
+        {'id': sale_id, 'date': f'2025-{month}-10T10:00:00', 'products': [], 'total': 0.0, 'items_count': 0}
+        for sale_id, month in ((1, '08'), (2, '09'), (3, '10'))])
+    inventory.sales.archive_closed_months(date(2025, 10, 1))
+    app = api.create_app(data_dir=str(tmp_path))
+
+    assert [sale['id'] for sale in request(app, "GET", "/sales")[1]["items"]] == [3, 2, 1]
+    assert [sale['id'] for sale in request(app, "GET", "/sales?limit=1&offset=2")[1]["items"]] == [1]
+    assert [sale['id'] for sale in request(app, "GET", "/sales?start=2025-09-01")[1]["items"]] == [3, 2]
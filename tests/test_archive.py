@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import date
+
+
+import pytest
+
+
+from modules.archive import SalesArchive
+from modules.managers import Inventory
+from modules.storage import create_storage
+
+
+pytest.importorskip("pyarrow")
+
+
+def _sale(sale_id, day, lines=((1, 2, 5.0),)):
+    products = [{'product_id': product_id, 'name': f'Producto {product_id}', 'price': price,
+                 'quantity': quantity, 'subtotal': quantity * price} for product_id, quantity, price in lines]
+    return {'id': sale_id, 'date': f'{day}T10:00:00', 'products': products,
+            'total': sum(line['subtotal'] for line in products),
+            'items_count': sum(line['quantity'] for line in products)}
+
+
+SALES = [
+    _sale(1, '2025-08-10'),
+    _sale(2, '2025-09-05', []),
+    _sale(3, '2025-09-20', [(1, 1, 5.0), (2, 3, 2.0)]),
+    _sale(4, '2025-10-02')
+]
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    storage = create_storage(request.param, str(tmp_path))
+    storage.save("sales", [dict(sale) for sale in SALES])
+    return storage
+
+
+def test_roll_moves_closed_months(storage, tmp_path):
+    archive = SalesArchive(str(tmp_path / "archive"))
+
+    assert archive.roll_closed_months(storage, date(2025, 10, 1)) == {'2025-08': 1, '2025-09': 2}
+    assert [s['id'] for s in storage.load("sales")] == [4]
+    assert archive.last_sale_id == 3
+    assert archive.sales() == SALES[:3]
+
+
+def test_roll_keeps_sales_without_products(storage, tmp_path):
+    archive = SalesArchive(str(tmp_path / "archive"))
+    archive.roll_closed_months(storage, date(2025, 10, 1))
+
+    assert archive.get_sale(2) == SALES[1]
+    assert archive.get_sale(3) == SALES[2]
+    assert archive.get_sale(4) is None
+    assert sorted(archive.sales_lines().columns()['sale_id']) == [1, 3, 3]
+
+
+def test_get_sale_reads_only_its_month(storage, tmp_path):
+    archive = SalesArchive(str(tmp_path / "archive"))
+    archive.roll_closed_months(storage, date(2025, 10, 1))
+    assert archive.manifest()['ids'] == {'2025-08': [1, 1], '2025-09': [2, 3]}
+
+    table = archive._table
+    opened = []
+    archive._table = lambda month: (opened.append(month), table(month))[1]
+    assert archive.get_sale(1) == SALES[0]
+    assert opened == ['2025-08']
+
+
+def test_month_files_are_mapped_once(storage, tmp_path):
+    archive = SalesArchive(str(tmp_path / "archive"))
+    archive.roll_closed_months(storage, date(2025, 10, 1))
+
+    first = archive._table('2025-09')
+    assert archive._table('2025-09') is first
+    archive.close()
+    assert archive._tables == {}
+    assert first["sale_id"].to_pylist() == [2, 3, 3]  # las tablas ya leídas siguen siendo válidas
+    assert archive.get_sale(3) == SALES[2]
+
+
+def test_roll_again_does_not_duplicate(storage, tmp_path):
+    archive = SalesArchive(str(tmp_path / "archive"))
+    archive.roll_closed_months(storage, date(2025, 10, 1))
+    # Corte después de escribir el archivo y antes de reescribir las ventas vivas
+    storage.save("sales", [dict(sale) for sale in SALES] + [_sale(5, '2025-09-30')])
+
+    assert archive.roll_closed_months(storage, date(2025, 10, 1)) == {'2025-09': 1}
+    assert [s['id'] for s in archive.sales()] == [1, 2, 3, 5]
+    assert archive.manifest()['months'] == {'2025-08': 1, '2025-09': 3}
+    assert archive.manifest()['ids'] == {'2025-08': [1, 1], '2025-09': [2, 5]}
+
+
+def test_sale_recorded_during_roll_is_kept(tmp_path):
+    storage = create_storage("json", str(tmp_path))
+    storage.save("sales", [dict(sale) for sale in SALES])
+    other = create_storage("json", str(tmp_path))  # otra caja sobre los mismos archivos
+    archive = SalesArchive(str(tmp_path / "archive"))
+    write_table = archive._write_table
+    recorded = threading.Event()
+
+    def slow_write(path, table):
+        thread = threading.Thread(target=lambda: (other.append_sale(_sale(None, '2025-10-03')), recorded.set()))
+        thread.start()
+        time.sleep(0.2)
+        assert not recorded.is_set()
+        write_table(path, table)
+
+    archive._write_table = slow_write
+    archive.roll_closed_months(storage, date(2025, 10, 1))
+    assert recorded.wait(5)
+
+    assert [s['id'] for s in storage.load("sales")] == [4, 5]
+
+
+def test_sales_manager_reads_archived_sales(tmp_path):
+    inventory = Inventory(data_dir=str(tmp_path))
+    inventory.storage.save("sales", [dict(sale) for sale in SALES])
+    inventory.sales.archive_closed_months(date(2025, 10, 1))
+
+    assert inventory.sales.get_sale(3) == SALES[2]
+    assert inventory.sales.get_sale(4) == SALES[3]
+    assert [s['id'] for s in inventory.sales.get_sales_between(date(2025, 9, 1), date(2025, 10, 31))] == [2, 3, 4]
@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+
+from modules.bulk_import import import_products, iter_rows, parse_stock_adjustments, validate_row
+from modules.storage import create_storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = create_storage("json", str(tmp_path))
+    storage.save("categories", ["Librería"])
+    return storage
+
+
+def test_import_csv_creates_products_stock_and_categories(storage):
+    stream = io.StringIO("nombre,precio,categoría,stock,código\n"
+                         "Lapicera, 150,Librería,10, 779 \n"
+                         "Cuaderno,\"1250,5\",Cuadernos,,\n")
+    report = import_products(storage, stream, "csv")
+
+    assert (report["rows"], report["imported"], report["errors"]) == (2, 2, [])
+    assert report["categories_created"] == ["Cuadernos"]
+    products = storage.load("products")
+    assert [(p["id"], p["name"], p["price"], p.get("sku")) for p in products] == [
+        (1, "Lapicera", 150.0, "779"), (2, "Cuaderno", 1250.5, None)]
+    assert {key: entry["quantity"] for key, entry in storage.load("stock").items()} == {"1": 10, "2": 0}
+    assert storage.load("categories") == ["Librería", "Cuadernos"]
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"name": "A", "price": "nan", "category": "X"}, "Precio inválido: nan"),
+    ({"name": "A", "price": "inf", "category": "X"}, "Precio inválido: inf"),
+    ({"name": "A", "price": "-1", "category": "X"}, "Precio negativo: -1.0"),
+    ({"name": "A", "price": "1", "category": "X", "stock": "inf"}, "Stock inválido: inf"),
+    ({"name": "A", "price": "1", "category": "X", "stock": "2.7"}, "Stock inválido: 2.7"),
+    ({"name": "A", "price": "1", "category": "X", "stock": "-2"}, "Stock negativo: -2"),
+    ({"name": "A", "price": "1"}, "Faltan campos obligatorios (nombre, precio, categoría)"),
+    (["A", 1], "La fila no es un objeto"),
+])
+def test_validate_row_rejects_invalid_values(row, message):
+    with pytest.raises(ValueError) as error:
+        validate_row(row)
+    assert str(error.value) == message
+
+
+def test_validate_row_normalizes_like_the_managers():
+    row = {"name": "  Goma ", "price": 5, "category": " Librería ", "stock": "3.0", "sku": " 12 "}
+    assert validate_row(row) == ("Goma", 5.0, "Librería", "", 3, "12")
+
+
+def test_invalid_rows_are_reported_and_skipped(storage):
+    storage.add_products([{"id": 1, "name": "Lapicera", "price": 1.0, "sku": "779"}], {})
+    stream = io.StringIO('{"name": "Goma", "price": 5, "category": "Librería", "stock": 2}\n'
+                         '{"name": "Regla", "price": 5, "cat\n'
+                         '\n'
+                         '{"name": "Otra", "price": 5, "category": "Librería", "sku": "779"}\n'
+                         '{"name": "Tijera", "price": 5, "category": "Librería", "stock": "inf"}\n')
+    report = import_products(storage, stream, "jsonl")
+
+    assert report["rows"] == 4
+    assert report["imported"] == 1
+    assert [line for line, _ in report["errors"]] == [2, 4, 5]
+    assert report["errors"][1][1] == "SKU repetido: 779"
+    assert [p["name"] for p in storage.load("products")] == ["Lapicera", "Goma"]
+
+
+def test_too_many_errors_imports_nothing(storage):
+    stream = io.StringIO("nombre,precio,categoria\nA,x,X\nB,y,X\nC,1,X\n")
+    with pytest.raises(ValueError):
+        import_products(storage, stream, "csv", max_errors=1)
+    assert storage.load("products") == []
+
+
+def test_rows_are_read_as_they_come():
+    def lines():
+        yield '{"name": "A"}\n'
+        raise AssertionError("se leyó más de lo necesario")
+
+    rows = iter_rows(lines(), "jsonl")
+    assert next(rows) == (1, {"name": "A"})
+
+
+def test_parse_stock_adjustments():
+    adjustments, errors = parse_stock_adjustments(["id,cantidad", "1, +5", "2;-3", "3\t=20", "4,=-1", "x,2", "5"])
+
+    assert adjustments == [{"product_id": 1, "delta": 5}, {"product_id": 2, "delta": -3},
+                           {"product_id": 3, "quantity": 20}]
+    assert [line for line, _ in errors] == [5, 6, 7]
@@ -0,0 +1,63 @@
+from datetime import date, datetime
+
+
+from modules.date_index import SalesDateIndex
+from modules.managers import Inventory
+
+
+def _sale(sale_id, when):
+    return {'id': sale_id, 'date': when, 'products': [], 'total': 1.0, 'items_count': 0}
+
+
+SALES = [
+    _sale(1, '2025-10-21T23:59:59'),
+    _sale(2, '2025-10-22T00:00:00'),
+    _sale(3, '2025-10-22T18:30:00.123456'),
+    _sale(4, '2025-10-23T09:00:00'),
+    _sale(5, '2025-11-01T10:00:00')
+]
+
+
+def _ids(sales):
+    return [sale['id'] for sale in sales]
+
+
+def test_between_date_bounds_include_whole_days():
+    index = SalesDateIndex(SALES)
+
+    assert _ids(index.between(date(2025, 10, 22), date(2025, 10, 22))) == [2, 3]
+    assert _ids(index.between(date(2025, 10, 21), date(2025, 10, 23))) == [1, 2, 3, 4]
+    assert _ids(index.between('2025-10-22', '2025-10-22')) == [2, 3]
+
+
+def test_between_datetime_bounds_are_exact():
+    index = SalesDateIndex(SALES)
+
+    assert _ids(index.between(datetime(2025, 10, 22), datetime(2025, 10, 22, 18, 30))) == [2]
+    assert _ids(index.between(datetime(2025, 10, 22, 0, 0, 1), None)) == [3, 4, 5]
+    assert _ids(index.between(None, date(2025, 10, 21))) == [1]
+
+
+def test_on_day_and_in_month():
+    index = SalesDateIndex(SALES)
+
+    assert _ids(index.on_day(date(2025, 10, 22))) == [2, 3]
+    assert _ids(index.in_month(2025, 10)) == [1, 2, 3, 4]
+    assert _ids(index.in_month(2025, 12)) == []
+
+
+def test_add_keeps_date_order():
+    index = SalesDateIndex(SALES[:2])
+    index.add(SALES[4])
+    index.add(SALES[2])
+
+    assert len(index) == 4
+    assert _ids(index.between()) == [1, 2, 3, 5]
+
+
+def test_sales_report_for_a_single_day(tmp_path):
+    inventory = Inventory(data_dir=str(tmp_path))
+    inventory.storage.save("sales", SALES)
+
+    report = inventory.reports.generate_sales_report(date(2025, 10, 22), date(2025, 10, 22))
+    assert list(report['id']) == [2, 3]
@@ -0,0 +1,200 @@
+import threading
+import time
+
+
+from modules.journal import DocumentLog, SalesJournal
+from modules.serializer import dumps_line
+
+
+def _sale(sale_id):
+    return {'id': sale_id, 'date': f'2025-10-{sale_id:02d}T10:00:00', 'total': 10.0 * sale_id, 'products': []}
+
+
+def _journal(tmp_path, **kwargs):
+    return SalesJournal(str(tmp_path / "sales.json"), **kwargs)
+
+
+def test_load_returns_snapshot_and_tail(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(_sale(1))
+    journal.compact()
+    journal.append(_sale(2))
+
+    assert [s['id'] for s in journal.load()] == [1, 2]
+
+
+def test_out_of_order_append_survives_compaction(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(_sale(8))
+    journal.append(_sale(9))
+    journal.compact()
+    journal.append(_sale(7))
+
+    assert sorted(s['id'] for s in journal.load()) == [7, 8, 9]
+    journal.compact()
+    assert sorted(s['id'] for s in journal.load()) == [7, 8, 9]
+
+
+def test_interrupted_compaction_does_not_duplicate(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(_sale(1))
+    journal.append(_sale(2))
+    journal.compact()
+    # Corte entre la escritura del snapshot y el vaciado del journal
+    with open(journal.journal_file, 'ab') as f:
+        f.write(dumps_line(_sale(1)) + dumps_line(_sale(2)) + dumps_line(_sale(3)))
+
+    assert [s['id'] for s in journal.load()] == [1, 2, 3]
+
+
+def test_incomplete_last_line_is_ignored(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(_sale(1))
+    with open(journal.journal_file, 'ab') as f:
+        f.write(b'{"id": 2, "da')
+
+    assert [s['id'] for s in journal.load()] == [1]
+
+
+def test_append_after_torn_line_survives_compaction(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(_sale(1))
+    with open(journal.journal_file, 'ab') as f:
+        f.write(b'{"id": 2, "da')
+    journal.append(_sale(3))
+    journal.append(_sale(4))
+
+    assert [s['id'] for s in journal.load()] == [1, 3, 4]
+    journal.compact()
+    assert [s['id'] for s in journal.load()] == [1, 3, 4]
+
+
+def test_replace_rewrites_history(tmp_path):
+    journal = _journal(tmp_path)
+    journal.append(_sale(1))
+    journal.append(_sale(2))
+    journal.replace([_sale(2)])
+
+    assert [s['id'] for s in journal.load()] == [2]
+    assert journal._count_pending() == 0
+
+
+def test_maybe_compact_after_threshold(tmp_path):
+    journal = _journal(tmp_path, compact_every=3)
+    for sale_id in (1, 2):
+        journal.append(_sale(sale_id))
+        assert journal.maybe_compact() is False
+    journal.append(_sale(3))
+
+    assert journal.maybe_compact() is True
+    assert journal._count_pending() == 0
+    assert [s['id'] for s in journal.load()] == [1, 2, 3]
+
+
+def test_append_during_compaction_is_not_lost(tmp_path):
+    journal = _journal(tmp_path)
+    for sale_id in range(1, 6):
+        journal.append(_sale(sale_id))
+
+    other = _journal(tmp_path)  # otra instancia (otro proceso) sobre los mismos archivos
+    write_snapshot = journal._write_snapshot
+    appended = threading.Event()
+
+    def slow_write(sales):
+        # Otra caja registra una venta mientras se escribe el snapshot
+        thread = threading.Thread(target=lambda: (other.append(_sale(6)), appended.set()))
+        thread.start()
+        time.sleep(0.2)
+        assert not appended.is_set()
+        write_snapshot(sales)
+
+    journal._write_snapshot = slow_write
+    journal.compact()
+    assert appended.wait(5)
+
+    assert [s['id'] for s in journal.load()] == [1, 2, 3, 4, 5, 6]
+
+
+def test_ids_assigned_while_appending_follow_file_order(tmp_path):
+    journal = _journal(tmp_path)
+    counter = iter(range(1, 1000))
+    threads = [threading.Thread(target=lambda: [journal.append({'date': '2025-10-22'}, lambda: next(counter))
+                                                for _ in range(25)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [s['id'] for s in journal.load()] == list(range(1, 201))
+
+
+def _product(product_id, price=10.0):
+    return {'id': product_id, 'name': f'Producto {product_id}', 'price': price}
+
+
+def _document_log(tmp_path, document, **kwargs):
+    log = DocumentLog(str(tmp_path / "products.json"), **kwargs)
+    log.replace(document)
+    return log
+
+
+def test_document_log_replays_puts_and_deletes_on_lists(tmp_path):
+    log = _document_log(tmp_path, [_product(1), _product(2), _product(3)])
+    log.put(2, _product(2, price=12.0))
+    log.delete(1)
+    log.put(4, _product(4))
+
+    assert log.load() == [_product(2, price=12.0), _product(3), _product(4)]
+    assert log._count_pending() == 3
+    # Otra instancia (otro proceso) aplica el mismo log sobre el base
+    assert DocumentLog(log.base_file).load() == log.load()
+
+
+def test_document_log_replays_dict_documents(tmp_path):
+    log = DocumentLog(str(tmp_path / "stock.json"))
+    log.replace({'1': {'quantity': 5}, '2': {'quantity': 0}})
+    log.put('1', {'quantity': 3})
+    log.delete('2')
+    log.put('3', {'quantity': 7})
+
+    assert log.load() == {'1': {'quantity': 3}, '3': {'quantity': 7}}
+
+
+def test_document_log_checkpoint_folds_log_into_base(tmp_path):
+    log = _document_log(tmp_path, [_product(1)])
+    log.put(2, _product(2))
+    log.checkpoint()
+
+    assert log._count_pending() == 0
+    assert log.load() == [_product(1), _product(2)]
+
+
+def test_document_log_checkpoints_every_n_changes(tmp_path):
+    log = _document_log(tmp_path, [], checkpoint_every=3)
+    for product_id in (1, 2):
+        log.put(product_id, _product(product_id))
+    assert log._count_pending() == 2
+    log.put(3, _product(3))
+
+    assert log._count_pending() == 0
+    assert [p['id'] for p in log.load()] == [1, 2, 3]
+
+
+def test_document_log_ignores_incomplete_last_line(tmp_path):
+    log = _document_log(tmp_path, [_product(1)])
+    log.put(2, _product(2))
+    with open(log.log_file, 'ab') as f:
+        f.write(b'{"op": "put", "key": 3, "val')
+
+    assert [p['id'] for p in log.load()] == [1, 2]
+    # La próxima escritura queda en su propia línea
+    log.put(4, _product(4))
+    assert [p['id'] for p in log.load()] == [1, 2, 4]
+
+
+def test_document_log_save_writes_only_changes(tmp_path):
+    log = _document_log(tmp_path, [_product(i) for i in range(1, 11)])
+    log.save([_product(i, price=20.0 if i == 5 else 10.0) for i in range(1, 10)])
+
+    assert log._count_pending() == 2  # precio del 5 y baja del 10
+    assert [p['price'] for p in log.load()] == [10.0] * 4 + [20.0] + [10.0] * 4
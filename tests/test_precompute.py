@@ -0,0 +1,61 @@
+import threading
+import time
+
+
+from modules.managers import Inventory
+from modules.precompute import ReportWorker
+
+
+PRODUCTS = [
+    {'id': 1, 'name': 'Lapicera', 'category': 'Librería', 'price': 5.0},
+    {'id': 2, 'name': 'Cuaderno', 'category': 'Librería', 'price': 20.0},
+    {'id': 3, 'name': 'Agua', 'category': 'Bebidas', 'price': 3.0}
+]
+
+
+def _inventory(tmp_path):
+    inventory = Inventory(data_dir=str(tmp_path))
+    inventory.storage.save("products", PRODUCTS)
+    inventory.storage.save("stock", {str(p['id']): {'quantity': 100, 'last_updated': None} for p in PRODUCTS})
+    return inventory
+
+
+def test_reports_from_rollups(tmp_path):
+    inventory = _inventory(tmp_path)
+    inventory.record_sale([{'product_id': 1, 'quantity': 3}, {'product_id': 3, 'quantity': 1}])
+    inventory.record_sale([{'product_id': 2, 'quantity': 2}])
+    worker = ReportWorker(inventory)
+
+    assert set(worker.run_once()) == {'sales_by_day', 'sales_by_month', 'top_products', 'category_sales',
+                                      'stock_status'}
+    assert worker.store.load('top_products')['data'] == [{'name': 'Lapicera', 'quantity': 3},
+                                                         {'name': 'Cuaderno', 'quantity': 2},
+                                                         {'name': 'Agua', 'quantity': 1}]
+    assert worker.store.load('category_sales')['data'] == [{'category': 'Librería', 'subtotal': 55.0},
+                                                           {'category': 'Bebidas', 'subtotal': 3.0}]
+    assert worker.run_once() == {}
+
+    inventory.record_sale([{'product_id': 3, 'quantity': 10}])
+    assert set(worker.run_once()) == {'sales_by_day', 'sales_by_month', 'top_products', 'category_sales',
+                                      'stock_status'}
+    assert worker.store.load('top_products')['data'][0] == {'name': 'Agua', 'quantity': 11}
+
+
+def test_requests_are_coalesced(tmp_path):
+    worker = ReportWorker(_inventory(tmp_path), interval=60, debounce=0.3)
+    passes = []
+    worker.run_once = lambda force=False: passes.append(time.monotonic()) or {}
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    time.sleep(0.1)
+
+    for _ in range(50):
+        worker.request()
+        time.sleep(0.01)
+    time.sleep(0.8)
+    worker.stop()
+    thread.join(5)
+
+    # La pasada inicial más una por la ráfaga de pedidos (no una por venta)
+    assert not thread.is_alive()
+    assert 2 <= len(passes) <= 3
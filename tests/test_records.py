@@ -0,0 +1,40 @@
+import pytest
+
+
+from modules.managers import Inventory
+from modules.records import InvalidRecordError, StockEntry
+
+
+def test_stock_entry_tolerates_legacy_negative_stock():
+    assert StockEntry.from_dict(1, {'quantity': -3}).quantity == -3
+    with pytest.raises(InvalidRecordError):
+        StockEntry.from_dict(1, {'quantity': -3}, minimum=0)
+
+
+def test_negative_stock_on_disk_does_not_break_reports(tmp_path):
+    inventory = Inventory(data_dir=str(tmp_path))
+    inventory.storage.add_products([{'id': 1, 'name': 'Lapicera', 'price': 5.0}],
+                                   {1: {'quantity': -2, 'last_updated': None}})
+
+    assert inventory.stock.entries()[1].quantity == -2
+    assert inventory.reports.generate_stock_report()['stock'].tolist() == [-2]
+    assert not inventory.stock.set_stock(1, -1)
+
+
+def test_invalid_product_does_not_consume_an_id(tmp_path):
+    inventory = Inventory(data_dir=str(tmp_path))
+
+    assert not inventory.products.add_product({'name': 'Lapicera', 'price': 'caro'})
+    product = {'name': 'Lapicera', 'price': 5}
+    assert inventory.products.add_product(product)
+    assert product['id'] == 1
+    assert inventory.storage.get_product(1)['price'] == 5.0
+
+
+def test_update_product_stores_validated_values(tmp_path):
+    inventory = Inventory(data_dir=str(tmp_path))
+    inventory.storage.add_products([{'id': 1, 'name': 'Goma', 'price': 5.0}], {1: {'quantity': 4, 'last_updated': None}})
+
+    assert inventory.products.update_product(1, {'price': '7.5', 'name': '  Goma  ', 'sku': ' 779 '})
+    assert inventory.storage.get_product(1) == {'id': 1, 'name': 'Goma', 'price': 7.5, 'sku': '779'}
+    assert inventory.record_sale([{'product_id': 1, 'quantity': 2}])['total'] == 15.0
@@ -0,0 +1,83 @@
+import threading
+
+
+import pytest
+
+
+from modules.reservations import StockReservation
+from modules.storage import InsufficientStockError, create_storage
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    storage = create_storage(request.param, str(tmp_path))
+    storage.save("stock", {'1': {'quantity': 5, 'last_updated': None}, '2': {'quantity': 1, 'last_updated': None}})
+    return storage
+
+
+def _quantity(storage, product_id):
+    return storage.get_stock(product_id).get('quantity')
+
+
+def test_reserve_and_commit(storage):
+    reservation = StockReservation(storage, [(1, 2), (2, 1), (1, 1)]).reserve()
+
+    assert reservation.items == {1: 3, 2: 1}
+    assert (_quantity(storage, 1), _quantity(storage, 2)) == (2, 0)
+    assert reservation.commit() is True
+    assert reservation.release() is False
+    assert (_quantity(storage, 1), _quantity(storage, 2)) == (2, 0)
+
+
+def test_release_returns_stock(storage):
+    reservation = StockReservation(storage, [(1, 4)]).reserve()
+
+    assert reservation.release() is True
+    assert reservation.state == "released"
+    assert _quantity(storage, 1) == 5
+    assert reservation.release() is False
+    with pytest.raises(RuntimeError):
+        reservation.commit()
+
+
+def test_insufficient_stock_reserves_nothing(storage):
+    reservation = StockReservation(storage, [(1, 2), (2, 2)])
+
+    with pytest.raises(InsufficientStockError) as error:
+        reservation.reserve()
+    assert (error.value.product_id, error.value.available) == (2, 1)
+    assert reservation.state == "pending"
+    assert (_quantity(storage, 1), _quantity(storage, 2)) == (5, 1)
+
+
+def test_context_manager_releases_on_error(storage):
+    with pytest.raises(ValueError):
+        with StockReservation(storage, [(1, 5)]):
+            assert _quantity(storage, 1) == 0
+            raise ValueError("no se pudo guardar la venta")
+    assert _quantity(storage, 1) == 5
+
+    with StockReservation(storage, [(1, 5)]) as reservation:
+        pass
+    assert reservation.state == "committed"
+    assert _quantity(storage, 1) == 0
+
+
+def test_concurrent_reservations_never_oversell(storage):
+    results = []
+
+    def reserve():
+        try:
+            StockReservation(storage, [(1, 1)]).reserve().commit()
+            results.append(True)
+        except InsufficientStockError:
+            results.append(False)
+
+    threads = [threading.Thread(target=reserve) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 5
+    assert _quantity(storage, 1) == 0
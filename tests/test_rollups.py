@@ -0,0 +1,121 @@
+import json
+from datetime import date
+
+
+from modules.managers import Inventory
+from modules.rollups import SalesRollup
+
+
+PRODUCTS = [{'id': 1, 'category': 'Bebidas'}, {'id': 2, 'category': 'Almacén'}]
+CATEGORIES = {product['id']: product['category'] for product in PRODUCTS}
+
+
+def _sale(sale_id, day='2025-10-22', lines=((1, 2, 5.0),)):
+    products = [{'product_id': product_id, 'name': f'Producto {product_id}', 'quantity': quantity,
+                 'unit_price': price, 'subtotal': quantity * price} for product_id, quantity, price in lines]
+    return {'id': sale_id, 'date': f'{day}T10:00:00', 'products': products,
+            'total': sum(line['subtotal'] for line in products),
+            'items_count': sum(line['quantity'] for line in products)}
+
+
+def _category_of(product_id):
+    return CATEGORIES.get(product_id, 'Sin categoría')
+
+
+def _rollup(tmp_path, sales=(), **kwargs):
+    rollup = SalesRollup(str(tmp_path / "rollups.json"), **kwargs)
+    rollup.rebuild(list(sales), PRODUCTS)
+    return rollup
+
+
+def test_rebuild_groups_by_day_month_product_and_category(tmp_path):
+    rollup = _rollup(tmp_path, [
+        _sale(1, '2025-10-22', [(1, 2, 5.0), (2, 1, 3.0)]),
+        _sale(2, '2025-10-23', [(1, 1, 5.0)]),
+        _sale(3, '2025-11-01', [(2, 4, 3.0)])
+    ])
+
+    assert rollup.days()['2025-10-22'] == {'revenue': 13.0, 'items': 3, 'tickets': 1}
+    assert rollup.months()['2025-10']['revenue'] == 18.0
+    assert rollup.products()['1'] == {'revenue': 15.0, 'items': 3, 'tickets': 2, 'name': 'Producto 1'}
+    assert rollup.categories()['Almacén']['revenue'] == 15.0
+    assert rollup.totals(date(2025, 10, 22), date(2025, 10, 23)) == {'revenue': 18.0, 'items': 4, 'tickets': 2}
+
+
+def test_apply_matches_rebuild(tmp_path):
+    sales = [_sale(sale_id, f'2025-10-{sale_id:02d}', [(1, sale_id, 5.0), (2, 1, 3.0)]) for sale_id in range(1, 8)]
+    rollup = SalesRollup(str(tmp_path / "applied.json"), fold_every=3)
+    rollup.rebuild([], PRODUCTS)
+    for sale in sales:
+        assert rollup.apply(sale, _category_of) is True
+
+    rebuilt = SalesRollup(str(tmp_path / "rebuilt.json"))
+    rebuilt.rebuild(sales, PRODUCTS)
+    assert rollup.load() == rebuilt.load()
+    # Otra instancia (otro proceso) lee el archivo más el log pendiente
+    assert SalesRollup(rollup.rollup_file).load() == rebuilt.load()
+
+
+def test_apply_out_of_order_and_repeated(tmp_path):
+    rollup = _rollup(tmp_path, [_sale(8), _sale(9)])
+
+    assert rollup.apply(_sale(7), _category_of) is True
+    assert rollup.apply(_sale(7), _category_of) is False
+    assert rollup.apply(_sale(9), _category_of) is False
+    assert rollup.totals()['tickets'] == 3
+    assert rollup.load()['applied'] == [[7, 9]]
+
+
+def test_apply_without_rollup_waits_for_history(tmp_path):
+    rollup = SalesRollup(str(tmp_path / "rollups.json"))
+    history = [_sale(1), _sale(2)]
+
+    assert rollup.apply(history[-1], _category_of) is False
+    assert not rollup.exists()
+    assert rollup.ensure(lambda: (history, PRODUCTS)) is True
+    assert rollup.ensure(lambda: (history, PRODUCTS)) is False
+    assert rollup.totals()['tickets'] == 2
+
+    assert rollup.apply(_sale(3), _category_of) is True
+    assert rollup.totals()['tickets'] == 3
+
+
+def test_damaged_file_reads_as_empty(tmp_path):
+    rollup = _rollup(tmp_path, [_sale(1), _sale(2)])
+    data = dict(rollup.load())
+    del data['applied']
+    (tmp_path / "rollups.json").write_text(json.dumps(data))
+
+    damaged = SalesRollup(str(tmp_path / "rollups.json"))
+    assert damaged.totals()['tickets'] == 0
+    damaged.rebuild([_sale(1), _sale(2)], PRODUCTS)
+    assert damaged.totals()['tickets'] == 2
+
+
+def test_incomplete_log_line_is_ignored(tmp_path):
+    rollup = _rollup(tmp_path, [_sale(1)])
+    rollup.apply(_sale(2), _category_of)
+    with open(rollup.log_file, 'ab') as f:
+        f.write(b'{"id": 3, "da')
+    rollup.apply(_sale(4), _category_of)
+
+    reloaded = SalesRollup(rollup.rollup_file)
+    assert reloaded.totals()['tickets'] == 3
+
+
+def test_sale_is_kept_when_rollup_fails(tmp_path, monkeypatch):
+    inventory = Inventory(data_dir=str(tmp_path))
+    sales = inventory.sales
+    assert sales.record_sale([{'product_id': 1, 'name': 'Producto 1', 'price': 5.0, 'quantity': 2}], 10.0)[0]
+
+    def broken_apply(sale, category_of):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(sales.rollup, "apply", broken_apply)
+    ok, sale = sales.record_sale([{'product_id': 1, 'name': 'Producto 1', 'price': 5.0, 'quantity': 1}], 5.0)
+
+    assert ok is True
+    assert [s['id'] for s in sales.load_sales()] == [1, 2]
+    assert not sales.rollup.exists()
+    monkeypatch.undo()
+    assert sales.sales_rollup().totals() == {'revenue': 15.0, 'items': 3, 'tickets': 2}
@@ -0,0 +1,67 @@
+from modules.search import CatalogSearch, SearchIndex, tokenize
+from modules.storage import create_storage
+
+
+PRODUCTS = [
+    {'id': 1, 'name': 'Cuaderno Éxito Rojo', 'category': 'Cuadernos', 'sku': '7790001'},
+    {'id': 2, 'name': 'Lapicera Bic Negra', 'category': 'Librería', 'description': 'Para cuaderno'},
+    {'id': 3, 'name': 'Cuaderno Rivadavia', 'category': 'Cuadernos'},
+]
+
+
+def test_tokenize_normalizes_accents_and_case():
+    assert tokenize('Cuaderno ÉXITO, tapa dura') == ['cuaderno', 'exito', 'tapa', 'dura']
+
+
+def test_search_by_prefix_ranks_name_matches_first():
+    index = SearchIndex.build(PRODUCTS)
+
+    assert index.search('cuad exi') == [1]
+    assert index.search('cuaderno') == [1, 3, 2]
+    assert index.search('779') == [1]
+    assert index.search('2') == [2]
+    assert index.search('cuaderno', accept=lambda product_id: product_id != 1) == [3, 2]
+    assert index.search('') == []
+
+
+def test_add_replaces_previous_version():
+    index = SearchIndex.build(PRODUCTS)
+    index.add({'id': 3, 'name': 'Goma Ñandú', 'category': 'Librería'})
+    index.add({'id': 4, 'name': 'Cuaderno Gloria'})
+
+    assert index.search('rivadavia') == []
+    assert index.search('nandu') == [3]
+    assert index.search('cuaderno') == [1, 4, 2]
+    assert len(index) == 4
+
+
+def test_remove_drops_product_and_unused_words():
+    index = SearchIndex.build(PRODUCTS)
+    index.remove(1)
+    index.remove(99)
+
+    assert 1 not in index
+    assert index.search('exito') == []
+    assert index.search('cuaderno') == [3, 2]
+    assert 'exito' not in index._vocabulary
+    index.add(PRODUCTS[0])
+    assert index.search('exito') == [1]
+
+
+def test_catalog_search_applies_own_changes_and_rebuilds_on_others(tmp_path):
+    storage = create_storage("json", str(tmp_path))
+    storage.save("products", PRODUCTS)
+    search = CatalogSearch(storage)
+    index = search.index()
+
+    before = search.signature()
+    product = {'id': 4, 'name': 'Cuaderno Gloria'}
+    storage.add_products([product], {})
+    search.changed(before, 4, product)
+    assert search.index() is index
+    assert search.search('gloria') == [4]
+
+    # Un cambio de otro proceso (sin changed()) obliga a reconstruir
+    create_storage("json", str(tmp_path)).delete_product(4)
+    assert search.search('gloria') == []
+    assert search.index() is not index
@@ -0,0 +1,78 @@
+import pytest
+
+
+from modules.storage import create_storage
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_append_sale_assigns_next_id(tmp_path, backend):
+    storage = create_storage(backend, str(tmp_path))
+    first = {'id': None, 'date': '2025-10-22T10:00:00', 'products': [], 'total': 0.0, 'items_count': 0}
+    second = dict(first)
+    storage.append_sale(first)
+    storage.append_sale(second, floor=10)
+
+    assert (first['id'], second['id']) == (1, 11)
+    assert [s['id'] for s in storage.load("sales")] == [1, 11]
+    assert storage.next_id("sales") == 12
+
+
+def test_stock_adjustments_see_other_writers(tmp_path):
+    storage = create_storage("json", str(tmp_path))
+    other = create_storage("json", str(tmp_path))  # otro proceso sobre los mismos archivos
+    storage.save("stock", {'1': {'quantity': 10, 'last_updated': None}})
+
+    assert storage.adjust_stock({1: -2}) == {1: 8}
+    assert other.adjust_stock({1: -3}) == {1: 5}
+    assert storage.apply_stock_batch([{'product_id': 1, 'delta': -1}, {'product_id': 2, 'quantity': 4}]) == {1: 4, 2: 4}
+    other.set_stock(1, {'quantity': 7, 'last_updated': None})
+    assert storage.adjust_stock({1: 1, 2: -4}) == {1: 8, 2: 0}
+    assert {key: entry['quantity'] for key, entry in other.load("stock").items()} == {'1': 8, '2': 0}
+
+
+def test_delete_product_removes_stock(tmp_path):
+    storage = create_storage("json", str(tmp_path))
+    storage.add_products([{'id': 1, 'name': 'Lapicera', 'price': 5.0}], {1: {'quantity': 3, 'last_updated': None}})
+
+    assert storage.delete_product(1)
+    assert storage.load("products") == []
+    assert storage.get_stock(1) == {}
+
+
+def test_standalone_managers_use_the_cached_index(tmp_path):
+    from modules.cache import CachedStorage
+    from modules.managers import SalesManager, StockManager
+
+    sales = SalesManager(str(tmp_path / "sales.json"))
+    stock = StockManager(str(tmp_path / "stock.json"))
+    assert isinstance(sales.storage, CachedStorage) and isinstance(stock.storage, CachedStorage)
+
+    sales.storage.save("products", [{'id': 1, 'name': 'Lapicera', 'price': 5.0, 'category': 'Librería'}])
+    assert sales._category_of(1) == 'Librería'
+    recorded, sale = sales.record_sale([{'product_id': 1, 'name': 'Lapicera', 'price': 5.0, 'quantity': 2,
+                                         'subtotal': 10.0}], 10.0)
+    assert recorded and sales.get_sale(sale['id']) == sale
+    assert sales.sales_rollup().categories()['Librería']['revenue'] == 10.0
+
+
+def test_sqlite_schema_and_concurrent_adjustments(tmp_path):
+    import threading
+
+    from modules.storage import DuplicateSkuError
+
+    storage = create_storage("sqlite", str(tmp_path))
+    storage.add_products([{'id': 1, 'name': 'Lapicera', 'price': 5.0, 'sku': '779'}],
+                         {1: {'quantity': 100, 'last_updated': None}})
+    with pytest.raises(DuplicateSkuError):
+        storage.add_products([{'id': 2, 'name': 'Goma', 'price': 1.0, 'sku': ' 779 '}], {})
+
+    other = create_storage("sqlite", str(tmp_path))  # otra conexión sobre la misma base
+    threads = [threading.Thread(target=lambda s=s: [s.adjust_stock({1: -1}) for _ in range(20)])
+               for s in (storage, other, storage, other)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert storage.get_stock(1)['quantity'] == 20
+    assert storage.adjust_stock({1: -5, 3: 4}) == {1: 15, 3: 4}